@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Generazione delle assenze (riga di revisions): ogni scrittura sulle assenze
+# la incrementa nella propria transazione (crud.bump_absences). L'indice
+# ricorda la generazione con cui è stato caricato e a ogni lettura la
+# confronta con quella del DB (una query sulla chiave primaria): scritture di
+# altri processi e ritardi della replica si vedono appena la generazione letta
+# è arrivata, mai prima né dopo.
+REVISION = "absences"
+
+
+class AbsenceIndex:
+    """
+    Indice in memoria delle ExtraAbsence (FERIE/MALATTIA/INFORTUNIO).
+
+    Per ogni persona: intervalli ordinati per start_date, con il massimo
+    cumulato delle end_date. Un intervallo [a, b] si trova con una bisect
+    sulle start (<= b) e risalendo finché il massimo cumulato delle end è
+    ancora >= a: costo logaritmico + numero di risultati.
+    """
+
+    def __init__(self, rows):
+        grouped: dict[str, list[tuple[date, date, str]]] = {}
+        for person_id, start_date, end_date, kind in rows:
+            grouped.setdefault(person_id, []).append((start_date, end_date, kind))
+
+        self._by_person: dict[str, tuple[list, list, list, list]] = {}
+        for person_id, items in grouped.items():
+            items.sort(key=lambda x: (x[0], x[1]))
+            starts = [s for s, _, _ in items]
+            ends = [e for _, e, _ in items]
+            kinds = [k for _, _, k in items]
+            max_end = []
+            m = None
+            for e in ends:
+                m = e if m is None or e > m else m
+                max_end.append(m)
+            self._by_person[person_id] = (starts, ends, kinds, max_end)
+
+    def _person_overlapping(self, person_id: str, start: date, end: date):
+        entry = self._by_person.get(person_id)
+        if entry is None:
+            return []
+        starts, ends, kinds, max_end = entry
+        i = bisect_right(starts, end) - 1
+        found = []
+        while i >= 0 and max_end[i] >= start:
+            if ends[i] >= start:
+                found.append((starts[i], ends[i], kinds[i]))
+            i -= 1
+        found.reverse()
+        return found
+
+    def overlapping(self, start: date, end: date):
+        """(person_id, start_date, end_date, kind) che si sovrappongono a [start, end]."""
+        for person_id in self._by_person:
+            for s, e, kind in self._person_overlapping(person_id, start, end):
+                yield person_id, s, e, kind
+
+    def by_day(self, start: date, ndays: int) -> dict[int, dict[str, str]]:
+        # day -> {person_id: kind}; a parità di giorno vince l'assenza iniziata dopo
+        end = start + timedelta(days=ndays - 1)
+        out: dict[int, dict[str, str]] = {d: {} for d in range(ndays)}
+        for person_id, s, e, kind in self.overlapping(start, end):
+            first = max((s - start).days, 0)
+            last = min((e - start).days, ndays - 1)
+            for d in range(first, last + 1):
+                out[d][person_id] = kind
+        return out
+
+    def kind_on(self, person_id: str, day_date: date) -> str | None:
+        found = self._person_overlapping(person_id, day_date, day_date)
+        return found[-1][2] if found else None
+
+
+_lock = threading.Lock()
+_index: AbsenceIndex | None = None
+_generation = -1
+
+
+def generation(db: Session) -> int:
+    return db.scalar(select(models.Revision.value).where(models.Revision.name == REVISION)) or 0
+
+
+def get_index(db: Session) -> AbsenceIndex:
+    """
+    Indice aggiornato almeno alla generazione che vede la sessione: prima si
+    legge la generazione, poi le righe, quindi l'indice caricato non è mai
+    più vecchio della generazione con cui viene marcato.
+    """
+    global _index, _generation
+    gen = generation(db)
+    with _lock:
+        if _index is not None and _generation >= gen:
+            return _index
+
+    rows = db.query(
+        models.ExtraAbsence.person_id,
+        models.ExtraAbsence.start_date,
+        models.ExtraAbsence.end_date,
+        models.ExtraAbsence.kind,
+    ).all()
+    index = AbsenceIndex(rows)
+
+    with _lock:
+        # un caricamento concorrente più recente non va sovrascritto
+        if gen >= _generation:
+            _index, _generation = index, gen
+    return index
+
+
+def invalidate():
+    # solo per i test: la coerenza fra processi la dà la generazione
+    global _index, _generation
+    with _lock:
+        _index, _generation = None, -1
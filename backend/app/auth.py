@@ -10,7 +10,7 @@ def hash_password(p: str) -> str:
 def verify_password(p: str, h: str) -> bool:
     return pwd.verify(p, h)
 
-def create_access_token(*, subject: str, secret: str, expires_minutes: int) -> str:
+def create_access_token(*, subject: str, secret: str, expires_minutes: int, version: int = 0) -> str:
     exp = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    payload = {"sub": subject, "exp": exp}
+    payload = {"sub": subject, "ver": version, "exp": exp}
     return jwt.encode(payload, secret, algorithm="HS256")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import heapq
+
+from .conflicts import fits, intervals_by_person, shift_interval, shift_times
+
+
+def autofill(
+    shifts: list, people_active: list, grid: dict, rot_by_day: dict, extra_by_day: dict,
+    keep_existing: bool = True, meta_by_day: dict | None = None, border: tuple[dict, dict] | None = None,
+):
+    """
+    Riempie le celle vuote della settimana rispettando i vincoli già usati
+    dagli alert: nessun doppione nel giorno, nessuno in RIPOSO/PERMESSO da
+    rotazione, nessuno in FERIE/MALATTIA/INFORTUNIO, nessuna sovrapposizione
+    di orario e almeno MIN_REST_MINUTES tra turni di giorni diversi (anche
+    contro le celle bloccate dei giorni dopo e contro i giorni prima della
+    settimana in `border`, come crud._border).
+
+    Carico bilanciato: per ogni giorno un min-heap (turni assegnati nella
+    settimana, ordine) sulle persone disponibili; ogni cella vuota va alla
+    persona meno carica il cui orario è compatibile, le scartate tornano
+    nell'heap per le celle dopo. Con keep_existing le celle già piene restano
+    bloccate e contano nel carico.
+
+    Costo O(giorni x (persone + turni x scarti x log persone)), con un
+    controllo orari lineare nei turni della persona.
+    Ritorna (nuova griglia, celle rimaste vuote per mancanza di personale).
+    """
+    order = {p.id: i for i, p in enumerate(people_active)}
+    load = {p.id: 0 for p in people_active}
+    meta_by_day = meta_by_day or {}
+    border_grid, border_meta = border or ({}, {})
+    times = shift_times(shifts)
+
+    out: dict[int, dict[str, str | None]] = {}
+    for d, row in grid.items():
+        out[d] = {s.id: (row.get(s.id) if keep_existing else None) for s in shifts}
+        for pid in out[d].values():
+            if pid in load:
+                load[pid] += 1
+
+    # turni già fissati per persona: celle bloccate e giorni prima della settimana
+    placed = intervals_by_person(shifts, {**border_grid, **out}, {**border_meta, **meta_by_day})
+
+    unfilled: list[dict] = []
+    for d in out:
+        taken = {pid for pid in out[d].values() if pid}
+        rot_day = rot_by_day.get(d, {})
+        extra_day = extra_by_day.get(d, {})
+        heap = [
+            (load[pid], order[pid], pid)
+            for pid in load
+            if pid not in taken and pid not in rot_day and pid not in extra_day
+        ]
+        heapq.heapify(heap)
+
+        for s in shifts:
+            if out[d][s.id]:
+                continue
+            iv = shift_interval(times, d, s.id, meta_by_day.get(d, {}))
+            skipped = []
+            pid = None
+            while heap:
+                entry = heapq.heappop(heap)
+                if iv is None or fits(placed.get(entry[2], ()), d, *iv):
+                    pid = entry[2]
+                    break
+                skipped.append(entry)
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+
+            if pid is None:
+                unfilled.append({"day_index": d, "shift_id": s.id})
+                continue
+            out[d][s.id] = pid
+            load[pid] += 1
+            if iv is not None:
+                placed.setdefault(pid, []).append((iv[0], iv[1], d, s.id))
+
+    return out, unfilled
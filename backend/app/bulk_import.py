@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import csv
+import json
+from datetime import datetime
+from typing import Iterator, TextIO
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas, crud, events
+
+
+KINDS = ("people", "rotations", "absences")
+FORMATS = ("csv", "ndjson")
+ABSENCE_KINDS = ("FERIE", "MALATTIA", "INFORTUNIO")
+
+BATCH_SIZE = 1000  # righe per insert multi-riga
+MAX_ERRORS = 200   # righe di errore riportate (il conteggio resta completo)
+
+
+# -------- LETTURA STREAMING ----------
+def detect_format(filename: str | None, content_type: str | None) -> str:
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype or "jsonl" in ctype:
+        return "ndjson"
+    return "csv"
+
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Righe del file una alla volta come (numero_riga, record, errore):
+    niente viene caricato tutto in memoria. Nel CSV la prima riga è
+    l'intestazione. Celle vuote e valori null non entrano nel record:
+    per la validazione il campo è assente e vale il default dello schema.
+    """
+    if fmt == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"JSON non valido: {e}"
+                continue
+            if not isinstance(rec, dict):
+                yield line_no, None, "ogni riga deve essere un oggetto JSON"
+                continue
+            yield line_no, _without_blanks(rec), None
+        return
+
+    reader = csv.DictReader(stream)
+    for rec in reader:
+        if None in rec:
+            yield reader.line_num, None, "più colonne dell'intestazione"
+            continue
+        yield reader.line_num, _without_blanks({k.strip(): v.strip() if v is not None else None for k, v in rec.items()}), None
+
+
+def _without_blanks(rec: dict) -> dict:
+    # is_active vuoto = True, non un bool non valido
+    return {k: v for k, v in rec.items() if v is not None and v != ""}
+
+
+def _error_text(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+
+# -------- VALIDAZIONE ----------
+class _PersonRef:
+    """Risolve person_id o full_name sulle persone già presenti (una query sola)."""
+
+    def __init__(self, db: Session):
+        self.ids: set[str] = set()
+        self.by_name: dict[str, str | None] = {}
+        for pid, name in db.query(models.Person.id, models.Person.full_name):
+            self.ids.add(pid)
+            key = name.strip().lower()
+            # nome ripetuto = ambiguo
+            self.by_name[key] = None if key in self.by_name else pid
+
+    def resolve(self, payload: BaseModel) -> str:
+        if payload.person_id:
+            if payload.person_id not in self.ids:
+                raise ValueError(f"persona {payload.person_id} non trovata")
+            return payload.person_id
+        if payload.full_name:
+            key = payload.full_name.strip().lower()
+            if key not in self.by_name:
+                raise ValueError(f"persona '{payload.full_name}' non trovata")
+            if self.by_name[key] is None:
+                raise ValueError(f"nome '{payload.full_name}' ambiguo: usare person_id")
+            return self.by_name[key]
+        raise ValueError("serve person_id o full_name")
+
+
+def _person_row(rec: dict, _ref) -> dict:
+    p = schemas.PersonImportIn.model_validate(rec)
+    if not p.full_name.strip():
+        raise ValueError("full_name vuoto")
+    return {
+        "full_name": p.full_name.strip(),
+        "notes": p.notes,
+        "is_active": p.is_active,
+        "rotation_base_riposo_date": p.rotation_base_riposo_date,
+    }
+
+
+def _rotation_row(rec: dict, ref: _PersonRef) -> dict:
+    r = schemas.RotationImportIn.model_validate(rec)
+    return {"id": ref.resolve(r), "rotation_base_riposo_date": r.base_riposo_date}
+
+
+def _absence_row(rec: dict, ref: _PersonRef) -> dict:
+    a = schemas.ExtraAbsenceImportIn.model_validate(rec)
+    kind = a.kind.upper().strip()
+    if kind not in ABSENCE_KINDS:
+        raise ValueError("kind deve essere FERIE/MALATTIA/INFORTUNIO")
+    if a.end_date < a.start_date:
+        raise ValueError("end_date deve essere >= start_date")
+    return {
+        "person_id": ref.resolve(a),
+        "kind": kind,
+        "start_date": a.start_date,
+        "end_date": a.end_date,
+        "notes": a.notes,
+        "created_at": datetime.utcnow(),
+    }
+
+
+_ROW = {"people": _person_row, "rotations": _rotation_row, "absences": _absence_row}
+
+
+def _write(db: Session, kind: str, batch: list[dict]):
+    # insert/update multi-riga: una sola istruzione per batch
+    if kind == "people":
+        db.execute(insert(models.Person), batch)
+    elif kind == "rotations":
+        db.execute(update(models.Person), batch)
+    else:
+        db.execute(insert(models.ExtraAbsence), batch)
+
+
+# -------- IMPORT ----------
+def run_import(db: Session, kind: str, fmt: str, records, partial: bool = False, dry_run: bool = False) -> dict:
+    """
+    Valida e carica le righe a batch dentro un'unica transazione.
+    Di default è tutto-o-niente: con anche un solo errore si annulla tutto
+    (così il file corretto si può ricaricare senza doppioni); con partial=True
+    le righe valide vengono importate comunque. dry_run valida soltanto.
+    """
+    row_of = _ROW[kind]
+    ref = _PersonRef(db) if kind != "people" else None
+
+    total = imported = errors_count = 0
+    errors: list[dict] = []
+    batch: list[dict] = []
+    span = None  # periodo coperto dalle assenze importate
+
+    for line_no, rec, err in records:
+        total += 1
+        row = None
+        if err is None:
+            try:
+                row = row_of(rec, ref)
+            except (ValidationError, ValueError) as e:
+                err = _error_text(e)
+        if err is not None:
+            errors_count += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({"line": line_no, "error": err})
+            continue
+
+        imported += 1
+        if kind == "absences":
+            lo, hi = row["start_date"], row["end_date"]
+            span = (min(span[0], lo), max(span[1], hi)) if span else (lo, hi)
+
+        # dopo il primo errore in modalità tutto-o-niente non serve più scrivere
+        if dry_run or (errors_count and not partial):
+            continue
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            _write(db, kind, batch)
+            batch = []
+
+    report = {
+        "kind": kind, "format": fmt, "total": total, "imported": imported,
+        "errors_count": errors_count, "errors": errors,
+    }
+
+    if dry_run or (errors_count and not partial) or not imported:
+        db.rollback()
+        report["status"] = "dry_run" if dry_run else ("rejected" if errors_count else "ok")
+        if not dry_run:
+            report["imported"] = 0
+        return report
+
+    if batch:
+        _write(db, kind, batch)
+
+    if kind == "absences":
+        crud.bump_absences(db, span[0], span[1])
+        events.publish(db, span[0], span[1], {
+            "type": "absence", "action": "imported", "count": imported,
+            "start_date": span[0].isoformat(), "end_date": span[1].isoformat(),
+        })
+    else:
+        crud.bump_global(db)
+    db.commit()
+
+    report["status"] = "ok"
+    return report
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from datetime import time
+
+# riposo minimo tra la fine di un turno e l'inizio del successivo (D.Lgs. 66/2003: 11 ore)
+MIN_REST_MINUTES = 11 * 60
+DAY_MINUTES = 24 * 60
+
+CONFLICT_KINDS = ["sovrapposizioni", "riposo_insufficiente"]
+
+
+def _minutes(t) -> int | None:
+    if t is None:
+        return None
+    if isinstance(t, str):
+        t = time.fromisoformat(t)
+    return t.hour * 60 + t.minute
+
+
+def shift_times(shifts: list) -> dict[str, tuple]:
+    return {s.id: (s.start_time, s.end_time) for s in shifts}
+
+
+def shift_interval(times: dict, d: int, shift_id: str, day_meta: dict) -> tuple[int, int] | None:
+    """
+    Intervallo in minuti assoluti dall'inizio del periodo (giorno d = d*1440),
+    orario effettivo = override della meta se presente, altrimenti quello del turno.
+    Fine <= inizio = turno notturno che finisce il giorno dopo.
+    None per i turni senza orari, che non entrano nel controllo.
+    """
+    m = day_meta.get(shift_id) or {}
+    st = _minutes(m.get("override_start_time") or times.get(shift_id, (None, None))[0])
+    en = _minutes(m.get("override_end_time") or times.get(shift_id, (None, None))[1])
+    if st is None or en is None:
+        return None
+    if en <= st:
+        en += DAY_MINUTES
+    base = d * DAY_MINUTES
+    return base + st, base + en
+
+
+def intervals_by_person(shifts: list, grid: dict, meta_by_day: dict) -> dict[str, list]:
+    # pid -> [(inizio, fine, giorno, turno)] di tutte le celle assegnate con orari
+    times = shift_times(shifts)
+    out: dict[str, list] = {}
+    for d, row in grid.items():
+        day_meta = meta_by_day.get(d, {}) if meta_by_day else {}
+        for shift_id, pid in row.items():
+            if not pid:
+                continue
+            iv = shift_interval(times, d, shift_id, day_meta)
+            if iv is not None:
+                out.setdefault(pid, []).append((iv[0], iv[1], d, shift_id))
+    return out
+
+
+def fits(intervals: list, d: int, start: int, end: int, min_rest: int = MIN_REST_MINUTES) -> bool:
+    """
+    True se il turno [start, end) del giorno d non si sovrappone a nessuno
+    degli intervalli della persona e, tra giorni diversi, lascia almeno
+    min_rest minuti prima e dopo: le stesse regole di time_conflicts.
+    """
+    for p_start, p_end, p_day, _ in intervals:
+        if start < p_end and p_start < end:
+            return False
+        if p_day != d and (0 <= start - p_end < min_rest or 0 <= p_start - end < min_rest):
+            return False
+    return True
+
+
+def time_conflicts(shifts: list, grid: dict, meta_by_day: dict, min_rest: int = MIN_REST_MINUTES) -> dict[str, dict[int, list]]:
+    """
+    Conflitti di orario per persona con una sweep line sugli intervalli
+    ordinati per inizio (lineare negli assegnamenti, a parte l'ordinamento).
+    La griglia può avere giorni negativi (quelli prima del periodo, vedi
+    crud._border): servono come turni precedenti, l'output si filtra dopo.
+    - sovrapposizioni: il turno inizia prima che finisca uno precedente
+      (anche tra giorni diversi, es. notturno + mattina dopo)
+    - riposo_insufficiente: tra giorni diversi, meno di min_rest minuti
+      dalla fine del turno precedente
+    Il conflitto è segnalato sul giorno del turno che inizia dopo.
+    """
+    shift_name_by_id = {s.id: s.name for s in shifts}
+    out: dict[str, dict[int, list]] = {kind: {} for kind in CONFLICT_KINDS}
+
+    for pid, intervals in intervals_by_person(shifts, grid, meta_by_day).items():
+        intervals.sort()
+        prev = None  # intervallo con la fine più lontana visto finora
+        for cur in intervals:
+            start, end, d, shift_id = cur
+            if prev is not None:
+                p_end, p_day, p_shift = prev[1], prev[2], prev[3]
+                if start < p_end:
+                    out["sovrapposizioni"].setdefault(d, []).append({
+                        "person_id": pid,
+                        "shift_id": shift_id,
+                        "shift_name": shift_name_by_id.get(shift_id, ""),
+                        "other_day_index": p_day,
+                        "other_shift_id": p_shift,
+                        "overlap_minutes": min(end, p_end) - start,
+                    })
+                elif d != p_day and start - p_end < min_rest:
+                    out["riposo_insufficiente"].setdefault(d, []).append({
+                        "person_id": pid,
+                        "shift_id": shift_id,
+                        "shift_name": shift_name_by_id.get(shift_id, ""),
+                        "prev_day_index": p_day,
+                        "prev_shift_id": p_shift,
+                        "rest_minutes": start - p_end,
+                    })
+            if prev is None or end > prev[1]:
+                prev = cur
+    return out
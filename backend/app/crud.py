@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 from datetime import date, datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from . import models
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import String, and_, cast, delete, func, insert, literal, or_, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+from . import models, schemas, absence_index, events, reports
+from .plan_cache import cache as plan_cache
+from .rotation import rotation_by_day
+from .autofill import autofill
+from .conflicts import CONFLICT_KINDS, time_conflicts
 
 
 def _utcnow():
@@ -11,191 +17,482 @@ def _utcnow():
     return datetime.utcnow()
 
 
+def _upsert(db: Session, model):
+    # INSERT ... ON CONFLICT del dialetto in uso (Postgres in produzione, SQLite in locale)
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def _sql_uuid(db: Session):
+    """
+    UUID v4 come testo generato dal DB riga per riga, nello stesso formato di
+    models.gen_id: per gli INSERT ... SELECT che non passano da Python.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return cast(func.gen_random_uuid(), String)
+
+    def hexblob(n: int):
+        return func.lower(func.hex(func.randomblob(n)))
+
+    return (
+        hexblob(4) + "-" + hexblob(2) + "-4" + func.substr(hexblob(2), 2) + "-"
+        + func.substr("89ab", 1 + func.abs(func.random()) % 4, 1) + func.substr(hexblob(2), 2) + "-" + hexblob(6)
+    )
+
+
+def get_week(db: Session, monday: date) -> models.Week | None:
+    return db.query(models.Week).filter(models.Week.monday_date == monday).one_or_none()
+
+
+def week_or_empty(db: Session, monday: date) -> models.Week:
+    """
+    Per le letture: la settimana se esiste, altrimenti una Week transiente
+    (mai aggiunta alla sessione, id None) che si legge come griglia vuota.
+    Sfogliare settimane nuove non scrive nulla sul DB.
+    """
+    return get_week(db, monday) or models.Week(monday_date=monday)
+
+
 def get_or_create_week(db: Session, monday: date) -> models.Week:
-    week = db.query(models.Week).filter(models.Week.monday_date == monday).one_or_none()
+    """
+    Solo per le scritture. INSERT ... ON CONFLICT DO NOTHING RETURNING:
+    due richieste concorrenti sulla stessa settimana non violano più
+    l'unique su monday_date. Il commit lo fa la scrittura che segue.
+    """
+    week = get_week(db, monday)
     if week:
         return week
-    week = models.Week(monday_date=monday)
-    # se il DB ha created_at NOT NULL senza default, valorizziamo se esiste
-    if hasattr(week, "created_at") and getattr(week, "created_at", None) is None:
-        week.created_at = _utcnow()
-    db.add(week)
-    db.commit()
-    db.refresh(week)
+
+    stmt = (
+        _upsert(db, models.Week)
+        .values(id=models.gen_id(), monday_date=monday, created_at=_utcnow())
+        .on_conflict_do_nothing(index_elements=["monday_date"])
+        .returning(models.Week)
+    )
+    week = db.scalars(stmt).one_or_none()
+    if week is None:
+        # creata nel frattempo da un'altra richiesta
+        week = get_week(db, monday)
     return week
 
 
+# -------- REVISIONI (ETag) ----------
+GLOBAL_REVISION = "global"
+
+
+def bump_week(db: Session, week: models.Week):
+    # nella transazione della scrittura: il commit lo fa il chiamante
+    plan_cache.invalidate_week(week.monday_date)
+    db.query(models.Week).filter(models.Week.id == week.id).update(
+        {models.Week.revision: models.Week.revision + 1}, synchronize_session=False
+    )
+
+
+def bump_weeks_between(db: Session, start: date, end: date):
+    """
+    Nuova revisione per le settimane già create che toccano [start, end]:
+    un solo UPDATE qualunque sia l'ampiezza del periodo. Le settimane mai
+    create non hanno righe da aggiornare: il loro ETag usa la revisione
+    delle assenze (week_etag).
+    """
+    plan_cache.invalidate_range(start, end)
+    first_monday = start - timedelta(days=start.weekday())
+    db.query(models.Week).filter(models.Week.monday_date.between(first_monday, end)).update(
+        {models.Week.revision: models.Week.revision + 1}, synchronize_session=False
+    )
+
+
+def bump_absences(db: Session, start: date, end: date):
+    # assenze create/cancellate/importate: settimane toccate + generazione dell'indice assenze
+    bump_weeks_between(db, start, end)
+    _bump_revision(db, absence_index.REVISION)
+
+
+def _create_or_bump_weeks(db: Session, first_monday: date, last_monday: date):
+    # copia/replica (al più MAX_REPLICATE_WEEKS): crea le settimane mancanti e incrementa le altre
+    plan_cache.invalidate_range(first_monday, last_monday)
+    rows = []
+    monday = first_monday
+    while monday <= last_monday:
+        rows.append({"id": models.gen_id(), "monday_date": monday, "revision": 1, "created_at": _utcnow()})
+        monday += timedelta(days=7)
+
+    stmt = _upsert(db, models.Week).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["monday_date"],
+        set_={"revision": models.Week.revision + 1},
+    )
+    db.execute(stmt)
+
+
+def bump_global(db: Session):
+    # persone / rotazioni / turni: cambiano gli alert di tutte le settimane
+    plan_cache.invalidate_all()
+    _bump_revision(db, GLOBAL_REVISION)
+
+
+def _bump_revision(db: Session, name: str):
+    stmt = _upsert(db, models.Revision).values(name=name, value=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"value": models.Revision.value + 1},
+    )
+    db.execute(stmt)
+
+
+def _revision_value(name: str):
+    return select(models.Revision.value).where(models.Revision.name == name).scalar_subquery()
+
+
+def week_etag(db: Session, monday: date) -> str:
+    """
+    Una sola query, nessun calcolo della griglia. Settimana mai creata:
+    al posto della sua revisione c'è quella delle assenze ("a<n>"), perché
+    le assenze nuove non creano righe in weeks.
+    """
+    week_rev = select(models.Week.revision).where(models.Week.monday_date == monday).scalar_subquery()
+    row = db.execute(select(week_rev, _revision_value(GLOBAL_REVISION), _revision_value(absence_index.REVISION))).one()
+    week_part = row[0] if row[0] is not None else f"a{row[2] or 0}"
+    return f'"{monday.isoformat()}.{week_part}.{row[1] or 0}"'
+
+
+def _upsert_cells(db: Session, week: models.Week, rows: list[dict]):
+    # INSERT ... ON CONFLICT su uq_assignment_cell: una sola istruzione, nessuna SELECT prima
+    stmt = _upsert(db, models.Assignment).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["week_id", "day_index", "shift_id"],
+        set_={"person_id": stmt.excluded.person_id, "updated_at": stmt.excluded.updated_at},
+    )
+    db.execute(stmt)
+
+
+def _cell_row(week: models.Week, day_index: int, shift_id: str, person_id: str | None, now: datetime) -> dict:
+    return {
+        "id": models.gen_id(),
+        "week_id": week.id,
+        "day_index": day_index,
+        "shift_id": shift_id,
+        "person_id": person_id,
+        "updated_at": now,
+    }
+
+
 def set_cell(db: Session, week: models.Week, day_index: int, shift_id: str, person_id: str | None):
     """
-    Crea o aggiorna una cella (week_id + day_index + shift_id).
-    FIX: valorizza sempre created_at / updated_at se il DB li richiede NOT NULL.
+    Crea o aggiorna una cella (week_id + day_index + shift_id) con un upsert.
+    Ritorna griglia e alert dei giorni ricalcolati (build_day_alerts).
     """
-    cell = db.query(models.Assignment).filter(
-        and_(
-            models.Assignment.week_id == week.id,
-            models.Assignment.day_index == day_index,
-            models.Assignment.shift_id == shift_id
-        )
-    ).one_or_none()
+    _upsert_cells(db, week, [_cell_row(week, day_index, shift_id, person_id, _utcnow())])
+    bump_week(db, week)
+    grid, alerts = _day_delta(db, week, {day_index})
+    events.publish_week(db, week.monday_date, {
+        "type": "cell", "day_index": day_index, "shift_id": shift_id, "person_id": person_id,
+        "grid": grid, "alerts": alerts,
+    })
+    reports.refresh_days(db, week.monday_date, {day_index})
+    db.commit()
+    return grid, alerts
 
+
+def set_cells(db: Session, week: models.Week, changes: list) -> tuple[dict, dict]:
+    """
+    Applica un blocco di modifiche (incolla riga / riempi giorno) con un solo
+    INSERT ... ON CONFLICT su uq_assignment_cell e un solo commit.
+    Se la stessa cella compare più volte vale l'ultima modifica.
+    Ritorna griglia e alert dei giorni ricalcolati (build_day_alerts).
+    """
     now = _utcnow()
+    rows: dict[tuple[int, str], dict] = {}
+    for ch in changes:
+        rows[(ch.day_index, ch.shift_id)] = _cell_row(week, ch.day_index, ch.shift_id, ch.person_id, now)
+    if not rows:
+        return {}, {kind: {} for kind in ALERT_KINDS}
+
+    _upsert_cells(db, week, list(rows.values()))
+    bump_week(db, week)
+    days = {d for d, _ in rows}
+    grid, alerts = _day_delta(db, week, days)
+    events.publish_week(db, week.monday_date, {
+        "type": "cells",
+        "changes": [{k: r[k] for k in ("day_index", "shift_id", "person_id")} for r in rows.values()],
+        "grid": grid, "alerts": alerts,
+    })
+    reports.refresh_days(db, week.monday_date, days)
+    db.commit()
+    return grid, alerts
+
 
-    if cell is None:
-        cell = models.Assignment(
+def set_meta(db: Session, week: models.Week, day_index: int, shift_id: str, override_start_time, override_end_time, role: str | None):
+    """
+    Crea o aggiorna orari/ruolo di una cella (assignment_meta). Gli orari
+    cambiano i conflitti: ritorna griglia e alert dei giorni ricalcolati.
+    """
+    meta = db.query(models.AssignmentMeta).filter(
+        models.AssignmentMeta.week_id == week.id,
+        models.AssignmentMeta.day_index == day_index,
+        models.AssignmentMeta.shift_id == shift_id,
+    ).one_or_none()
+
+    if meta is None:
+        meta = models.AssignmentMeta(
             week_id=week.id,
             day_index=day_index,
             shift_id=shift_id,
-            person_id=person_id
         )
+        db.add(meta)
+
+    meta.override_start_time = override_start_time
+    meta.override_end_time = override_end_time
+    meta.role = role or None
+
+    bump_week(db, week)
+    grid, alerts = _day_delta(db, week, {day_index})
+    events.publish_week(db, week.monday_date, {
+        "type": "meta",
+        "day_index": day_index,
+        "shift_id": shift_id,
+        "override_start_time": meta.override_start_time.isoformat() if meta.override_start_time else None,
+        "override_end_time": meta.override_end_time.isoformat() if meta.override_end_time else None,
+        "role": meta.role,
+        "grid": grid, "alerts": alerts,
+    })
+    reports.refresh_days(db, week.monday_date, {day_index})
+    db.commit()
+    return grid, alerts
 
-        # ✅ Se nel DB esistono colonne NOT NULL senza default, impostale
-        if hasattr(cell, "created_at") and getattr(cell, "created_at", None) is None:
-            cell.created_at = now
-        if hasattr(cell, "updated_at"):
-            cell.updated_at = now
-
-        db.add(cell)
-    else:
-        cell.person_id = person_id
-        if hasattr(cell, "updated_at"):
-            cell.updated_at = now
 
+def clear_week(db: Session, week: models.Week | None):
+    if week is None:
+        return
+    db.query(models.Assignment).filter(models.Assignment.week_id == week.id).delete()
+    bump_week(db, week)
+    _touch_next_week(db, week.monday_date)
+    events.publish_week(db, week.monday_date, {"type": "clear"})
+    reports.refresh_week(db, week.monday_date)
     db.commit()
 
 
-def clear_week(db: Session, week: models.Week):
-    db.query(models.Assignment).filter(models.Assignment.week_id == week.id).delete()
+def _copy_into(db: Session, src_week: models.Week | None, first_monday: date, last_monday: date):
+    """
+    Copia assegnazioni e meta (orari override, APERTURA/CHIUSURA) della
+    settimana sorgente su tutte le settimane da first_monday a last_monday,
+    tutto dentro il DB: DELETE + INSERT ... SELECT, nessuna riga
+    materializzata in Python. Il commit lo fa il chiamante.
+    """
+    # crea le settimane mancanti e ne incrementa la revisione
+    _create_or_bump_weeks(db, first_monday, last_monday)
+
+    dst = aliased(models.Week)
+    dst_ids = select(dst.id).where(dst.monday_date.between(first_monday, last_monday))
+    db.execute(delete(models.Assignment).where(models.Assignment.week_id.in_(dst_ids)))
+    db.execute(delete(models.AssignmentMeta).where(models.AssignmentMeta.week_id.in_(dst_ids)))
+
+    if src_week is not None:
+        now = _utcnow()
+        for model, cols in [
+            (models.Assignment, ["person_id"]),
+            (models.AssignmentMeta, ["override_start_time", "override_end_time", "role"]),
+        ]:
+            stamp = "updated_at" if model is models.Assignment else "created_at"
+            sel = (
+                select(_sql_uuid(db), dst.id, model.day_index, model.shift_id, *[getattr(model, c) for c in cols], literal(now))
+                .select_from(model)
+                .join(dst, dst.monday_date.between(first_monday, last_monday))
+                .where(model.week_id == src_week.id)
+            )
+            db.execute(insert(model).from_select(["id", "week_id", "day_index", "shift_id", *cols, stamp], sel))
+
+    reports.refresh_weeks(db, first_monday, last_monday)
+
+    monday = first_monday
+    while monday <= last_monday:
+        events.publish_week(db, monday, {
+            "type": "copy", "from_monday": src_week.monday_date.isoformat() if src_week else None,
+        })
+        monday += timedelta(days=7)
+    _touch_next_week(db, last_monday)
+
+
+def copy_week(db: Session, src_week: models.Week | None, dst_week: models.Week):
+    # sorgente mai creata = settimana vuota: la destinazione viene solo svuotata
+    if src_week is not None and src_week.id == dst_week.id:
+        return
+    _copy_into(db, src_week, dst_week.monday_date, dst_week.monday_date)
     db.commit()
 
 
-def copy_week(db: Session, src_week: models.Week, dst_week: models.Week):
-    clear_week(db, dst_week)
-    src_cells = db.query(models.Assignment).filter(models.Assignment.week_id == src_week.id).all()
-    now = _utcnow()
-    for c in src_cells:
-        row = models.Assignment(
-            week_id=dst_week.id,
-            day_index=c.day_index,
-            shift_id=c.shift_id,
-            person_id=c.person_id
-        )
-        if hasattr(row, "created_at") and getattr(row, "created_at", None) is None:
-            row.created_at = now
-        if hasattr(row, "updated_at"):
-            row.updated_at = now
-        db.add(row)
+def replicate_week(db: Session, src_week: models.Week | None, weeks: int):
+    """Replica la settimana sulle `weeks` settimane successive, in una sola transazione."""
+    if src_week is None or weeks < 1:
+        return
+    monday = src_week.monday_date
+    _copy_into(db, src_week, monday + timedelta(days=7), monday + timedelta(weeks=weeks))
     db.commit()
 
 
-# -------- ROTAZIONE 8 GIORNI (riposo/permesso) ----------
-def _rot_kind(person: models.Person, day_date: date) -> str | None:
-    base = getattr(person, "rotation_base_riposo_date", None)
-    if not base:
-        return None
-    diff = (day_date - base).days
-    mod = diff % 8
-    if mod == 0:
-        return "RIPOSO"
-    if mod == 1:
-        return "PERMESSO"
-    return None
+def _extra_by_day(db: Session, start: date, ndays: int = 7) -> dict[int, dict[str, str]]:
+    # extra absences nel periodo (bloccanti): day -> {person_id: kind}
+    return absence_index.get_index(db).by_day(start, ndays)
 
 
-def build_grid_and_alerts(db: Session, week: models.Week):
+def _active_people(db: Session) -> list:
+    return db.query(models.Person).filter(models.Person.is_active == True).order_by(models.Person.full_name).all()
+
+
+def _shifts(db: Session) -> list:
+    return db.query(models.Shift).order_by(models.Shift.sort_order).all()
+
+
+def _load_week(db: Session, week: models.Week):
+    """
+    Carica in un colpo solo tutto quello che serve per la settimana:
+    turni, persone attive, griglia, rotazione, extra absences e meta celle.
+    """
     monday_date = week.monday_date
 
-    shifts = db.query(models.Shift).order_by(models.Shift.sort_order).all()
-    people_active = db.query(models.Person).filter(models.Person.is_active == True).order_by(models.Person.full_name).all()
+    shifts = _shifts(db)
+    people_active = _active_people(db)
 
     grid: dict[int, dict[str, str | None]] = {d: {s.id: None for s in shifts} for d in range(7)}
 
-    cells = db.query(models.Assignment).filter(models.Assignment.week_id == week.id).all()
-    for c in cells:
-        if 0 <= c.day_index <= 6 and c.shift_id in grid[c.day_index]:
-            grid[c.day_index][c.shift_id] = c.person_id
+    cells = []
+    if week.id is not None:
+        cells = db.query(
+            models.Assignment.day_index, models.Assignment.shift_id, models.Assignment.person_id
+        ).filter(models.Assignment.week_id == week.id).all()
+    for day_index, shift_id, person_id in cells:
+        if 0 <= day_index <= 6 and shift_id in grid[day_index]:
+            grid[day_index][shift_id] = person_id
 
-    duplicates: dict[int, list] = {d: [] for d in range(7)}
-    not_planned: dict[int, list[str]] = {d: [] for d in range(7)}
-    riposo_saltato: dict[int, list] = {d: [] for d in range(7)}
-    permesso_saltato: dict[int, list] = {d: [] for d in range(7)}
-    extra_absence_saltata: dict[int, list] = {d: [] for d in range(7)}  # FERIE/MALATTIA/INFORTUNIO pianificata
+    extra_by_day = _extra_by_day(db, monday_date)
+    rot_by_day = rotation_by_day(people_active, monday_date, 7)
+    meta_by_day = week_meta(db, week)
 
-    active_ids = [p.id for p in people_active]
-    shift_name_by_id = {s.id: s.name for s in shifts}
+    return shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day
 
-    # extra absences nella settimana (bloccanti)
-    week_start = monday_date
-    week_end = monday_date + timedelta(days=6)
-    extra_rows = db.query(models.ExtraAbsence).filter(
-        models.ExtraAbsence.start_date <= week_end,
-        models.ExtraAbsence.end_date >= week_start
-    ).all()
-
-    extra_by_day: dict[int, dict[str, str]] = {d: {} for d in range(7)}  # day -> {person_id: kind}
-    for r in extra_rows:
-        for d in range(7):
-            day_date = monday_date + timedelta(days=d)
-            if r.start_date <= day_date <= r.end_date:
-                extra_by_day[d][r.person_id] = r.kind
-
-    # rotazione riposi/permessi per settimana
-    rot_by_day: dict[int, dict[str, str]] = {d: {} for d in range(7)}
-    for p in people_active:
-        for d in range(7):
-            kind = _rot_kind(p, monday_date + timedelta(days=d))
-            if kind:
-                rot_by_day[d][p.id] = kind
-
-    for d in range(7):
-        assigned = [pid for pid in grid[d].values() if pid is not None]
-
-        # Doppioni
-        counts: dict[str, int] = {}
-        for pid in assigned:
-            counts[pid] = counts.get(pid, 0) + 1
-        for pid, cnt in counts.items():
-            if cnt >= 2:
-                duplicates[d].append({"person_id": pid, "count": cnt})
-
-        # Riposo/permesso/extra saltati (pianificato durante assenza)
-        for shift_id, pid in grid[d].items():
-            if not pid:
-                continue
-
-            # extra blocca (ferie/malattia/infortunio)
-            extra_kind = extra_by_day[d].get(pid)
-            if extra_kind:
-                extra_absence_saltata[d].append({
-                    "person_id": pid,
-                    "kind": extra_kind,
-                    "shift_id": shift_id,
-                    "shift_name": shift_name_by_id.get(shift_id, ""),
-                })
-                continue
-
-            # riposo/permesso (warning)
-            rot_kind = rot_by_day[d].get(pid)
-            if rot_kind == "RIPOSO":
-                riposo_saltato[d].append({
-                    "person_id": pid,
-                    "shift_id": shift_id,
-                    "shift_name": shift_name_by_id.get(shift_id, "")
-                })
-            elif rot_kind == "PERMESSO":
-                permesso_saltato[d].append({
-                    "person_id": pid,
-                    "shift_id": shift_id,
-                    "shift_name": shift_name_by_id.get(shift_id, "")
-                })
-
-        # Non pianificati: escludi chi è assente (rotazione o extra)
-        assigned_set = set(assigned)
-        not_planned[d] = [
-            pid for pid in active_ids
-            if pid not in assigned_set and pid not in rot_by_day[d] and pid not in extra_by_day[d]
-        ]
-
-    alerts = {
+
+# giorni prima del periodo che entrano nei conflitti di orario: un turno dura
+# al più 24 ore e il riposo minimo è di 11, quindi oltre il sabato precedente
+# nessun turno arriva al lunedì
+BORDER_DAYS = 2
+
+
+def _on_days(model, start: date, first: int, last: int):
+    # righe di model (con week_id e day_index) dei giorni start+first .. start+last,
+    # spezzati per settimana: un (lunedì, intervallo di day_index) per settimana toccata
+    W = models.Week
+    segments = []
+    day = start + timedelta(days=first)
+    end = start + timedelta(days=last)
+    while day <= end:
+        monday = day - timedelta(days=day.weekday())
+        seg_end = min(end, monday + timedelta(days=6))
+        segments.append(and_(W.monday_date == monday, model.day_index.between(day.weekday(), seg_end.weekday())))
+        day = seg_end + timedelta(days=1)
+    return or_(*segments)
+
+
+def _cells_between(db: Session, start: date, first: int, last: int) -> tuple[dict, dict]:
+    """
+    Celle assegnate e orari override dei giorni start+first .. start+last,
+    indicizzati come offset da start (negativi prima di start): una query
+    per le celle e una per le meta, anche a cavallo di due settimane.
+    """
+    A, M, W = models.Assignment, models.AssignmentMeta, models.Week
+    cells: dict[int, dict] = {}
+    for monday, day_index, shift_id, person_id in (
+        db.query(W.monday_date, A.day_index, A.shift_id, A.person_id)
+        .join(W, W.id == A.week_id)
+        .filter(_on_days(A, start, first, last), A.person_id.isnot(None))
+    ):
+        cells.setdefault((monday - start).days + day_index, {})[shift_id] = person_id
+
+    meta_by_day: dict[int, dict] = {}
+    for monday, day_index, shift_id, o_start, o_end in (
+        db.query(W.monday_date, M.day_index, M.shift_id, M.override_start_time, M.override_end_time)
+        .join(W, W.id == M.week_id)
+        .filter(_on_days(M, start, first, last))
+    ):
+        meta_by_day.setdefault((monday - start).days + day_index, {})[shift_id] = {
+            "override_start_time": o_start, "override_end_time": o_end,
+        }
+    return cells, meta_by_day
+
+
+def _border(db: Session, start: date) -> tuple[dict, dict]:
+    """
+    Celle e orari override dei BORDER_DAYS giorni prima di `start`, indicizzati
+    -2 e -1 come nella griglia del periodo. Servono solo come turni precedenti
+    per i conflitti di orario (notturno della domenica + lunedì mattina della
+    settimana dopo); gli alert restano quelli dei giorni del periodo.
+    """
+    return _cells_between(db, start, -BORDER_DAYS, -1)
+
+
+DAY_ALERT_KINDS = ["duplicates", "not_planned", "riposo_saltato", "permesso_saltato", "extra_absence_saltata"]
+ALERT_KINDS = DAY_ALERT_KINDS + CONFLICT_KINDS
+
+
+def _day_alerts(grid_day: dict, active_ids: list, shift_name_by_id: dict, rot_day: dict, extra_day: dict) -> dict[str, list]:
+    """
+    Alert di un singolo giorno: dipendono solo dalla riga della griglia di
+    quel giorno, quindi una modifica di cella tocca solo il suo day_index.
+    """
+    duplicates: list = []
+    riposo_saltato: list = []
+    permesso_saltato: list = []
+    extra_absence_saltata: list = []  # FERIE/MALATTIA/INFORTUNIO pianificata
+
+    assigned = [pid for pid in grid_day.values() if pid is not None]
+
+    # Doppioni
+    counts: dict[str, int] = {}
+    for pid in assigned:
+        counts[pid] = counts.get(pid, 0) + 1
+    for pid, cnt in counts.items():
+        if cnt >= 2:
+            duplicates.append({"person_id": pid, "count": cnt})
+
+    # Riposo/permesso/extra saltati (pianificato durante assenza)
+    for shift_id, pid in grid_day.items():
+        if not pid:
+            continue
+
+        # extra blocca (ferie/malattia/infortunio)
+        extra_kind = extra_day.get(pid)
+        if extra_kind:
+            extra_absence_saltata.append({
+                "person_id": pid,
+                "kind": extra_kind,
+                "shift_id": shift_id,
+                "shift_name": shift_name_by_id.get(shift_id, ""),
+            })
+            continue
+
+        # riposo/permesso (warning)
+        rot_kind = rot_day.get(pid)
+        if rot_kind == "RIPOSO":
+            riposo_saltato.append({
+                "person_id": pid,
+                "shift_id": shift_id,
+                "shift_name": shift_name_by_id.get(shift_id, "")
+            })
+        elif rot_kind == "PERMESSO":
+            permesso_saltato.append({
+                "person_id": pid,
+                "shift_id": shift_id,
+                "shift_name": shift_name_by_id.get(shift_id, "")
+            })
+
+    # Non pianificati: escludi chi è assente (rotazione o extra)
+    assigned_set = set(assigned)
+    not_planned = [
+        pid for pid in active_ids
+        if pid not in assigned_set and pid not in rot_day and pid not in extra_day
+    ]
+
+    return {
         "duplicates": duplicates,
         "not_planned": not_planned,
         "riposo_saltato": riposo_saltato,
@@ -203,4 +500,280 @@ def build_grid_and_alerts(db: Session, week: models.Week):
         "extra_absence_saltata": extra_absence_saltata,
     }
 
-    return shifts, people_active, grid, alerts
\ No newline at end of file
+
+def _compute_alerts(shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day=None, days=None, border=None) -> dict:
+    # vale per una settimana (day 0..6) o per un periodo (day 0..N-1);
+    # days limita l'output ad alcuni giorni, ma i conflitti di orario guardano sempre tutta la griglia
+    # più i giorni prima del periodo (border, da _border)
+    active_ids = [p.id for p in people_active]
+    shift_name_by_id = {s.id: s.name for s in shifts}
+    days = list(grid) if days is None else days
+
+    alerts: dict[str, dict] = {kind: {} for kind in ALERT_KINDS}
+    for d in days:
+        day = _day_alerts(grid[d], active_ids, shift_name_by_id, rot_by_day[d], extra_by_day[d])
+        for kind in DAY_ALERT_KINDS:
+            alerts[kind][d] = day[kind]
+
+    border_grid, border_meta = border or ({}, {})
+    conflicts = time_conflicts(shifts, {**border_grid, **grid}, {**border_meta, **(meta_by_day or {})})
+    for kind in CONFLICT_KINDS:
+        for d in days:
+            alerts[kind][d] = conflicts[kind].get(d, [])
+    return alerts
+
+
+def build_grid_and_alerts(db: Session, week: models.Week):
+    shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day = _load_week(db, week)
+    alerts = _compute_alerts(
+        shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day, border=_border(db, week.monday_date),
+    )
+    return shifts, people_active, grid, alerts
+
+
+def autofill_week(db: Session, week: models.Week, keep_existing: bool = True):
+    """
+    Proposta di riempimento automatico della settimana (vedi autofill.autofill).
+    Ritorna le modifiche da applicare con set_cells e le celle rimaste vuote.
+    """
+    shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day = _load_week(db, week)
+    filled, unfilled = autofill(
+        shifts, people_active, grid, rot_by_day, extra_by_day, keep_existing=keep_existing,
+        meta_by_day=meta_by_day, border=_border(db, week.monday_date),
+    )
+    changes = [
+        schemas.CellUpdateIn(day_index=d, shift_id=shift_id, person_id=pid)
+        for d, row in filled.items()
+        for shift_id, pid in row.items()
+        if grid[d].get(shift_id) != pid
+    ]
+    return changes, unfilled
+
+
+def build_day_alerts(db: Session, week: models.Week, days: set[int]):
+    """
+    Ricalcolo incrementale dopo una scrittura: griglia e alert dei giorni
+    toccati e dei due successivi (un turno, anche notturno, finisce entro il
+    giorno dopo, e il riposo si misura da lì al turno seguente). Per i
+    conflitti di orario bastano i BORDER_DAYS giorni prima del primo giorno
+    ricalcolato, anche della settimana precedente: celle e meta si caricano
+    solo per quei giorni. Il risultato coincide con i giorni corrispondenti
+    del ricalcolo completo.
+    """
+    days = sorted({d + k for d in days for k in (0, 1, 2) if 0 <= d + k <= 6 and 0 <= d <= 6})
+    if not days:
+        return {}, {kind: {} for kind in ALERT_KINDS}
+    monday = week.monday_date
+
+    shifts = _shifts(db)
+    people_active = _active_people(db)
+    cells, loaded_meta = _cells_between(db, monday, days[0] - BORDER_DAYS, days[-1])
+    grid = {}
+    for d in range(max(0, days[0] - BORDER_DAYS), days[-1] + 1):
+        grid[d] = {s.id: None for s in shifts}
+        for shift_id, person_id in cells.get(d, {}).items():
+            if shift_id in grid[d]:
+                grid[d][shift_id] = person_id
+    border = ({d: row for d, row in cells.items() if d < 0}, {d: m for d, m in loaded_meta.items() if d < 0})
+    meta_by_day = {d: m for d, m in loaded_meta.items() if d >= 0}
+
+    alerts = _compute_alerts(
+        shifts, people_active, grid, rotation_by_day(people_active, monday, 7), _extra_by_day(db, monday),
+        meta_by_day, days=days, border=border,
+    )
+    return {d: grid[d] for d in days}, alerts
+
+
+def _touch_next_week(db: Session, monday: date):
+    # sabato e domenica entrano nei conflitti della settimana dopo (_border):
+    # nuovo ETag per la sua cache e reload per chi la sta guardando
+    next_monday = monday + timedelta(days=7)
+    bump_weeks_between(db, next_monday, next_monday)
+    events.publish_week(db, next_monday, {"type": "reload"})
+
+
+def _day_delta(db: Session, week: models.Week, days: set[int]):
+    # prima del commit: la stessa delta va nella risposta e nell'evento SSE, così gli altri client non ricaricano
+    if max(days) >= 7 - BORDER_DAYS:
+        _touch_next_week(db, week.monday_date)
+    db.flush()
+    return build_day_alerts(db, week, days)
+
+
+def build_range_plan(db: Session, start: date, end: date):
+    """
+    Motore multi-settimana (mese/trimestre): assegnazioni di tutte le settimane
+    del periodo con una sola query, turni/persone/assenze caricati una volta,
+    alert calcolati per giorno su tutto il periodo in un solo passaggio.
+    Griglia e alert sono indicizzati per data.
+    """
+    ndays = (end - start).days + 1
+
+    shifts = _shifts(db)
+    people_active = _active_people(db)
+
+    grid: dict[int, dict[str, str | None]] = {d: {s.id: None for s in shifts} for d in range(ndays)}
+
+    first_monday = start - timedelta(days=start.weekday())
+    cells = (
+        db.query(models.Week.monday_date, models.Assignment.day_index, models.Assignment.shift_id, models.Assignment.person_id)
+        .join(models.Week, models.Week.id == models.Assignment.week_id)
+        .filter(models.Week.monday_date >= first_monday, models.Week.monday_date <= end)
+        .all()
+    )
+    for monday_date, day_index, shift_id, person_id in cells:
+        if not 0 <= day_index <= 6:
+            continue
+        d = (monday_date - start).days + day_index
+        if 0 <= d < ndays and shift_id in grid[d]:
+            grid[d][shift_id] = person_id
+
+    meta_by_day: dict[int, dict] = {}
+    meta_rows = (
+        db.query(models.Week.monday_date, models.AssignmentMeta.day_index, models.AssignmentMeta.shift_id,
+                 models.AssignmentMeta.override_start_time, models.AssignmentMeta.override_end_time)
+        .join(models.Week, models.Week.id == models.AssignmentMeta.week_id)
+        .filter(models.Week.monday_date >= first_monday, models.Week.monday_date <= end)
+        .all()
+    )
+    for monday_date, day_index, shift_id, o_start, o_end in meta_rows:
+        d = (monday_date - start).days + day_index
+        if 0 <= d < ndays:
+            meta_by_day.setdefault(d, {})[shift_id] = {"override_start_time": o_start, "override_end_time": o_end}
+
+    extra_by_day = _extra_by_day(db, start, ndays)
+    rot_by_day = rotation_by_day(people_active, start, ndays)
+    alerts = _compute_alerts(shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day, border=_border(db, start))
+
+    dates = [start + timedelta(days=d) for d in range(ndays)]
+    grid_by_date = {dates[d]: row for d, row in grid.items()}
+    alerts_by_date = {kind: {dates[d]: v for d, v in by_day.items()} for kind, by_day in alerts.items()}
+    # nei conflitti di orario il giorno dell'altro turno è un offset del periodo
+    # (negativo se prima di start): aggiungo la data
+    for by_day in (alerts["sovrapposizioni"], alerts["riposo_insufficiente"]):
+        for items in by_day.values():
+            for it in items:
+                if "other_day_index" in it:
+                    it["other_date"] = start + timedelta(days=it["other_day_index"])
+                if "prev_day_index" in it:
+                    it["prev_date"] = start + timedelta(days=it["prev_day_index"])
+    return shifts, people_active, grid_by_date, alerts_by_date
+
+
+def _absences_out(rot_by_day, extra_by_day) -> dict:
+    # formato di /weeks/{monday}/absences
+    riposi = {d: [pid for pid, k in rot_by_day[d].items() if k == "RIPOSO"] for d in range(7)}
+    permessi = {d: [pid for pid, k in rot_by_day[d].items() if k == "PERMESSO"] for d in range(7)}
+    return {"riposi": riposi, "permessi": permessi, "extra": extra_by_day}
+
+
+def week_meta(db: Session, week: models.Week) -> dict:
+    """
+    Meta celle della settimana: day -> {shift_id: {override_start_time, override_end_time, role}}.
+    SAFE: se la tabella non è disponibile ritorna una griglia vuota invece di un 500.
+    """
+    out: dict[int, dict] = {d: {} for d in range(7)}
+    if week.id is None:
+        return out
+    try:
+        rows = db.query(models.AssignmentMeta).filter(models.AssignmentMeta.week_id == week.id).all()
+        for r in rows:
+            out[r.day_index][r.shift_id] = {
+                "override_start_time": r.override_start_time.isoformat() if r.override_start_time else None,
+                "override_end_time": r.override_end_time.isoformat() if r.override_end_time else None,
+                "role": r.role,
+            }
+    except SQLAlchemyError:
+        db.rollback()
+    return out
+
+
+def build_week_bundle(db: Session, week: models.Week) -> dict:
+    """
+    Tutto quello che serve a planning.js per aprire una settimana
+    (plan + absences + meta) con un unico set di query.
+    """
+    shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day = _load_week(db, week)
+    alerts = _compute_alerts(
+        shifts, people_active, grid, rot_by_day, extra_by_day, meta_by_day, border=_border(db, week.monday_date),
+    )
+    return {
+        "shifts": shifts,
+        "people": people_active,
+        "grid": grid,
+        "alerts": alerts,
+        "absences": _absences_out(rot_by_day, extra_by_day),
+        "meta": meta_by_day,
+    }
+
+
+def cached_week_bundle(db: Session, monday: date, etag: str) -> dict:
+    """
+    build_week_bundle servito dalla cache di processo quando la revisione
+    (etag di week_etag) è quella già calcolata. Turni e persone sono
+    copiati negli schemi Out, così non dipendono dalla sessione.
+    Su un miss le assenze vengono dall'indice, che get_index porta almeno
+    alla generazione vista dalla sessione: un etag che include una
+    scrittura di assenze (anche di un altro processo) non viene mai
+    associato a un bundle che non la contiene.
+    """
+    bundle = plan_cache.get(monday, etag)
+    if bundle is not None:
+        return bundle
+
+    bundle = build_week_bundle(db, week_or_empty(db, monday))
+    bundle["shifts"] = [schemas.ShiftOut.model_validate(s) for s in bundle["shifts"]]
+    bundle["people"] = [schemas.PersonOut.model_validate(p) for p in bundle["people"]]
+    plan_cache.put(monday, etag, bundle)
+    return bundle
+
+
+# -------- ELENCO ASSENZE (keyset) ----------
+def encode_absence_cursor(row) -> str:
+    return f"{row.start_date.isoformat()}_{row.id}"
+
+
+def decode_absence_cursor(cursor: str) -> tuple[date, str]:
+    # ValueError se il cursore non è valido
+    start, _, absence_id = cursor.partition("_")
+    if not absence_id:
+        raise ValueError(cursor)
+    return date.fromisoformat(start), absence_id
+
+
+def absences_query(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    person_id: str | None = None,
+    kind: str | None = None,
+    after: tuple[date, str] | None = None,
+    limit: int = 200,
+):
+    """
+    Pagina di assenze in ordine (start_date desc, id desc) che si
+    sovrappongono a [date_from, date_to]. La paginazione è keyset: si riparte
+    dopo l'ultima riga vista, quindi ogni pagina costa uguale qualunque sia
+    la sua posizione nello storico (indici della migrazione 0005).
+    """
+    X = models.ExtraAbsence
+    stmt = select(X)
+    if date_to is not None:
+        stmt = stmt.where(X.start_date <= date_to)
+    if date_from is not None:
+        stmt = stmt.where(X.end_date >= date_from)
+    if person_id:
+        stmt = stmt.where(X.person_id == person_id)
+    if kind:
+        stmt = stmt.where(X.kind == kind.upper().strip())
+    if after is not None:
+        stmt = stmt.where(tuple_(X.start_date, X.id) < tuple_(literal(after[0]), literal(after[1])))
+    return stmt.order_by(X.start_date.desc(), X.id.desc()).limit(limit)
+
+
+def list_absences(db: Session, limit: int = 200, **filters) -> tuple[list, str | None]:
+    # una riga in più per sapere se esiste la pagina successiva
+    rows = db.execute(absences_query(limit=limit + 1, **filters)).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_absence_cursor(rows[-1])
+    return rows, None
@@ -1,11 +1,125 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 class Base(DeclarativeBase):
     pass
 
-def make_engine(database_url: str):
-    return create_engine(database_url, pool_pre_ping=True)
+
+# -------- POOL ----------
+# always: ping a ogni checkout (un round trip in più per richiesta)
+# idle:   ping solo se la connessione è rimasta ferma nel pool più di ping_idle_s
+# off:    nessun ping, le connessioni morte si scoprono alla prima query (usare pool_recycle)
+PRE_PING_MODES = ("always", "idle", "off")
+
+def _pool_args(pool_size: int, max_overflow: int, pool_timeout: float, pool_recycle: int, pre_ping: str) -> dict:
+    if pre_ping not in PRE_PING_MODES:
+        raise ValueError(f"DB_PRE_PING deve essere uno fra {', '.join(PRE_PING_MODES)}")
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pre_ping == "always",
+    }
+
+def _ping_when_idle(engine, idle_s: float):
+    """
+    Ricetta "pessimistic disconnect" di SQLAlchemy limitata alle connessioni
+    rimaste ferme: se il ping fallisce DisconnectionError fa scartare la
+    connessione e il pool ne prova un'altra.
+    """
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        since = record.info.get("checked_in_at")
+        if since is None or time.monotonic() - since < idle_s:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise exc.DisconnectionError() from e
+
+def default_pool_class(database_url: str):
+    # il pool che create_engine sceglierebbe per l'URL (QueuePool per Postgres e per i file SQLite)
+    url = make_url(database_url)
+    return url.get_dialect().get_pool_class(url)
+
+def make_engine(
+    database_url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30,
+    pool_recycle: int = -1,
+    pre_ping: str = "always",
+    ping_idle_s: float = 30,
+    poolclass=None,
+):
+    engine = create_engine(
+        database_url, poolclass=poolclass or default_pool_class(database_url),
+        **_pool_args(pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping),
+    )
+    if pre_ping == "idle":
+        _ping_when_idle(engine, ping_idle_s)
+    return engine
 
 def make_session_local(engine):
     return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def pool_status(engine) -> dict:
+    # connessioni del QueuePool (anche per gli engine async: si passa sync_engine)
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+# -------- MODALITÀ ASYNC (DB_ASYNC) ----------
+# driver async per lo stesso DB: psycopg 3 è già async, SQLite passa da aiosqlite
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_url(database_url: str):
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"DB_ASYNC non supportato per {url.get_backend_name()}")
+    return url.set(drivername=driver)
+
+def make_async_engine(
+    database_url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30,
+    pool_recycle: int = -1,
+    pre_ping: str = "always",
+    ping_idle_s: float = 30,
+    poolclass=AsyncAdaptedQueuePool,
+):
+    # pool esplicito: aiosqlite userebbe NullPool (una connessione nuova per sessione)
+    engine = create_async_engine(
+        async_url(database_url), poolclass=poolclass,
+        **_pool_args(pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping),
+    )
+    if pre_ping == "idle":
+        # gli eventi del pool stanno sull'engine sync sottostante; il ping gira nel greenlet del checkout
+        _ping_when_idle(engine.sync_engine, ping_idle_s)
+    return engine
+
+def make_async_session_local(engine):
+    # expire_on_commit=False: dopo il commit gli oggetti si leggono fuori dal greenlet senza lazy load
+    return async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import profiling
+
+
+# -------- ESECUZIONE DEL CRUD DAGLI ENDPOINT ASYNC ----------
+# Le funzioni crud restano sync (ricevono una Session); l'endpoint async le
+# chiama con `await db.run(fn, *args)` e non tiene un thread durante l'attesa
+# del DB quando il DB è async. Stesso codice nelle due modalità (DB_ASYNC).
+# Le funzioni con calcolo pesante (griglia e alert, periodi lunghi, ricarica
+# dell'indice assenze) passano da `db.run_heavy`: sempre nel threadpool, così
+# il loop resta libero anche con DB_ASYNC.
+
+
+class SyncRunner:
+    """Session sync: ogni chiamata va nel threadpool (come un endpoint def)."""
+
+    is_async = False
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn, *args, **kwargs):
+        return await run_in_threadpool(profiling.profiled(fn), self.session, *args, **kwargs)
+
+    # già nel threadpool
+    run_heavy = run
+
+    async def close(self):
+        await run_in_threadpool(self.session.close)
+
+
+class AsyncRunner:
+    """
+    AsyncSession: la funzione gira con run_sync in un greenlet sul loop e
+    sospende la coroutine a ogni attesa del driver (psycopg async / aiosqlite),
+    senza occupare thread. Il calcolo Python resta sul loop, quindi qui passano
+    solo funzioni leggere (ETag, elenchi, scritture semplici).
+
+    run_heavy apre invece una Session sync dal pool corrispondente
+    (sync_sessions) e la usa nel threadpool, come SyncRunner: il loop continua
+    a servire le altre richieste mentre si calcolano griglia e alert.
+    """
+
+    is_async = True
+
+    def __init__(self, session: AsyncSession, sync_sessions):
+        self.session = session
+        self.sync_sessions = sync_sessions
+
+    async def run(self, fn, *args, **kwargs):
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    async def run_heavy(self, fn, *args, **kwargs):
+        def call():
+            with self.sync_sessions() as session:
+                return profiling.profiled(fn)(session, *args, **kwargs)
+
+        return await run_in_threadpool(call)
+
+    async def close(self):
+        await self.session.close()
+
+
+DBRunner = SyncRunner | AsyncRunner
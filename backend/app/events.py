@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from datetime import date, timedelta
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "turni_events"
+# pg_notify accetta payload fino a 8000 byte: oltre si manda solo "reload"
+MAX_PAYLOAD = 7500
+# eventi in coda per client lento; oltre si scarta e si chiede un reload
+QUEUE_SIZE = 100
+
+# header con cui il frontend identifica la pagina che scrive: riportato negli
+# eventi, così chi ha fatto la modifica non ricarica la propria eco
+CLIENT_ID_HEADER = b"x-client-id"
+_client_id: ContextVar[str | None] = ContextVar("events_client_id", default=None)
+
+
+class EventHub:
+    """
+    Fan-out in processo verso i client SSE di /weeks/{monday}/events.
+
+    Ogni client è una asyncio.Queue limitata registrata sul suo lunedì:
+    un client inattivo costa una coda vuota e una coroutine sospesa.
+    dispatch() è thread-safe (arriva dai thread degli endpoint sync o dal
+    listener LISTEN/NOTIFY) e consegna sul loop dell'app.
+    """
+
+    def __init__(self):
+        self._subs: dict[date, set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, monday: date) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subs.setdefault(monday, set()).add(q)
+        return q
+
+    def unsubscribe(self, monday: date, q: asyncio.Queue):
+        with self._lock:
+            subs = self._subs.get(monday)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    del self._subs[monday]
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+    def dispatch(self, message: dict):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._deliver, message)
+
+    def _deliver(self, message: dict):
+        start = date.fromisoformat(message["start"])
+        end = date.fromisoformat(message["end"])
+        with self._lock:
+            targets = [q for monday, subs in self._subs.items() if monday <= end and monday + timedelta(days=6) >= start for q in subs]
+        for q in targets:
+            try:
+                q.put_nowait(message["event"])
+            except asyncio.QueueFull:
+                # client troppo lento: svuota e chiedi di ricaricare
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait({"type": "reload"})
+
+
+hub = EventHub()
+
+# con Postgres gli eventi passano da NOTIFY (arrivano a tutti i worker),
+# altrimenti vengono consegnati solo a questo processo dopo il commit
+_use_notify = False
+
+
+def publish(db: Session, start: date, end: date, payload: dict):
+    """
+    Registra un evento per le settimane che toccano [start, end].
+    Parte solo se la transazione fa commit; un rollback lo scarta.
+    """
+    client_id = _client_id.get()
+    if client_id:
+        payload = {**payload, "client_id": client_id}
+    message = {"start": start.isoformat(), "end": end.isoformat(), "event": payload}
+    db.info.setdefault("pending_events", []).append(message)
+
+
+def publish_week(db: Session, monday: date, payload: dict):
+    publish(db, monday, monday + timedelta(days=6), {"monday_date": monday.isoformat(), **payload})
+
+
+def _encode(message: dict) -> str:
+    data = json.dumps(message, default=str)
+    if len(data) > MAX_PAYLOAD:
+        ev = message["event"]
+        data = json.dumps({**message, "event": {"type": "reload", "monday_date": ev.get("monday_date"), "client_id": ev.get("client_id")}})
+    return data
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session):
+    if not _use_notify or not session.info.get("pending_events"):
+        return
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    conn = session.connection()
+    for message in session.info.pop("pending_events"):
+        # consegnato da Postgres solo al commit
+        conn.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": CHANNEL, "payload": _encode(message)})
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session):
+    for message in session.info.pop("pending_events", []):
+        hub.dispatch(json.loads(_encode(message)))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session: Session):
+    session.info.pop("pending_events", None)
+
+
+class ClientIdMiddleware:
+    """Middleware ASGI: X-Client-Id della richiesta negli eventi che pubblica (anche dal threadpool)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        value = next((v for k, v in scope["headers"] if k == CLIENT_ID_HEADER), b"")
+        token = _client_id.set(value[:64].decode("latin-1") or None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _client_id.reset(token)
+
+
+# -------- LISTEN/NOTIFY (multi-worker) ----------
+_listener: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def _listen(dsn: str):
+    import psycopg
+
+    while not _stop.is_set():
+        try:
+            with psycopg.connect(dsn, autocommit=True) as conn:
+                conn.execute(f"LISTEN {CHANNEL}")
+                while not _stop.is_set():
+                    for n in conn.notifies(timeout=5):
+                        hub.dispatch(json.loads(n.payload))
+        except Exception:
+            log.exception("listener %s interrotto, riconnessione", CHANNEL)
+            time.sleep(2)
+
+
+def start(database_url: str, use_notify: bool = True):
+    global _use_notify, _listener
+    url = make_url(database_url)
+    _use_notify = use_notify and url.get_backend_name() == "postgresql"
+    if not _use_notify or _listener is not None:
+        return
+    dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+    _stop.clear()
+    _listener = threading.Thread(target=_listen, args=(dsn,), name="events-listener", daemon=True)
+    _listener.start()
+
+
+def stop():
+    global _listener
+    _stop.set()
+    _listener = None
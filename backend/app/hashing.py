@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import auth, metrics
+
+
+# -------- HASH PASSWORD FUORI DAL THREADPOOL ----------
+class HashOverloaded(Exception):
+    """Troppe richieste di hash in coda: meglio un 503 subito che un timeout."""
+
+
+HASH_SECONDS = metrics.Histogram("password_hash_seconds", "Verifica/calcolo pbkdf2, attesa in coda compresa", ("op",))
+HASH_REJECTED = metrics.Counter("password_hash_rejected_total", "Hash rifiutati per coda piena")
+
+
+class HashPool:
+    """
+    pbkdf2 in un pool di processi dedicato e limitato: i login non occupano
+    i thread che servono plan/celle e non competono per il GIL.
+    Al più `max_queue` operazioni fra in corso e in attesa; oltre si rifiuta.
+    workers=0: calcolo nel threadpool (sviluppo, ambienti senza processi).
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 64):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def start(self, workers: int | None = None, max_queue: int | None = None):
+        if workers is not None:
+            self.workers = workers
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if self.workers > 0 and self._executor is None:
+            # spawn: i figli non ereditano thread/connessioni del processo API
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def depth(self) -> int:
+        return self._pending
+
+    async def _run(self, op: str, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_queue:
+                HASH_REJECTED.inc()
+                raise HashOverloaded()
+            self._pending += 1
+        t0 = time.perf_counter()
+        try:
+            if self._executor is None:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            HASH_SECONDS.observe((op,), time.perf_counter() - t0)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run("verify", auth.verify_password, password, password_hash)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", auth.hash_password, password)
+
+
+pool = HashPool()
+
+metrics.Gauge("password_hash_queue_depth", "Hash in corso o in attesa", pool.depth)
+metrics.Gauge("password_hash_workers", "Processi dedicati agli hash (0 = threadpool)", lambda: pool.workers)
@@ -1,23 +1,28 @@
-from datetime import date, datetime, timedelta
-from io import BytesIO
+import asyncio
+import hmac
+import json
+import math
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from io import TextIOWrapper
 from typing import Optional
+from urllib.parse import unquote
 
-from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from jose import jwt, JWTError
 from pydantic_settings import BaseSettings
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-
-from . import models, schemas, auth, crud
-from .db import make_engine, make_session_local, Base
+from . import models, schemas, auth, crud, plan_cache, events, reports, bulk_import, metrics, profiling, principals, hashing, ratelimit, dbrun, pdf_export
+from .db import default_pool_class, make_engine, make_session_local, make_async_engine, make_async_session_local, pool_status
+from .dbrun import DBRunner
+from .principals import Principal
 
 
 # =========================
@@ -31,15 +36,115 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "http://localhost:3000,https://gestione-turni-ten.vercel.app"
     BOOTSTRAP_ADMIN_EMAIL: str
     BOOTSTRAP_ADMIN_PASSWORD: str
+    PLAN_CACHE_SIZE: int = 64
+    # eventi live tra worker via Postgres LISTEN/NOTIFY (ignorato con altri DB)
+    EVENTS_PG_NOTIFY: bool = True
+    # se valorizzato /metrics richiede "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN: str = ""
+    # POST /reports/rebuild solo con "Authorization: Bearer <MAINTENANCE_TOKEN>" (vuoto = endpoint spento)
+    MAINTENANCE_TOKEN: str = ""
+    # profilo cProfile di una richiesta con header X-Profile: 1 o ?profile=1 (solo utenti autenticati)
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "/tmp/gestione-turni-profiles"
+    PROFILE_KEEP: int = 20
+    # utenti autenticati in cache: nessuna query di auth per AUTH_CACHE_TTL_S secondi
+    AUTH_CACHE_TTL_S: float = 60.0
+    AUTH_CACHE_SIZE: int = 1024
+    # pbkdf2 in processi dedicati (0 = nel threadpool) e coda massima prima del 503
+    HASH_WORKERS: int = 2
+    HASH_MAX_QUEUE: int = 64
+    # token bucket sui tentativi di login: per IP e per account
+    LOGIN_IP_PER_MIN: float = 60
+    LOGIN_IP_BURST: int = 30
+    LOGIN_ACCOUNT_PER_MIN: float = 10
+    LOGIN_ACCOUNT_BURST: int = 10
+    # endpoint di settimane/plan/celle/meta/assenze su AsyncSession (psycopg async, aiosqlite in locale)
+    DB_ASYNC: bool = False
+    # pool per processo (vale anche per la replica e per il pool async)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 30
+    DB_POOL_RECYCLE_S: int = -1
+    # always | idle (ping solo dopo DB_PING_IDLE_S secondi fermi nel pool) | off
+    DB_PRE_PING: str = "idle"
+    DB_PING_IDLE_S: float = 30
+    # replica in sola lettura per plan/assenze/meta/persone/turni/PDF (vuoto = tutto sul primario)
+    DATABASE_READ_URL: str = ""
+    # PDF settimanali: render in processi dedicati (0 = threadpool), cache in memoria con spill su disco
+    PDF_WORKERS: int = 1
+    PDF_CACHE_MB: int = 32
+    PDF_CACHE_DISK_MB: int = 256
+    PDF_CACHE_DIR: str = ""
 
 
 settings = Settings()
 
-engine = make_engine(settings.DATABASE_URL)
-SessionLocal = make_session_local(engine)
-Base.metadata.create_all(bind=engine)
+POOL_ARGS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+    "pool_recycle": settings.DB_POOL_RECYCLE_S,
+    "pre_ping": settings.DB_PRE_PING,
+    "ping_idle_s": settings.DB_PING_IDLE_S,
+}
+# nome -> engine sync, per le statistiche dei pool (/metrics, /debug/pool)
+engines: dict = {}
+
+
+def make_sessions(url: str, name: str):
+    eng = make_engine(url, poolclass=metrics.timed_pool_class(default_pool_class(url)), **POOL_ARGS)
+    metrics.instrument_engine(eng)
+    engines[name] = eng
+    return eng, make_session_local(eng)
+
+
+def make_async_sessions(url: str, name: str):
+    eng = make_async_engine(url, poolclass=metrics.timed_pool_class(AsyncAdaptedQueuePool), **POOL_ARGS)
+    metrics.instrument_engine(eng.sync_engine)
+    engines[name] = eng.sync_engine
+    return eng, make_async_session_local(eng)
+
+
+engine, SessionLocal = make_sessions(settings.DATABASE_URL, "primary")
+# schema gestito da Alembic: cd backend && alembic upgrade head
+
+# letture sulla replica se configurata: può restare indietro di qualche istante,
+# ma le scritture rispondono già con griglia/alert letti dal primario
+read_engine, ReadSessionLocal = (
+    make_sessions(settings.DATABASE_READ_URL, "replica") if settings.DATABASE_READ_URL else (engine, SessionLocal)
+)
+
+# DB_ASYNC: pool async a parte per gli endpoint caldi, il resto dell'API resta sul pool sync
+async_engine = async_read_engine = None
+AsyncSessionLocal = AsyncReadSessionLocal = None
+if settings.DB_ASYNC:
+    async_engine, AsyncSessionLocal = make_async_sessions(settings.DATABASE_URL, "primary_async")
+    async_read_engine, AsyncReadSessionLocal = (
+        make_async_sessions(settings.DATABASE_READ_URL, "replica_async") if settings.DATABASE_READ_URL
+        else (async_engine, AsyncSessionLocal)
+    )
+
 
-app = FastAPI(title="Gestione Turni API")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    events.start(settings.DATABASE_URL, use_notify=settings.EVENTS_PG_NOTIFY)
+    hashing.pool.start(settings.HASH_WORKERS, settings.HASH_MAX_QUEUE)
+    pdf_export.renderer.start(settings.PDF_WORKERS)
+    yield
+    pdf_export.renderer.stop()
+    pdf_export.cache.clear()
+    hashing.pool.stop()
+    events.stop()
+    for eng in (async_engine, async_read_engine):
+        if eng is not None:
+            await eng.dispose()
+
+
+app = FastAPI(title="Gestione Turni API", lifespan=lifespan)
+profile_store = profiling.ProfileStore(settings.PROFILE_DIR, keep=settings.PROFILE_KEEP)
+if settings.PROFILING_ENABLED:
+    # prima di dichiarare le route: gli endpoint sync vengono avvolti dal profiler
+    app.router.route_class = profiling.ProfilingRoute
 
 origins = [o.strip() for o in (settings.CORS_ORIGINS or "").split(",") if o.strip()]
 if not origins:
@@ -52,6 +157,54 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(events.ClientIdMiddleware)
+# aggiunto dopo CORS = più esterno: misura anche le risposte di CORS
+app.add_middleware(metrics.MetricsMiddleware, timing_allow_origin=", ".join(origins))
+
+
+def profile_authorized(scope) -> bool:
+    # solo verifica del JWT (header Bearer o ?token=), senza DB: decide se profilare
+    token = None
+    for k, v in scope.get("headers", []):
+        if k == b"authorization" and v.lower().startswith(b"bearer "):
+            token = v[7:].decode("latin-1")
+    if token is None:
+        for part in scope.get("query_string", b"").decode("latin-1").split("&"):
+            if part.startswith("token="):
+                token = unquote(part[6:])
+    if not token:
+        return False
+    try:
+        return bool(jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"]).get("sub"))
+    except JWTError:
+        return False
+
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware, store=profile_store, authorize=profile_authorized)
+
+
+plan_cache.cache.maxsize = settings.PLAN_CACHE_SIZE
+principals.cache.maxsize = settings.AUTH_CACHE_SIZE
+principals.cache.ttl = settings.AUTH_CACHE_TTL_S
+pdf_export.cache.memory_bytes = settings.PDF_CACHE_MB << 20
+pdf_export.cache.disk_bytes = settings.PDF_CACHE_DISK_MB << 20
+pdf_export.cache.directory = settings.PDF_CACHE_DIR or None
+
+metrics.Gauge(
+    "plan_cache_events_total", "Contatori della cache dei piani settimanali",
+    lambda: {(k,): v for k, v in plan_cache.cache.stats().items() if k not in ("size", "maxsize")}, ("event",), kind="counter",
+)
+metrics.Gauge("plan_cache_size", "Settimane nella cache dei piani", lambda: plan_cache.cache.stats()["size"])
+metrics.Gauge("events_subscribers", "Client SSE collegati", events.hub.subscribers)
+metrics.Gauge(
+    "db_pool_connections", "Connessioni dei pool per engine (size, checked_out, checked_in, overflow)",
+    lambda: {(name, k): v for name, eng in engines.items() for k, v in pool_status(eng).items()}, ("engine", "state"),
+)
+metrics.Gauge(
+    "auth_cache_events_total", "Contatori della cache degli utenti autenticati",
+    lambda: {(k,): v for k, v in principals.cache.stats().items() if k in ("hits", "misses", "evictions", "invalidations")}, ("event",), kind="counter",
+)
 
 
 # =========================
@@ -65,44 +218,154 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    # endpoint in sola lettura: replica se configurata
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def open_runner(read_only: bool = False) -> DBRunner:
+    if settings.DB_ASYNC:
+        return dbrun.AsyncRunner(
+            (AsyncReadSessionLocal if read_only else AsyncSessionLocal)(),
+            ReadSessionLocal if read_only else SessionLocal,
+        )
+    return dbrun.SyncRunner((ReadSessionLocal if read_only else SessionLocal)())
+
+
+async def get_db_runner():
+    """
+    Per gli endpoint async: `await db.run(crud.fn, ...)` con AsyncSession se
+    DB_ASYNC, altrimenti con la Session sync nel threadpool. Griglia/alert e
+    periodi lunghi con `await db.run_heavy(...)`: sempre fuori dal loop.
+    """
+    db = open_runner()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_read_db_runner():
+    db = open_runner(read_only=True)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 # =========================
 # AUTH
 # =========================
 oauth2 = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
-def require_user(token: str = Depends(oauth2), db: Session = Depends(get_db)) -> models.User:
+def token_subject(token: str) -> tuple[str, int]:
+    """(utente, versione del token); i token senza "ver" valgono versione 0."""
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
         uid = payload.get("sub")
-        if not uid:
+        ver = payload.get("ver", 0)
+        if not uid or not isinstance(ver, int):
             raise HTTPException(status_code=401, detail="Token non valido")
     except JWTError:
         raise HTTPException(status_code=401, detail="Token non valido")
+    return uid, ver
 
+
+def load_principal(db: Session, uid: str, ver: int = 0) -> Principal:
     user = db.get(models.User, uid)
     if not user:
         raise HTTPException(status_code=401, detail="Utente non trovato")
-    return user
+    if user.token_version != ver:
+        # emesso prima dell'ultimo cambio password
+        raise HTTPException(status_code=401, detail="Token revocato, rifai login")
+
+    principal = Principal(id=user.id, email=user.email, token_version=user.token_version)
+    principals.cache.put(principal)
+    return principal
+
+
+def principal_from_token(token: str, db: Session | None = None) -> Principal:
+    """
+    JWT verificato ad ogni richiesta; l'utente si cerca sul DB solo se non è
+    nella cache dei principal. Senza db (SSE) si apre una sessione breve solo
+    in caso di miss.
+    """
+    uid, ver = token_subject(token)
+    principal = principals.cache.get(uid, ver)
+    if principal is not None:
+        return principal
+
+    if db is not None:
+        return load_principal(db, uid, ver)
+    db = SessionLocal()
+    try:
+        return load_principal(db, uid, ver)
+    finally:
+        db.close()
+
 
+def require_user(token: str = Depends(oauth2), db: Session = Depends(get_db)) -> Principal:
+    return principal_from_token(token, db)
 
-def require_user_from_query(token: str, db: Session) -> models.User:
+
+async def require_user_async(token: str = Depends(oauth2)) -> Principal:
+    # come require_user, per gli endpoint async: con la cache calda nessun thread e nessuna sessione
+    uid, ver = token_subject(token)
+    principal = principals.cache.get(uid, ver)
+    if principal is not None:
+        return principal
+    db = open_runner()
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-        uid = payload.get("sub")
-        if not uid:
-            raise HTTPException(status_code=401, detail="Token non valido")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token non valido")
+        return await db.run(load_principal, uid, ver)
+    finally:
+        await db.close()
+
+
+def check_query_token(token: str):
+    # gli stream SSE non devono tenere una connessione DB aperta: sessione breve solo se serve
+    principal_from_token(token)
 
-    user = db.get(models.User, uid)
-    if not user:
-        raise HTTPException(status_code=401, detail="Utente non trovato")
-    return user
+
+MAX_RANGE_DAYS = 366
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Imposta ETag sulla risposta; se il client ha già quella revisione
+    (If-None-Match) ritorna la 304 da restituire al posto del contenuto.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    response.headers.update(headers)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return None
 
 
 def parse_date(s: str) -> date:
-    return datetime.strptime(s, "%Y-%m-%d").date()
+    # data malformata: 400 come per il cursor, non un 500
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Data non valida: {s} (atteso YYYY-MM-DD)")
+
+
+def check_day_index(day_index: int):
+    # celle e meta: stesso controllo per scrittura singola, a blocchi e orari
+    if not 0 <= day_index <= 6:
+        raise HTTPException(status_code=400, detail="day_index deve essere tra 0 e 6")
 
 
 # =========================
@@ -127,36 +390,91 @@ def bootstrap_admin(db: Session = Depends(get_db)):
     return {"status": "created", "email": u.email}
 
 
-@app.post("/auth/login", response_model=schemas.TokenOut)
-def login(payload: schemas.LoginIn, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == payload.email).one_or_none()
-    if not user or not auth.verify_password(payload.password, user.password_hash):
-        raise HTTPException(status_code=401, detail="Credenziali non valide")
+# Login/cambio password sono async: la query va nel threadpool per il tempo
+# della sola query, pbkdf2 nel pool di processi (hashing.pool).
+login_ip_bucket = ratelimit.TokenBucket(settings.LOGIN_IP_PER_MIN, settings.LOGIN_IP_BURST)
+login_account_bucket = ratelimit.TokenBucket(settings.LOGIN_ACCOUNT_PER_MIN, settings.LOGIN_ACCOUNT_BURST)
+LOGIN_THROTTLED = metrics.Counter("login_throttled_total", "Tentativi di login rifiutati dal rate limit", ("scope",))
 
-    token = auth.create_access_token(subject=user.id, secret=settings.JWT_SECRET, expires_minutes=settings.JWT_EXPIRES_MIN)
-    return schemas.TokenOut(access_token=token)
+
+def throttle_login(request: Request, account: str):
+    ip = request.client.host if request.client else "-"
+    for scope, bucket, key in (("ip", login_ip_bucket, ip), ("account", login_account_bucket, account.strip().lower())):
+        wait = bucket.take(key)
+        if wait:
+            LOGIN_THROTTLED.inc((scope,))
+            raise HTTPException(
+                status_code=429,
+                detail=f"Troppi tentativi, riprova tra {math.ceil(wait)} secondi",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
 
 
-@app.post("/auth/token", response_model=schemas.TokenOut)
-def token(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form.username).one_or_none()
-    if not user or not auth.verify_password(form.password, user.password_hash):
+async def hash_call(coro):
+    try:
+        return await coro
+    except hashing.HashOverloaded:
+        raise HTTPException(status_code=503, detail="Server occupato, riprova", headers={"Retry-After": "1"})
+
+
+def user_by_email(email: str) -> tuple[str, str, int] | None:
+    db = SessionLocal()
+    try:
+        row = db.query(models.User.id, models.User.password_hash, models.User.token_version).filter(models.User.email == email).one_or_none()
+        return tuple(row) if row else None
+    finally:
+        db.close()
+
+
+async def login_token(request: Request, email: str, password: str) -> schemas.TokenOut:
+    throttle_login(request, email)
+    row = await run_in_threadpool(user_by_email, email)
+    if not row or not await hash_call(hashing.pool.verify(password, row[1])):
         raise HTTPException(status_code=401, detail="Credenziali non valide")
 
-    token = auth.create_access_token(subject=user.id, secret=settings.JWT_SECRET, expires_minutes=settings.JWT_EXPIRES_MIN)
+    token = auth.create_access_token(
+        subject=row[0], secret=settings.JWT_SECRET, expires_minutes=settings.JWT_EXPIRES_MIN, version=row[2],
+    )
     return schemas.TokenOut(access_token=token)
 
 
+@app.post("/auth/login", response_model=schemas.TokenOut)
+async def login(payload: schemas.LoginIn, request: Request):
+    return await login_token(request, payload.email, payload.password)
+
+
+@app.post("/auth/token", response_model=schemas.TokenOut)
+async def token(request: Request, form: OAuth2PasswordRequestForm = Depends()):
+    return await login_token(request, form.username, form.password)
+
+
 @app.post("/auth/change-password")
-def change_password(payload: schemas.ChangePasswordIn, db: Session = Depends(get_db), user: models.User = Depends(require_user)):
-    if not auth.verify_password(payload.current_password, user.password_hash):
+async def change_password(payload: schemas.ChangePasswordIn, request: Request, principal: Principal = Depends(require_user)):
+    throttle_login(request, principal.email)
+    row = await run_in_threadpool(user_by_email, principal.email)
+    if not row:
+        raise HTTPException(status_code=401, detail="Utente non trovato")
+    if not await hash_call(hashing.pool.verify(payload.current_password, row[1])):
         raise HTTPException(status_code=401, detail="Password attuale errata")
 
     if len(payload.new_password) < 8:
         raise HTTPException(status_code=400, detail="La nuova password deve avere almeno 8 caratteri")
 
-    user.password_hash = auth.hash_password(payload.new_password)
-    db.commit()
+    new_hash = await hash_call(hashing.pool.hash(payload.new_password))
+
+    def save():
+        db = SessionLocal()
+        try:
+            # nuova versione: i token emessi finora smettono di valere
+            db.query(models.User).filter(models.User.id == principal.id).update({
+                "password_hash": new_hash, "token_version": models.User.token_version + 1,
+            })
+            db.commit()
+        finally:
+            db.close()
+
+    await run_in_threadpool(save)
+    principals.cache.invalidate(principal.id)
     return {"status": "ok"}
 
 
@@ -164,21 +482,22 @@ def change_password(payload: schemas.ChangePasswordIn, db: Session = Depends(get
 # PEOPLE
 # =========================
 @app.get("/people", response_model=list[schemas.PersonOut])
-def list_people(db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+def list_people(db: Session = Depends(get_read_db), _: Principal = Depends(require_user)):
     return db.query(models.Person).order_by(models.Person.full_name).all()
 
 
 @app.post("/people", response_model=schemas.PersonOut)
-def create_person(p: schemas.PersonIn, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+def create_person(p: schemas.PersonIn, db: Session = Depends(get_db), _: Principal = Depends(require_user)):
     person = models.Person(full_name=p.full_name, notes=p.notes)
     db.add(person)
+    crud.bump_global(db)
     db.commit()
     db.refresh(person)
     return person
 
 
 @app.put("/people/{person_id}", response_model=schemas.PersonOut)
-def update_person(person_id: str, upd: schemas.PersonUpdate, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+def update_person(person_id: str, upd: schemas.PersonUpdate, db: Session = Depends(get_db), _: Principal = Depends(require_user)):
     person = db.get(models.Person, person_id)
     if not person:
         raise HTTPException(status_code=404, detail="Persona non trovata")
@@ -190,18 +509,20 @@ def update_person(person_id: str, upd: schemas.PersonUpdate, db: Session = Depen
     if upd.notes is not None:
         person.notes = upd.notes
 
+    crud.bump_global(db)
     db.commit()
     db.refresh(person)
     return person
 
 
 @app.put("/people/{person_id}/rotation", response_model=schemas.PersonOut)
-def set_rotation(person_id: str, payload: schemas.RotationIn, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+def set_rotation(person_id: str, payload: schemas.RotationIn, db: Session = Depends(get_db), _: Principal = Depends(require_user)):
     person = db.get(models.Person, person_id)
     if not person:
         raise HTTPException(status_code=404, detail="Persona non trovata")
 
     person.rotation_base_riposo_date = payload.base_riposo_date
+    crud.bump_global(db)
     db.commit()
     db.refresh(person)
     return person
@@ -211,12 +532,12 @@ def set_rotation(person_id: str, payload: schemas.RotationIn, db: Session = Depe
 # SHIFTS
 # =========================
 @app.get("/shifts", response_model=list[schemas.ShiftOut])
-def list_shifts(db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+def list_shifts(db: Session = Depends(get_read_db), _: Principal = Depends(require_user)):
     return db.query(models.Shift).order_by(models.Shift.sort_order).all()
 
 
 @app.post("/shifts", response_model=schemas.ShiftOut)
-def create_shift(payload: schemas.ShiftCreate, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+def create_shift(payload: schemas.ShiftCreate, db: Session = Depends(get_db), _: Principal = Depends(require_user)):
     max_order = db.query(models.Shift.sort_order).order_by(models.Shift.sort_order.desc()).first()
     next_order = (max_order[0] if max_order else 0) + 1
 
@@ -229,6 +550,7 @@ def create_shift(payload: schemas.ShiftCreate, db: Session = Depends(get_db), _:
         created_at=datetime.utcnow(),  # evita 500 su DB Render NOT NULL
     )
     db.add(row)
+    crud.bump_global(db)
     db.commit()
     db.refresh(row)
     return row
@@ -237,205 +559,523 @@ def create_shift(payload: schemas.ShiftCreate, db: Session = Depends(get_db), _:
 # =========================
 # ABSENCES CRUD
 # =========================
-@app.get("/absences", response_model=list[schemas.ExtraAbsenceOut])
-def list_absences(db: Session = Depends(get_db), _: models.User = Depends(require_user)):
-    return db.query(models.ExtraAbsence).order_by(models.ExtraAbsence.start_date.desc()).all()
+MAX_ABSENCES_PAGE = 1000
+EXPORT_PAGE = 1000
+
+
+def absence_filters(from_: Optional[str], to: Optional[str], person_id: Optional[str], kind: Optional[str], cursor: Optional[str]) -> dict:
+    filters = {
+        "date_from": parse_date(from_) if from_ else None,
+        "date_to": parse_date(to) if to else None,
+        "person_id": person_id,
+        "kind": kind,
+        "after": None,
+    }
+    if cursor:
+        try:
+            filters["after"] = crud.decode_absence_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cursor non valido")
+    return filters
+
+
+@app.get("/absences", response_model=schemas.ExtraAbsencePageOut)
+async def list_absences(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = Query(None),
+    person_id: Optional[str] = Query(None),
+    kind: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor della pagina precedente"),
+    limit: int = Query(200, ge=1, le=MAX_ABSENCES_PAGE),
+    db: DBRunner = Depends(get_read_db_runner),
+    _: Principal = Depends(require_user_async),
+):
+    """
+    Assenze che si sovrappongono a [from, to], dalla più recente.
+    Paginazione keyset: per la pagina dopo si ripassa next_cursor.
+    """
+    filters = absence_filters(from_, to, person_id, kind, cursor)
+    items, next_cursor = await db.run(crud.list_absences, limit=limit, **filters)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@app.get("/absences/export.ndjson")
+def export_absences(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = Query(None),
+    person_id: Optional[str] = Query(None),
+    kind: Optional[str] = Query(None),
+    token: str = Query(...),
+):
+    """
+    Export NDJSON (una assenza per riga) con gli stessi filtri dell'elenco.
+    Token in query come export.pdf, così il link si apre dal browser.
+    Legge a pagine keyset con una sessione propria, perché quella della
+    richiesta viene chiusa prima che lo streaming finisca: la memoria resta
+    quella di una pagina qualunque sia la dimensione dello storico.
+    """
+    check_query_token(token)
+    filters = absence_filters(from_, to, person_id, kind, None)
+
+    def rows():
+        db = ReadSessionLocal()
+        try:
+            while True:
+                page, next_cursor = crud.list_absences(db, limit=EXPORT_PAGE, **filters)
+                if page:
+                    yield "".join(schemas.ExtraAbsenceOut.model_validate(r).model_dump_json() + "\n" for r in page)
+                if not next_cursor:
+                    break
+                filters["after"] = crud.decode_absence_cursor(next_cursor)
+                db.expunge_all()
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        rows(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="assenze.ndjson"'},
+    )
 
 
 @app.post("/absences", response_model=schemas.ExtraAbsenceOut)
-def create_absence(payload: schemas.ExtraAbsenceIn, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+async def create_absence(payload: schemas.ExtraAbsenceIn, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
     kind = payload.kind.upper().strip()
     if kind not in ["FERIE", "MALATTIA", "INFORTUNIO"]:
         raise HTTPException(status_code=400, detail="kind deve essere FERIE/MALATTIA/INFORTUNIO")
     if payload.end_date < payload.start_date:
         raise HTTPException(status_code=400, detail="end_date deve essere >= start_date")
 
-    row = models.ExtraAbsence(
-        person_id=payload.person_id,
-        kind=kind,
-        start_date=payload.start_date,
-        end_date=payload.end_date,
-        notes=payload.notes,
-        created_at=datetime.utcnow(),
-    )
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return row
+    def save(db: Session):
+        row = models.ExtraAbsence(
+            person_id=payload.person_id,
+            kind=kind,
+            start_date=payload.start_date,
+            end_date=payload.end_date,
+            notes=payload.notes,
+            created_at=datetime.utcnow(),
+        )
+        db.add(row)
+        crud.bump_absences(db, row.start_date, row.end_date)
+        events.publish(db, row.start_date, row.end_date, {
+            "type": "absence", "action": "created", "person_id": row.person_id, "kind": row.kind,
+            "start_date": row.start_date.isoformat(), "end_date": row.end_date.isoformat(),
+        })
+        db.commit()
+        db.refresh(row)
+        return row
+
+    return await db.run(save)
+
+
+@app.delete("/absences/{absence_id}")
+async def delete_absence(absence_id: str, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    def delete(db: Session):
+        row = db.get(models.ExtraAbsence, absence_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Assenza non trovata")
+
+        crud.bump_absences(db, row.start_date, row.end_date)
+        events.publish(db, row.start_date, row.end_date, {
+            "type": "absence", "action": "deleted", "person_id": row.person_id, "kind": row.kind,
+            "start_date": row.start_date.isoformat(), "end_date": row.end_date.isoformat(),
+        })
+        db.delete(row)
+        db.commit()
+
+    await db.run(delete)
+    return {"status": "deleted"}
+
+
+# =========================
+# BULK IMPORT (CSV / NDJSON)
+# =========================
+@app.post("/import/{kind}", response_model=schemas.ImportReportOut)
+def import_rows(
+    kind: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv | ndjson (default: dal nome del file)"),
+    partial: bool = False,
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    _: Principal = Depends(require_user),
+):
+    """
+    Import massivo di persone (people), rotazioni (rotations) o assenze
+    (absences). Il file è letto riga per riga e caricato a batch in una
+    sola transazione; la risposta riporta gli errori per numero di riga.
+    """
+    if kind not in bulk_import.KINDS:
+        raise HTTPException(status_code=404, detail="Import non previsto (people/rotations/absences)")
+    fmt = (format or bulk_import.detect_format(file.filename, file.content_type)).lower()
+    if fmt not in bulk_import.FORMATS:
+        raise HTTPException(status_code=400, detail="format deve essere csv o ndjson")
+
+    stream = TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        records = bulk_import.iter_records(stream, fmt)
+        return bulk_import.run_import(db, kind, fmt, records, partial=partial, dry_run=dry_run)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Il file deve essere in UTF-8")
+    finally:
+        stream.detach()
 
 
 # =========================
 # WEEKS / PLAN / CELL
 # =========================
+# endpoint async: il DB passa da db.run (AsyncSession con DB_ASYNC, threadpool altrimenti)
 @app.get("/weeks/{monday}/plan", response_model=schemas.PlanOut)
-def get_plan(monday: str, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+async def get_plan(monday: str, request: Request, response: Response, db: DBRunner = Depends(get_read_db_runner), _: Principal = Depends(require_user_async)):
+    monday_date = parse_date(monday)
+    etag = await db.run(crud.week_etag, monday_date)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    b = await db.run_heavy(crud.cached_week_bundle, monday_date, etag)
+    return schemas.PlanOut(monday_date=monday_date, shifts=b["shifts"], people=b["people"], grid=b["grid"], alerts=b["alerts"])
+
+
+@app.get("/plan", response_model=schemas.PlanRangeOut)
+async def get_range_plan(
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    db: DBRunner = Depends(get_read_db_runner),
+    _: Principal = Depends(require_user_async),
+):
+    start = parse_date(from_)
+    end = parse_date(to)
+    if end < start:
+        raise HTTPException(status_code=400, detail="to deve essere >= from")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Periodo massimo {MAX_RANGE_DAYS} giorni")
+
+    shifts, people, grid, alerts = await db.run_heavy(crud.build_range_plan, start, end)
+    return schemas.PlanRangeOut(from_date=start, to_date=end, shifts=shifts, people=people, grid=grid, alerts=alerts)
+
+
+@app.get("/weeks/{monday}/bundle", response_model=schemas.WeekBundleOut)
+async def get_week_bundle(monday: str, request: Request, response: Response, db: DBRunner = Depends(get_read_db_runner), _: Principal = Depends(require_user_async)):
     monday_date = parse_date(monday)
-    week = crud.get_or_create_week(db, monday_date)
-    shifts, people, grid, alerts = crud.build_grid_and_alerts(db, week)
-    return schemas.PlanOut(monday_date=monday_date, shifts=shifts, people=people, grid=grid, alerts=alerts)
+    etag = await db.run(crud.week_etag, monday_date)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    bundle = await db.run_heavy(crud.cached_week_bundle, monday_date, etag)
+    return schemas.WeekBundleOut(monday_date=monday_date, **bundle)
 
 
 @app.put("/weeks/{monday}/cell")
-def put_cell(monday: str, payload: schemas.CellUpdateIn, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
-    week = crud.get_or_create_week(db, parse_date(monday))
-    crud.set_cell(db, week, payload.day_index, payload.shift_id, payload.person_id)
-    return {"status": "ok"}
+async def put_cell(monday: str, payload: schemas.CellUpdateIn, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    check_day_index(payload.day_index)
+    monday_date = parse_date(monday)
+
+    def save(db: Session):
+        week = crud.get_or_create_week(db, monday_date)
+        # solo il giorno toccato: il frontend aggiorna il suo stato senza ricaricare il plan
+        return crud.set_cell(db, week, payload.day_index, payload.shift_id, payload.person_id)
+
+    grid, alerts = await db.run_heavy(save)
+    return {"status": "ok", "grid": grid, "alerts": alerts}
+
+
+@app.put("/weeks/{monday}/cells")
+async def put_cells(monday: str, payload: schemas.CellsUpdateIn, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    for ch in payload.changes:
+        check_day_index(ch.day_index)
+    monday_date = parse_date(monday)
+
+    def save(db: Session):
+        week = crud.get_or_create_week(db, monday_date)
+        return crud.set_cells(db, week, payload.changes)
+
+    grid, alerts = await db.run_heavy(save)
+    return {"status": "ok", "grid": grid, "alerts": alerts}
+
+
+@app.post("/weeks/{monday}/autofill")
+async def autofill_week(monday: str, payload: schemas.AutofillIn, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    monday_date = parse_date(monday)
+
+    def fill(db: Session):
+        week = crud.week_or_empty(db, monday_date)
+        changes, unfilled = crud.autofill_week(db, week, keep_existing=payload.keep_existing)
+
+        if payload.dry_run:
+            return {"status": "dry_run", "changes": changes, "unfilled": unfilled}
+
+        if changes:
+            # la delta di set_cells (giorni toccati e seguenti), come PUT /cells
+            grid, alerts = crud.set_cells(db, crud.get_or_create_week(db, monday_date), changes)
+        else:
+            grid, alerts = crud.build_day_alerts(db, week, set(range(7)))
+        return {"status": "ok", "changes": len(changes), "unfilled": unfilled, "grid": grid, "alerts": alerts}
+
+    return await db.run_heavy(fill)
 
 
 @app.post("/weeks/{monday}/clear")
-def clear_week(monday: str, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
-    week = crud.get_or_create_week(db, parse_date(monday))
-    crud.clear_week(db, week)
+async def clear_week(monday: str, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    monday_date = parse_date(monday)
+
+    def clear(db: Session):
+        crud.clear_week(db, crud.get_week(db, monday_date))
+
+    await db.run(clear)
     return {"status": "cleared"}
 
 
 @app.post("/weeks/{monday}/copy-from/{prev_monday}")
-def copy_from(monday: str, prev_monday: str, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
-    dst = crud.get_or_create_week(db, parse_date(monday))
-    src = crud.get_or_create_week(db, parse_date(prev_monday))
-    crud.copy_week(db, src, dst)
+async def copy_from(monday: str, prev_monday: str, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    dst_monday, src_monday = parse_date(monday), parse_date(prev_monday)
+
+    def copy(db: Session):
+        dst = crud.get_or_create_week(db, dst_monday)
+        src = crud.get_week(db, src_monday)
+        crud.copy_week(db, src, dst)
+
+    await db.run(copy)
     return {"status": "copied"}
 
 
+MAX_REPLICATE_WEEKS = 53
+
+
+@app.post("/weeks/{monday}/replicate")
+async def replicate_week(monday: str, weeks: int = Query(..., ge=1), db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    if weeks > MAX_REPLICATE_WEEKS:
+        raise HTTPException(status_code=400, detail=f"Massimo {MAX_REPLICATE_WEEKS} settimane")
+    monday_date = parse_date(monday)
+
+    def replicate(db: Session):
+        src = crud.get_week(db, monday_date)
+        if src is None:
+            raise HTTPException(status_code=404, detail="Settimana sorgente vuota")
+        crud.replicate_week(db, src, weeks)
+
+    await db.run(replicate)
+    return {"status": "replicated", "weeks": weeks}
+
+
 # =========================
 # WEEK ABSENCES (ANTI-500)
 # =========================
 @app.get("/weeks/{monday}/absences")
-def get_week_absences(monday: str, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+async def get_week_absences(monday: str, request: Request, response: Response, db: DBRunner = Depends(get_read_db_runner), _: Principal = Depends(require_user_async)):
     monday_date = parse_date(monday)
-
-    riposi = {d: [] for d in range(7)}
-    permessi = {d: [] for d in range(7)}
-    extra = {d: {} for d in range(7)}
-
-    people = db.query(models.Person).filter(models.Person.is_active == True).all()
-    for p in people:
-        base = p.rotation_base_riposo_date
-        if not base:
-            continue
-        for d in range(7):
-            day_date = monday_date + timedelta(days=d)
-            diff = (day_date - base).days
-            mod = diff % 8
-            if mod == 0:
-                riposi[d].append(p.id)
-            elif mod == 1:
-                permessi[d].append(p.id)
-
-    week_start = monday_date
-    week_end = monday_date + timedelta(days=6)
-    rows = db.query(models.ExtraAbsence).filter(
-        models.ExtraAbsence.start_date <= week_end,
-        models.ExtraAbsence.end_date >= week_start
-    ).all()
-
-    for r in rows:
-        for d in range(7):
-            day_date = monday_date + timedelta(days=d)
-            if r.start_date <= day_date <= r.end_date:
-                extra[d][r.person_id] = r.kind
-
-    return {"monday_date": str(monday_date), "riposi": riposi, "permessi": permessi, "extra": extra}
+    etag = await db.run(crud.week_etag, monday_date)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    b = await db.run_heavy(crud.cached_week_bundle, monday_date, etag)
+    return {"monday_date": str(monday_date), **b["absences"]}
 
 
 # =========================
 # META (SAFE: never 500)
 # =========================
 @app.get("/weeks/{monday}/meta")
-def get_week_meta(monday: str, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
+async def get_week_meta(monday: str, request: Request, response: Response, db: DBRunner = Depends(get_read_db_runner), _: Principal = Depends(require_user_async)):
     monday_date = parse_date(monday)
-    week = crud.get_or_create_week(db, monday_date)
+    etag = await db.run(crud.week_etag, monday_date)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    b = await db.run_heavy(crud.cached_week_bundle, monday_date, etag)
+    return {"monday_date": str(monday_date), "meta": b["meta"]}
+
+
+@app.put("/weeks/{monday}/meta")
+async def put_week_meta(monday: str, payload: schemas.CellMetaUpdateIn, db: DBRunner = Depends(get_db_runner), _: Principal = Depends(require_user_async)):
+    check_day_index(payload.day_index)
+    monday_date = parse_date(monday)
+    if payload.role not in (None, "", "APERTURA", "CHIUSURA"):
+        raise HTTPException(status_code=400, detail="role deve essere APERTURA/CHIUSURA o null")
+
+    def save(db: Session):
+        week = crud.get_or_create_week(db, monday_date)
+        return crud.set_meta(
+            db, week, payload.day_index, payload.shift_id,
+            payload.override_start_time, payload.override_end_time, payload.role,
+        )
 
-    out = {d: {} for d in range(7)}
     try:
-        rows = db.query(models.AssignmentMeta).filter(models.AssignmentMeta.week_id == week.id).all()
-        for r in rows:
-            out[r.day_index][r.shift_id] = {
-                "override_start_time": r.override_start_time.isoformat() if r.override_start_time else None,
-                "override_end_time": r.override_end_time.isoformat() if r.override_end_time else None,
-                "role": r.role,
-            }
+        grid, alerts = await db.run_heavy(save)
     except SQLAlchemyError:
-        pass
+        return {"status": "ok"}
+    return {"status": "ok", "grid": grid, "alerts": alerts}
 
-    return {"monday_date": str(monday_date), "meta": out}
 
+# =========================
+# REPORTS (ore / turni / aperture-chiusure)
+# =========================
+@app.get("/reports/hours")
+def report_hours(
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    group: str = Query("month"),
+    db: Session = Depends(get_db),
+    _: Principal = Depends(require_user),
+):
+    start = parse_date(from_)
+    end = parse_date(to)
+    if end < start:
+        raise HTTPException(status_code=400, detail="to deve essere >= from")
+    if group not in reports.GROUPS:
+        raise HTTPException(status_code=400, detail="group deve essere week/month/total")
 
-@app.put("/weeks/{monday}/meta")
-def put_week_meta(monday: str, payload: schemas.CellMetaUpdateIn, db: Session = Depends(get_db), _: models.User = Depends(require_user)):
-    try:
-        monday_date = parse_date(monday)
-        week = crud.get_or_create_week(db, monday_date)
+    rows = reports.hours_report(db, start, end, group)
+    return {"from": str(start), "to": str(end), "group": group, "rows": rows}
 
-        if payload.role not in (None, "", "APERTURA", "CHIUSURA"):
-            raise HTTPException(status_code=400, detail="role deve essere APERTURA/CHIUSURA o null")
 
-        meta = db.query(models.AssignmentMeta).filter(
-            models.AssignmentMeta.week_id == week.id,
-            models.AssignmentMeta.day_index == payload.day_index,
-            models.AssignmentMeta.shift_id == payload.shift_id,
-        ).one_or_none()
+def bearer_matches(request: Request, token: str) -> bool:
+    return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}")
 
-        if meta is None:
-            meta = models.AssignmentMeta(
-                week_id=week.id,
-                day_index=payload.day_index,
-                shift_id=payload.shift_id,
-            )
-            db.add(meta)
 
-        meta.override_start_time = payload.override_start_time
-        meta.override_end_time = payload.override_end_time
-        meta.role = payload.role or None
+def require_maintenance(request: Request):
+    # manutenzione: token a parte come /metrics, non basta un utente qualsiasi
+    if not settings.MAINTENANCE_TOKEN:
+        raise HTTPException(status_code=404, detail="Manutenzione non attiva (MAINTENANCE_TOKEN)")
+    if not bearer_matches(request, settings.MAINTENANCE_TOKEN):
+        raise HTTPException(status_code=401, detail="Token di manutenzione non valido")
 
-        db.commit()
-        return {"status": "ok"}
-    except SQLAlchemyError:
-        return {"status": "ok"}
+
+@app.post("/reports/rebuild", include_in_schema=False, dependencies=[Depends(require_maintenance)])
+def report_rebuild(db: Session = Depends(get_db)):
+    return {"status": "rebuilt", "rows": reports.rebuild_all(db)}
+
+
+# =========================
+# LIVE EVENTS (SSE, token query come il PDF)
+# =========================
+SSE_PING_S = 15
+
+
+@app.get("/weeks/{monday}/events")
+async def week_events(monday: str, request: Request, token: str = Query(...)):
+    monday_date = parse_date(monday)
+    await run_in_threadpool(check_query_token, token)
+
+    async def stream():
+        q = events.hub.subscribe(monday_date)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    ev = await asyncio.wait_for(q.get(), timeout=SSE_PING_S)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {ev.get('type', 'message')}\ndata: {json.dumps(ev)}\n\n"
+        finally:
+            events.hub.unsubscribe(monday_date, q)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# =========================
+# DEBUG
+# =========================
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    if settings.METRICS_TOKEN:
+        if not bearer_matches(request, settings.METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Token metriche non valido")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def require_profiling():
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling non attivo (PROFILING_ENABLED)")
+
+
+@app.get("/debug/profiles")
+def list_profiles(_: Principal = Depends(require_user)):
+    require_profiling()
+    return profile_store.list()
+
+
+@app.get("/debug/profiles/{profile_id}")
+def download_profile(profile_id: str, _: Principal = Depends(require_user)):
+    require_profiling()
+    path = profile_store.pstats_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profilo non trovato")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"profile-{profile_id}.pstats")
+
+
+@app.get("/debug/profiles/{profile_id}/summary", response_class=PlainTextResponse)
+def profile_summary(
+    profile_id: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(40, ge=1, le=500),
+    _: Principal = Depends(require_user),
+):
+    require_profiling()
+    text = profile_store.summary(profile_id, sort=sort, limit=limit)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Profilo non trovato")
+    return text
+
+
+@app.get("/debug/pool")
+def debug_pool(_: Principal = Depends(require_user)):
+    return {name: pool_status(eng) for name, eng in engines.items()}
+
+
+@app.get("/debug/cache")
+def debug_cache(_: Principal = Depends(require_user)):
+    return {
+        "plan_cache": plan_cache.cache.stats(),
+        "auth_cache": principals.cache.stats(),
+        "pdf_cache": pdf_export.cache.stats(),
+        "event_subscribers": events.hub.subscribers(),
+    }
 
 
 # =========================
 # EXPORT PDF (token query)
 # =========================
 @app.get("/weeks/{monday}/export.pdf")
-def export_week_pdf(monday: str, token: str = Query(...), db: Session = Depends(get_db)):
-    require_user_from_query(token, db)
-
+async def export_week_pdf(monday: str, request: Request, token: str = Query(...)):
+    """
+    PDF della settimana, dalla cache se la revisione non è cambiata
+    (ETag = revisione della settimana). Il render gira nel pool di processi
+    di pdf_export; la connessione DB non resta aperta durante il render.
+    """
+    # utente cercato sul primario (sessione breve, solo se non in cache), dati dalla replica
+    await run_in_threadpool(check_query_token, token)
     monday_date = parse_date(monday)
-    week = crud.get_or_create_week(db, monday_date)
-    shifts, people_active, grid, _alerts = crud.build_grid_and_alerts(db, week)
-
-    people_by_id = {p.id: p.full_name for p in people_active}
-
-    day_names = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
-    headers = ["Turno"] + [
-        f"{day_names[i]} {(monday_date + timedelta(days=i)).strftime('%d/%m')}"
-        for i in range(7)
-    ]
-
-    data = [headers]
-    for s in shifts:
-        row = [s.name]
-        for d in range(7):
-            pid = grid.get(d, {}).get(s.id)
-            row.append(people_by_id.get(pid, "") if pid else "")
-        data.append(row)
-
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=landscape(A4))
-    styles = getSampleStyleSheet()
-    story = [Paragraph("Pianificazione Turni", styles["Title"]), Spacer(1, 12)]
-
-    table = Table(data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#1f2937")),
-        ("TEXTCOLOR", (0,0), (-1,0), colors.white),
-        ("GRID", (0,0), (-1,-1), 0.5, colors.HexColor("#cbd5e1")),
-        ("FONTSIZE", (0,0), (-1,-1), 9),
-    ]))
-    story.append(table)
-    doc.build(story)
-
-    buf.seek(0)
     filename = f"turni_{monday_date.strftime('%Y-%m-%d')}.pdf"
-    return StreamingResponse(buf, media_type="application/pdf", headers={"Content-Disposition": f'attachment; filename=\"{filename}\"'})
\ No newline at end of file
+
+    db = open_runner(read_only=True)
+    try:
+        week_etag = await db.run(crud.week_etag, monday_date)
+        etag = pdf_export.pdf_etag(week_etag)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        }
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        pdf = await run_in_threadpool(pdf_export.cache.get, monday_date, etag)
+        if pdf is None:
+            b = await db.run_heavy(crud.cached_week_bundle, monday_date, week_etag)
+    finally:
+        await db.close()
+
+    if pdf is None:
+        shifts = [(s.id, s.name) for s in b["shifts"]]
+        people_by_id = {p.id: p.full_name for p in b["people"]}
+        pdf = await pdf_export.renderer.render((monday_date, etag), monday_date, shifts, people_by_id, b["grid"])
+        await run_in_threadpool(pdf_export.cache.put, monday_date, etag, pdf)
+
+    # Response imposta Content-Length
+    return Response(pdf, media_type="application/pdf", headers=headers)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+
+# -------- METRICHE (formato testo Prometheus) ----------
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_lock = threading.Lock()
+_registry: list = []
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.values: dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, labels: tuple = (), value: float = 1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, v in sorted(self.values.items()):
+            out.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}")
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = SECONDS_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        # labels -> [conteggi per bucket..., somma, totale]
+        self.values: dict[tuple, list] = {}
+        _registry.append(self)
+
+    def observe(self, labels: tuple, value: float):
+        with _lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, row in sorted(self.values.items()):
+            for b, n in zip(self.buckets, row):
+                le = 'le="%s"' % _num(b)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {n}")
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {row[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(round(row[-2], 6))}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {row[-1]}")
+        return out
+
+
+class Gauge:
+    """
+    Valori letti al momento dello scrape (cache, code, pool...).
+    kind="counter" per contatori già tenuti altrove (es. hit della cache).
+    """
+
+    def __init__(self, name: str, help: str, fn, labelnames: tuple = (), kind: str = "gauge"):
+        # fn() -> numero, oppure {labels: numero} se ci sono label
+        self.name, self.help, self.fn, self.labelnames, self.kind = name, help, fn, labelnames, kind
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in sorted(items):
+            out.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}")
+        return out
+
+
+def render() -> str:
+    lines: list[str] = []
+    for m in list(_registry):
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Durata delle richieste HTTP", ("method", "route", "status"))
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "Query SQL per richiesta", ("method", "route"), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Tempo SQL per richiesta", ("method", "route"))
+DB_QUERIES = Counter("db_queries_total", "Query SQL eseguite")
+DB_ERRORS = Counter("db_errors_total", "Query SQL terminate con errore")
+POOL_CHECKOUT_SECONDS = Histogram("db_pool_checkout_seconds", "Attesa per ottenere una connessione dal pool (pre-ping compreso)")
+
+
+# -------- STATISTICHE PER RICHIESTA ----------
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    pool_seconds: float = 0.0
+
+
+# oggetto mutabile: il threadpool degli endpoint sync copia il contesto, non l'oggetto
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_t0"].pop()
+    DB_QUERIES.inc()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _on_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_t0"):
+        conn.info["metrics_t0"].pop()
+    DB_ERRORS.inc()
+
+
+_timed_pools: dict[type, type] = {}
+
+
+def timed_pool_class(base: type) -> type:
+    """
+    Sottoclasse del pool che misura connect() (attesa in coda + pre-ping):
+    si passa come poolclass a db.make_engine / make_async_engine, così il
+    pool nasce già misurato e recreate() dopo engine.dispose() la conserva.
+    """
+    cls = _timed_pools.get(base)
+    if cls is None:
+        def connect(self):
+            t0 = time.perf_counter()
+            try:
+                return base.connect(self)
+            finally:
+                elapsed = time.perf_counter() - t0
+                POOL_CHECKOUT_SECONDS.observe((), elapsed)
+                stats = _current.get()
+                if stats is not None:
+                    stats.pool_seconds += elapsed
+
+        cls = _timed_pools[base] = type(f"Timed{base.__name__}", (base,), {"connect": connect})
+    return cls
+
+
+def instrument_engine(engine):
+    """Conteggio/tempo delle query per l'engine dato (l'attesa sul pool la misura timed_pool_class)."""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+
+# -------- MIDDLEWARE ----------
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latenza per route (path del template, non l'URL, per non
+    esplodere di label), query e tempo SQL per richiesta, header Server-Timing
+    (app / db / pool) visibile nei devtools del browser.
+    Per gli stream (SSE) la durata è quella fino alla chiusura dello stream.
+    """
+
+    def __init__(self, app, timing_allow_origin: str = "", exclude: tuple = ("/metrics",)):
+        self.app = app
+        self.timing_allow_origin = timing_allow_origin
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                app_ms = (time.perf_counter() - t0) * 1000
+                timing = (
+                    f'app;dur={app_ms:.1f}, db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} query", '
+                    f"pool;dur={stats.pool_seconds * 1000:.1f}"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.encode()))
+                if self.timing_allow_origin:
+                    headers.append((b"timing-allow-origin", self.timing_allow_origin.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_SECONDS.observe((method, path, str(status)), time.perf_counter() - t0)
+            REQUEST_DB_QUERIES.observe((method, path), stats.queries)
+            REQUEST_DB_SECONDS.observe((method, path), stats.db_seconds)
@@ -11,6 +11,7 @@ from sqlalchemy import (
     Text,
     DateTime,
     ForeignKey,
+    Index,
     UniqueConstraint,
     func,
 )
@@ -27,11 +28,17 @@ class User(Base):
     id = Column(String, primary_key=True, default=gen_id)
     email = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
+    # nel JWT come "ver": il cambio password lo incrementa e revoca i token già emessi
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
 class Person(Base):
     __tablename__ = "people"
+    __table_args__ = (
+        Index("ix_people_active_name", "is_active", "full_name"),
+    )
+
     id = Column(String, primary_key=True, default=gen_id)
     full_name = Column(String, nullable=False)
     is_active = Column(Boolean, nullable=False, default=True)
@@ -55,13 +62,27 @@ class Week(Base):
     __tablename__ = "weeks"
     id = Column(String, primary_key=True, default=gen_id)
     monday_date = Column(Date, nullable=False, unique=True)
+    # incrementata ad ogni modifica che cambia plan/meta/absences della settimana (ETag)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
+class Revision(Base):
+    """
+    Contatori di revisione globali (es. "global": persone, rotazioni, turni),
+    combinati con Week.revision negli ETag.
+    """
+    __tablename__ = "revisions"
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
 class Assignment(Base):
     __tablename__ = "assignments"
     __table_args__ = (
         UniqueConstraint("week_id", "day_index", "shift_id", name="uq_assignment_cell"),
+        # copre la lettura della griglia (index-only)
+        Index("ix_assignments_week_cell", "week_id", "day_index", "shift_id", "person_id"),
     )
 
     id = Column(String, primary_key=True, default=gen_id)
@@ -104,6 +125,12 @@ class AssignmentMeta(Base):
 
 class ExtraAbsence(Base):
     __tablename__ = "extra_absences"
+    __table_args__ = (
+        Index("ix_extra_absences_dates", "start_date", "end_date"),
+        Index("ix_extra_absences_start_id", "start_date", "id"),
+        Index("ix_extra_absences_person_start_id", "person_id", "start_date", "id"),
+    )
+
     id = Column(String, primary_key=True, default=gen_id)
     person_id = Column(String, ForeignKey("people.id"), nullable=False)
     kind = Column(String, nullable=False)
@@ -112,4 +139,25 @@ class ExtraAbsence(Base):
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
 
-    person = relationship("Person")
\ No newline at end of file
+    person = relationship("Person")
+
+
+class PersonDayStat(Base):
+    """
+    Riepilogo materializzato per persona e giorno (minuti lavorati, turni,
+    aperture/chiusure), riscritto per settimana ad ogni modifica di celle o meta.
+    """
+    __tablename__ = "person_day_stats"
+    __table_args__ = (
+        Index("ix_person_day_stats_monday", "monday_date"),
+        Index("ix_person_day_stats_date", "work_date", "person_id"),
+    )
+
+    person_id = Column(String, ForeignKey("people.id"), primary_key=True)
+    work_date = Column(Date, primary_key=True)
+    monday_date = Column(Date, nullable=False)
+    month_date = Column(Date, nullable=False)  # primo giorno del mese
+    minutes = Column(Integer, nullable=False, default=0)
+    shifts = Column(Integer, nullable=False, default=0)
+    openings = Column(Integer, nullable=False, default=0)
+    closings = Column(Integer, nullable=False, default=0)
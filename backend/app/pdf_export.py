@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+
+from fastapi.concurrency import run_in_threadpool
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import metrics
+
+
+# -------- RENDER ----------
+# da incrementare quando cambia l'impaginazione: invalida ETag e cache dei PDF
+LAYOUT_VERSION = 1
+DAY_NAMES = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
+
+
+def render_week_pdf(monday_date: date, shifts: list[tuple[str, str]], people_by_id: dict[str, str], grid: dict) -> bytes:
+    """
+    PDF della settimana. Solo dati semplici in ingresso (turni come
+    (id, nome), nomi per id, griglia giorno -> turno -> persona), così gira
+    anche in un processo separato.
+    """
+    headers = ["Turno"] + [
+        f"{DAY_NAMES[i]} {(monday_date + timedelta(days=i)).strftime('%d/%m')}"
+        for i in range(7)
+    ]
+
+    data = [headers]
+    for shift_id, shift_name in shifts:
+        row = [shift_name]
+        for d in range(7):
+            pid = grid.get(d, {}).get(shift_id)
+            row.append(people_by_id.get(pid, "") if pid else "")
+        data.append(row)
+
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(A4))
+    styles = getSampleStyleSheet()
+    story = [Paragraph("Pianificazione Turni", styles["Title"]), Spacer(1, 12)]
+
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#1f2937")),
+        ("TEXTCOLOR", (0,0), (-1,0), colors.white),
+        ("GRID", (0,0), (-1,-1), 0.5, colors.HexColor("#cbd5e1")),
+        ("FONTSIZE", (0,0), (-1,-1), 9),
+    ]))
+    story.append(table)
+    doc.build(story)
+    return buf.getvalue()
+
+
+def pdf_etag(week_etag: str) -> str:
+    # stessa revisione della settimana + versione dell'impaginazione
+    return f'{week_etag[:-1]}.pdf{LAYOUT_VERSION}"'
+
+
+# -------- CACHE (memoria + disco) ----------
+class PdfCache:
+    """
+    PDF già generati, uno per settimana e valido solo per la revisione con
+    cui è stato generato (come plan_cache). LRU in memoria fino a
+    memory_bytes; i PDF espulsi dalla memoria passano su disco (directory
+    temporanea del processo) fino a disk_bytes, poi si scartano.
+    Un hit dal disco torna in memoria. Metodi sync con I/O su disco:
+    dagli endpoint async vanno chiamati nel threadpool.
+    """
+
+    def __init__(self, memory_bytes: int = 32 << 20, disk_bytes: int = 256 << 20, directory: str | None = None):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.directory = directory
+        self._memory: OrderedDict[date, tuple[str, bytes]] = OrderedDict()
+        self._disk: OrderedDict[date, tuple[str, str, int]] = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = 0
+        self._dir: str | None = None
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.spills = 0
+        self.evictions = 0
+
+    def get(self, monday: date, revision: str) -> bytes | None:
+        with self._lock:
+            entry = self._memory.get(monday)
+            if entry is not None and entry[0] == revision:
+                self._memory.move_to_end(monday)
+                self.hits_memory += 1
+                return entry[1]
+
+            disk = self._disk.get(monday)
+            if disk is None or disk[0] != revision:
+                self.misses += 1
+                return None
+            self._drop_disk(monday)
+            try:
+                with open(disk[1], "rb") as f:
+                    pdf = f.read()
+            except OSError:
+                self.misses += 1
+                return None
+            finally:
+                self._remove_file(disk[1])
+            self.hits_disk += 1
+            self._put_memory(monday, revision, pdf)
+            return pdf
+
+    def put(self, monday: date, revision: str, pdf: bytes):
+        with self._lock:
+            if monday in self._disk:
+                self._remove_file(self._drop_disk(monday)[1])
+            self._put_memory(monday, revision, pdf)
+
+    def _put_memory(self, monday: date, revision: str, pdf: bytes):
+        old = self._memory.pop(monday, None)
+        if old is not None:
+            self._memory_used -= len(old[1])
+        self._memory[monday] = (revision, pdf)
+        self._memory_used += len(pdf)
+        while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+            old_monday, (old_revision, old_pdf) = self._memory.popitem(last=False)
+            self._memory_used -= len(old_pdf)
+            self._spill(old_monday, old_revision, old_pdf)
+
+    def _spill(self, monday: date, revision: str, pdf: bytes):
+        if len(pdf) > self.disk_bytes:
+            self.evictions += 1
+            return
+        try:
+            if self._dir is None:
+                os.makedirs(self.directory or tempfile.gettempdir(), exist_ok=True)
+                self._dir = tempfile.mkdtemp(prefix="pdf-", dir=self.directory)
+            path = os.path.join(self._dir, f"{monday.isoformat()}.pdf")
+            with open(path, "wb") as f:
+                f.write(pdf)
+        except OSError:
+            self.evictions += 1
+            return
+        self._disk[monday] = (revision, path, len(pdf))
+        self._disk_used += len(pdf)
+        self.spills += 1
+        while self._disk_used > self.disk_bytes:
+            old_monday = next(iter(self._disk))
+            self._remove_file(self._drop_disk(old_monday)[1])
+            self.evictions += 1
+
+    def _drop_disk(self, monday: date) -> tuple[str, str, int]:
+        entry = self._disk.pop(monday)
+        self._disk_used -= entry[2]
+        return entry
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_used = self._disk_used = 0
+            if self._dir is not None:
+                shutil.rmtree(self._dir, ignore_errors=True)
+                self._dir = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_items": len(self._disk),
+                "disk_bytes": self._disk_used,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "spills": self.spills,
+                "evictions": self.evictions,
+            }
+
+
+# -------- POOL DI RENDER ----------
+RENDER_SECONDS = metrics.Histogram("pdf_render_seconds", "Generazione dei PDF settimanali, attesa in coda compresa")
+
+
+class RenderPool:
+    """
+    reportlab in processi dedicati (come gli hash in hashing.pool): il
+    calcolo non tiene il GIL del processo API. Richieste contemporanee per
+    la stessa settimana e revisione aspettano lo stesso render.
+    workers=0: render nel threadpool.
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        # usato solo dal loop: niente lock
+        self._inflight: dict[tuple[date, str], asyncio.Future] = {}
+
+    def start(self, workers: int | None = None):
+        if workers is not None:
+            self.workers = workers
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def pending(self) -> int:
+        return len(self._inflight)
+
+    async def render(self, key: tuple[date, str], *args) -> bytes:
+        # task a parte: se chi l'ha chiesto si disconnette, gli altri in attesa ricevono comunque il PDF
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: tuple[date, str], task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # evita "exception was never retrieved" se nessuno è rimasto in attesa
+            task.exception()
+
+    async def _render(self, *args) -> bytes:
+        t0 = time.perf_counter()
+        try:
+            if self._executor is None:
+                return await run_in_threadpool(render_week_pdf, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, render_week_pdf, *args)
+        finally:
+            RENDER_SECONDS.observe((), time.perf_counter() - t0)
+
+
+cache = PdfCache()
+renderer = RenderPool()
+
+metrics.Gauge(
+    "pdf_cache_events_total", "Contatori della cache dei PDF",
+    lambda: {(k,): v for k, v in cache.stats().items() if k in ("hits_memory", "hits_disk", "misses", "spills", "evictions")},
+    ("event",), kind="counter",
+)
+metrics.Gauge(
+    "pdf_cache_bytes", "Byte dei PDF in cache", lambda: {("memory",): cache.stats()["memory_bytes"], ("disk",): cache.stats()["disk_bytes"]},
+    ("tier",),
+)
+metrics.Gauge("pdf_render_inflight", "PDF in generazione", renderer.pending)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+
+class PlanCache:
+    """
+    LRU in processo dei bundle settimanali già calcolati
+    (shifts, people, grid, alerts, absences, meta).
+
+    Una voce per settimana, valida solo per la revisione (ETag) con cui è
+    stata calcolata: una lettura con revisione diversa è un miss.
+    Le scritture invalidano esplicitamente le sole settimane toccate.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._data: OrderedDict[date, tuple[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, monday: date, revision: str) -> dict | None:
+        with self._lock:
+            entry = self._data.get(monday)
+            if entry is None or entry[0] != revision:
+                self.misses += 1
+                return None
+            self._data.move_to_end(monday)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, monday: date, revision: str, value: dict):
+        with self._lock:
+            self._data[monday] = (revision, value)
+            self._data.move_to_end(monday)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_week(self, monday: date):
+        with self._lock:
+            if self._data.pop(monday, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_range(self, start: date, end: date):
+        # tutte le settimane che toccano [start, end]
+        first_monday = start - timedelta(days=start.weekday())
+        with self._lock:
+            for monday in [m for m in self._data if first_monday <= m <= end]:
+                del self._data[monday]
+                self.invalidations += 1
+
+    def invalidate_all(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = PlanCache()
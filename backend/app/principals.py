@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Utente autenticato come lo vedono gli endpoint (niente oggetto ORM legato alla sessione)."""
+    id: str
+    email: str
+    token_version: int = 0
+
+
+class PrincipalCache:
+    """
+    LRU in processo con scadenza degli utenti già verificati sul DB:
+    il JWT si verifica ad ogni richiesta (firma ed exp), l'esistenza
+    dell'utente e la versione dei token solo una volta ogni `ttl` secondi.
+
+    La chiave è (utente, versione del token): dopo un cambio password i
+    token nuovi non trovano mai la voce di quelli vecchi. In questo processo
+    la voce vecchia sparisce subito; negli altri worker scade al più entro `ttl`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[tuple[str, int], tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str, token_version: int = 0) -> Principal | None:
+        key = (user_id, token_version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal):
+        with self._lock:
+            key = (principal.id, principal.token_version)
+            self._data[key] = (time.monotonic() + self.ttl, principal)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        # tutte le versioni dell'utente
+        with self._lock:
+            for key in [k for k in self._data if k[0] == user_id]:
+                del self._data[key]
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = PrincipalCache()
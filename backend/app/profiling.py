@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import uuid4
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+
+# -------- PROFILING SU RICHIESTA ----------
+HEADER = "x-profile"
+QUERY_FLAG = "profile"
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{12}$")
+
+
+@dataclass
+class ProfileRequest:
+    profile: cProfile.Profile | None = None
+    seconds: float = 0.0
+
+
+_request: ContextVar[ProfileRequest | None] = ContextVar("profile_request", default=None)
+
+
+def profiled(fn):
+    """
+    Avvolge un endpoint sync (o una funzione che gira nel threadpool):
+    cProfile va attivato nel thread che esegue l'handler (e le sue query),
+    non nel thread del middleware. Più chiamate nella stessa richiesta
+    finiscono nello stesso profilo. functools.wraps conserva firma e
+    annotazioni per FastAPI.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        req = _request.get()
+        if req is None:
+            return fn(*args, **kwargs)
+        prof = req.profile or cProfile.Profile()
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            req.profile = prof
+            req.seconds += time.perf_counter() - t0
+
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    # gli endpoint async (SSE) girano nel loop condiviso: un profilo lì mescolerebbe altre richieste
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfileStore:
+    """
+    Ring buffer su disco: un .pstats + un .json di descrizione per profilo,
+    oltre `keep` profili si cancellano i più vecchi.
+    """
+
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{ext}")
+
+    def save(self, prof: cProfile.Profile, info: dict) -> str:
+        profile_id = uuid4().hex[:12]
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            prof.dump_stats(self._path(profile_id, "pstats"))
+            with open(self._path(profile_id, "json"), "w") as f:
+                json.dump({"id": profile_id, **info}, f)
+            self._prune()
+        return profile_id
+
+    def _prune(self):
+        items = self.list()
+        for item in items[self.keep:]:
+            for ext in ("pstats", "json"):
+                try:
+                    os.remove(self._path(item["id"], ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list[dict]:
+        # dal più recente
+        out = []
+        if not os.path.isdir(self.directory):
+            return out
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        out.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+        return out
+
+    def pstats_path(self, profile_id: str) -> str | None:
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = self._path(profile_id, "pstats")
+        return path if os.path.exists(path) else None
+
+    def summary(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> str | None:
+        path = self.pstats_path(profile_id)
+        if path is None:
+            return None
+        buf = io.StringIO()
+        pstats.Stats(path, stream=buf).strip_dirs().sort_stats(sort).print_stats(limit)
+        return buf.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Attiva il profilo della richiesta con header `X-Profile: 1` o `?profile=1`,
+    solo se authorize(scope) dà l'ok (token valido). A fine handler il profilo
+    va nello store e l'id torna nell'header X-Profile-Id.
+    """
+
+    def __init__(self, app, store: ProfileStore, authorize):
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+
+    def _requested(self, scope) -> bool:
+        for k, v in scope.get("headers", []):
+            if k == HEADER.encode() and v not in (b"", b"0", b"false"):
+                return True
+        query = scope.get("query_string", b"").decode("latin-1")
+        return any(part in (f"{QUERY_FLAG}=1", f"{QUERY_FLAG}=true") for part in query.split("&"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope) or not self.authorize(scope):
+            await self.app(scope, receive, send)
+            return
+
+        req = ProfileRequest()
+        token = _request.set(req)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start" and req.profile is not None:
+                route = scope.get("route")
+                # scrittura su disco fuori dal loop
+                profile_id = await run_in_threadpool(self.store.save, req.profile, {
+                    "created_at": datetime.utcnow().isoformat(timespec="milliseconds"),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": message["status"],
+                    "duration_ms": round(req.seconds * 1000, 2),
+                })
+                req.profile = None
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Token bucket per chiave (es. "ip:1.2.3.4", "account:mario@x.it"):
+    `burst` tentativi subito, poi `rate_per_min` al minuto.
+    In processo e limitato a `maxkeys` chiavi (le meno recenti si scartano).
+    """
+
+    def __init__(self, rate_per_min: float, burst: int, maxkeys: int = 10000):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.maxkeys = maxkeys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """0 se il tentativo è consentito, altrimenti i secondi da attendere."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxkeys:
+                self._buckets.popitem(last=False)
+            return wait
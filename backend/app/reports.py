@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+# -------- RIEPILOGO ORE (person_day_stats) ----------
+def _minutes(start, end) -> int:
+    # turno senza orari = conta come turno ma 0 minuti; fine <= inizio = turno notturno
+    if start is None or end is None:
+        return 0
+    s = start.hour * 60 + start.minute
+    e = end.hour * 60 + end.minute
+    if e <= s:
+        e += 24 * 60
+    return e - s
+
+
+def _refresh(db: Session, stats_where, cells_where):
+    # cancella le righe di stats_where e le ricalcola dalle assegnazioni di cells_where
+    db.flush()
+    db.execute(delete(models.PersonDayStat).where(stats_where))
+
+    A, M, S, W = models.Assignment, models.AssignmentMeta, models.Shift, models.Week
+    start_time = func.coalesce(M.override_start_time, S.start_time)
+    end_time = func.coalesce(M.override_end_time, S.end_time)
+    rows = db.execute(
+        select(A.person_id, W.monday_date, A.day_index, start_time, end_time, M.role, func.count())
+        .select_from(A)
+        .join(W, W.id == A.week_id)
+        .join(S, S.id == A.shift_id)
+        .outerjoin(M, and_(M.week_id == A.week_id, M.day_index == A.day_index, M.shift_id == A.shift_id))
+        .where(cells_where, A.person_id.isnot(None))
+        .group_by(A.person_id, W.monday_date, A.day_index, start_time, end_time, M.role)
+    ).all()
+
+    stats: dict[tuple[str, date], dict] = {}
+    for person_id, monday_date, day_index, st, en, role, cnt in rows:
+        work_date = monday_date + timedelta(days=day_index)
+        row = stats.setdefault((person_id, work_date), {
+            "person_id": person_id,
+            "work_date": work_date,
+            "monday_date": monday_date,
+            "month_date": work_date.replace(day=1),
+            "minutes": 0, "shifts": 0, "openings": 0, "closings": 0,
+        })
+        # SQLite restituisce gli orari coalesce come stringhe
+        if isinstance(st, str):
+            st = datetime.strptime(st[:5], "%H:%M").time()
+        if isinstance(en, str):
+            en = datetime.strptime(en[:5], "%H:%M").time()
+        row["minutes"] += _minutes(st, en) * cnt
+        row["shifts"] += cnt
+        if role == "APERTURA":
+            row["openings"] += cnt
+        elif role == "CHIUSURA":
+            row["closings"] += cnt
+
+    if stats:
+        db.execute(insert(models.PersonDayStat), list(stats.values()))
+
+
+def refresh_weeks(db: Session, first_monday: date, last_monday: date):
+    """
+    Ricalcola il riepilogo per persona/giorno delle settimane da first_monday
+    a last_monday. Una query aggregata (assegnazioni + turno + meta,
+    raggruppate per persona, giorno, orario effettivo e ruolo) e un insert
+    multi-riga. Va chiamata nella transazione della scrittura, prima del commit.
+    """
+    W, A = models.Week, models.Assignment
+    _refresh(
+        db,
+        models.PersonDayStat.monday_date.between(first_monday, last_monday),
+        and_(W.monday_date.between(first_monday, last_monday), A.day_index.between(0, 6)),
+    )
+
+
+def refresh_week(db: Session, monday: date):
+    refresh_weeks(db, monday, monday)
+
+
+def refresh_days(db: Session, monday: date, days: set[int]):
+    """
+    Come refresh_week, ma solo per i giorni toccati da una scrittura di celle
+    o meta: le righe degli altri giorni della settimana restano dove sono.
+    """
+    W, A = models.Week, models.Assignment
+    days = sorted(d for d in days if 0 <= d <= 6)
+    _refresh(
+        db,
+        models.PersonDayStat.work_date.in_([monday + timedelta(days=d) for d in days]),
+        and_(W.monday_date == monday, A.day_index.in_(days)),
+    )
+
+
+def rebuild_all(db: Session) -> int:
+    """Ricostruisce tutto il riepilogo (dati esistenti prima della tabella)."""
+    bounds = db.execute(select(func.min(models.Week.monday_date), func.max(models.Week.monday_date))).one()
+    if bounds[0] is None:
+        return 0
+    refresh_weeks(db, bounds[0], bounds[1])
+    db.commit()
+    return db.query(models.PersonDayStat).count()
+
+
+GROUPS = ("week", "month", "total")
+
+
+def hours_report(db: Session, start: date, end: date, group: str = "month") -> list[dict]:
+    """Ore, turni, aperture e chiusure per persona nel periodo, per settimana / mese / totale."""
+    P = models.PersonDayStat
+    key = {"week": P.monday_date, "month": P.month_date}.get(group)
+    cols = [P.person_id, models.Person.full_name]
+    if key is not None:
+        cols.append(key)
+
+    q = (
+        select(*cols, func.sum(P.minutes), func.sum(P.shifts), func.sum(P.openings), func.sum(P.closings))
+        .join(models.Person, models.Person.id == P.person_id)
+        .where(P.work_date.between(start, end))
+        .group_by(*cols)
+        .order_by(*([key] if key is not None else []), models.Person.full_name)
+    )
+
+    out = []
+    for r in db.execute(q).all():
+        person_id, full_name = r[0], r[1]
+        period = r[2] if key is not None else None
+        minutes, shifts, openings, closings = r[-4:]
+        out.append({
+            "person_id": person_id,
+            "full_name": full_name,
+            "period": period,
+            "minutes": int(minutes or 0),
+            "hours": round((minutes or 0) / 60, 2),
+            "shifts": int(shifts or 0),
+            "openings": int(openings or 0),
+            "closings": int(closings or 0),
+        })
+    return out
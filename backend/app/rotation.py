@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import date
+
+# -------- ROTAZIONE 8 GIORNI (riposo/permesso) ----------
+# Giorno base = RIPOSO, giorno dopo = PERMESSO, poi 6 giorni lavorativi.
+ROTATION_DAYS = 8
+RIPOSO = "RIPOSO"
+PERMESSO = "PERMESSO"
+
+
+def rot_kind(base: date | None, day_date: date) -> str | None:
+    if not base:
+        return None
+    mod = (day_date - base).days % ROTATION_DAYS
+    if mod == 0:
+        return RIPOSO
+    if mod == 1:
+        return PERMESSO
+    return None
+
+
+def rotation_by_day(people: list, start: date, ndays: int) -> dict[int, dict[str, str]]:
+    """
+    Calendario (persona x giorno) di riposi/permessi per il periodo
+    [start, start + ndays).
+
+    Il giorno d del periodo dipende solo da d % 8: ogni persona viene
+    collocata una volta sola nella sua fase (offset della data base
+    modulo 8) e i giorni del periodo condividono gli 8 dizionari di fase.
+    Costo O(persone + giorni) invece di persone x giorni.
+    I dizionari ritornati sono condivisi: vanno trattati in sola lettura.
+    """
+    by_phase: list[dict[str, str]] = [{} for _ in range(ROTATION_DAYS)]
+    for p in people:
+        base = getattr(p, "rotation_base_riposo_date", None)
+        if not base:
+            continue
+        offset = (start - base).days % ROTATION_DAYS
+        by_phase[-offset % ROTATION_DAYS][p.id] = RIPOSO
+        by_phase[(1 - offset) % ROTATION_DAYS][p.id] = PERMESSO
+    return {d: by_phase[d % ROTATION_DAYS] for d in range(ndays)}
@@ -52,6 +52,18 @@ class RotationIn(BaseModel):
     base_riposo_date: date
 
 
+class PersonImportIn(PersonIn):
+    is_active: bool = True
+    rotation_base_riposo_date: Optional[date] = None
+
+
+class RotationImportIn(BaseModel):
+    # persona per id oppure per nome (import da anagrafica esterna)
+    person_id: Optional[str] = None
+    full_name: Optional[str] = None
+    base_riposo_date: date
+
+
 # -------------------------
 # SHIFTS
 # -------------------------
@@ -91,6 +103,30 @@ class ExtraAbsenceIn(BaseModel):
     notes: Optional[str] = None
 
 
+class ExtraAbsenceImportIn(BaseModel):
+    person_id: Optional[str] = None
+    full_name: Optional[str] = None
+    kind: str
+    start_date: date
+    end_date: date
+    notes: Optional[str] = None
+
+
+class ImportErrorOut(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReportOut(BaseModel):
+    kind: str
+    format: str
+    status: str  # ok | rejected | dry_run
+    total: int
+    imported: int
+    errors_count: int
+    errors: List[ImportErrorOut]
+
+
 class ExtraAbsenceOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -102,6 +138,11 @@ class ExtraAbsenceOut(BaseModel):
     notes: Optional[str] = None
 
 
+class ExtraAbsencePageOut(BaseModel):
+    items: List[ExtraAbsenceOut]
+    next_cursor: Optional[str] = None
+
+
 # -------------------------
 # PLANNING
 # -------------------------
@@ -111,6 +152,15 @@ class CellUpdateIn(BaseModel):
     person_id: Optional[str] = None
 
 
+class CellsUpdateIn(BaseModel):
+    changes: List[CellUpdateIn]
+
+
+class AutofillIn(BaseModel):
+    keep_existing: bool = True  # celle già piene bloccate
+    dry_run: bool = False
+
+
 class PlanOut(BaseModel):
     monday_date: date
     shifts: List[ShiftOut]
@@ -119,6 +169,26 @@ class PlanOut(BaseModel):
     alerts: Dict
 
 
+class PlanRangeOut(BaseModel):
+    from_date: date
+    to_date: date
+    shifts: List[ShiftOut]
+    people: List[PersonOut]
+    grid: Dict[date, Dict[str, Optional[str]]]
+    alerts: Dict[str, Dict[date, List]]
+
+
+class WeekAbsencesOut(BaseModel):
+    riposi: Dict[int, List[str]]
+    permessi: Dict[int, List[str]]
+    extra: Dict[int, Dict[str, str]]
+
+
+class WeekBundleOut(PlanOut):
+    absences: WeekAbsencesOut
+    meta: Dict[int, Dict[str, Dict]]
+
+
 # -------------------------
 # META CELLA (orari override + apertura/chiusura)
 # -------------------------
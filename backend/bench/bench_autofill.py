@@ -0,0 +1,105 @@
+"""
+Benchmark autofill settimanale su roster sintetici.
+
+Misura tempo di risoluzione e qualità della soluzione: alert bloccanti
+(doppioni, extra absences saltate, riposi/permessi saltati), conflitti di
+orario (sovrapposizioni, riposo insufficiente), celle rimaste vuote e
+bilanciamento del carico (min/max turni per persona). I turni hanno orari
+veri: mattina, pomeriggio e notte a rotazione.
+
+    cd backend && python -m bench.bench_autofill
+    cd backend && python -m bench.bench_autofill --shifts 10 --people 300 --pinned 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+from types import SimpleNamespace
+
+from app.autofill import autofill
+from app.conflicts import CONFLICT_KINDS
+from app.crud import _compute_alerts
+from app.rotation import rotation_by_day
+
+
+BANDS = [("Mattina", 6, 14), ("Pomeriggio", 14, 22), ("Notte", 22, 6)]
+
+
+def _roster(rnd: random.Random, n_shifts: int, n_people: int, pinned: float, absent: float, monday: date):
+    shifts = [
+        SimpleNamespace(id=f"s{i}", name=f"{name} {i}", start_time=clock(start), end_time=clock(end))
+        for i, (name, start, end) in ((i, BANDS[i % len(BANDS)]) for i in range(n_shifts))
+    ]
+    people = [
+        SimpleNamespace(id=f"p{i}", rotation_base_riposo_date=monday - timedelta(days=rnd.randrange(8)))
+        for i in range(n_people)
+    ]
+    extra_by_day = {d: {} for d in range(7)}
+    for p in people:
+        if rnd.random() < absent:
+            first = rnd.randrange(7)
+            for d in range(first, min(7, first + rnd.randrange(1, 5))):
+                extra_by_day[d][p.id] = rnd.choice(["FERIE", "MALATTIA", "INFORTUNIO"])
+    grid = {d: {s.id: None for s in shifts} for d in range(7)}
+    for d in range(7):
+        for s in shifts:
+            if rnd.random() < pinned:
+                grid[d][s.id] = rnd.choice(people).id
+    return shifts, people, grid, rotation_by_day(people, monday, 7), extra_by_day
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shifts", type=int, default=10)
+    ap.add_argument("--people", type=int, default=300)
+    ap.add_argument("--pinned", type=float, default=0.2, help="quota di celle già piene (bloccate)")
+    ap.add_argument("--absent", type=float, default=0.1, help="quota di persone con ferie/malattia nella settimana")
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args()
+
+    rnd = random.Random(11)
+    monday = date(2026, 10, 12)
+    times, blocking, conflicts, unfilled_total, spreads = [], 0, 0, 0, []
+
+    for _ in range(args.runs):
+        shifts, people, grid, rot, extra = _roster(rnd, args.shifts, args.people, args.pinned, args.absent, monday)
+        t0 = time.perf_counter()
+        filled, unfilled = autofill(shifts, people, grid, rot, extra, keep_existing=True)
+        times.append(time.perf_counter() - t0)
+
+        # gli alert bloccanti contano solo sulle celle riempite dall'autofill
+        auto_only = {d: {sid: pid for sid, pid in row.items() if grid[d][sid] is None} for d, row in filled.items()}
+        alerts = _compute_alerts(shifts, people, filled, rot, extra)
+        auto_alerts = _compute_alerts(shifts, people, auto_only, rot, extra)
+        blocking += sum(
+            len(auto_alerts[k][d])
+            for k in ("extra_absence_saltata", "riposo_saltato", "permesso_saltato")
+            for d in range(7)
+        )
+        # doppioni e conflitti di orario introdotti dall'autofill (quelli fra celle bloccate esistevano già)
+        pinned_alerts = _compute_alerts(shifts, people, grid, rot, extra)
+        blocking += sum(len(alerts["duplicates"][d]) - len(pinned_alerts["duplicates"][d]) for d in range(7))
+        conflicts += sum(len(alerts[k][d]) - len(pinned_alerts[k][d]) for k in CONFLICT_KINDS for d in range(7))
+        unfilled_total += len(unfilled)
+
+        load = {p.id: 0 for p in people}
+        for row in filled.values():
+            for pid in row.values():
+                if pid in load:
+                    load[pid] += 1
+        spreads.append(max(load.values()) - min(load.values()))
+
+    times_ms = sorted(t * 1000 for t in times)
+    print(f"{args.shifts} turni x 7 giorni x {args.people} persone, {args.runs} roster")
+    print(f"  solve   p50 {statistics.median(times_ms):7.2f} ms   max {times_ms[-1]:7.2f} ms")
+    print(f"  alert bloccanti introdotti : {blocking}")
+    print(f"  conflitti orario introdotti: {conflicts}")
+    print(f"  celle rimaste vuote        : {unfilled_total}")
+    print(f"  carico max-min per persona : {max(spreads)}")
+
+
+if __name__ == "__main__":
+    main()
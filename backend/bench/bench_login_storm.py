@@ -0,0 +1,98 @@
+"""
+Latenza di /weeks/{monday}/plan durante una raffica di login.
+
+Avvia uvicorn su un DB sintetico (bench.dataset) e misura il plan prima e
+durante `--storm` client che fanno login in loop, con pbkdf2 nel threadpool
+(HASH_WORKERS=0) e nel pool di processi dedicato (HASH_WORKERS=--workers).
+Il rate limit dei login è alzato per misurare solo il carico di hashing.
+
+    cd backend && python -m bench.bench_login_storm
+    cd backend && python -m bench.bench_login_storm --storm 200 --seconds 10 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+
+from bench.dataset import ADMIN_EMAIL, ADMIN_PASSWORD, generate, migrate
+from bench.server import login, serve
+from bench.suite import _percentile
+
+
+async def _plan_poller(client: httpx.AsyncClient, url: str, headers: dict, until: float, out: list):
+    while time.monotonic() < until:
+        t0 = time.perf_counter()
+        r = await client.get(url, headers=headers)
+        r.raise_for_status()
+        out.append((time.perf_counter() - t0) * 1000)
+
+
+async def _login_loop(client: httpx.AsyncClient, base: str, until: float, stats: dict):
+    while time.monotonic() < until:
+        r = await client.post(f"{base}/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+        stats[r.status_code] = stats.get(r.status_code, 0) + 1
+
+
+async def _measure(base: str, monday: str, seconds: float, storm: int, pollers: int) -> dict:
+    limits = httpx.Limits(max_connections=storm + pollers + 4)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        headers = await login(client, base)
+        url = f"{base}/weeks/{monday}/plan"
+
+        result = {}
+        for phase, n_login in (("quiete", 0), ("raffica", storm)):
+            latencies: list[float] = []
+            logins: dict[int, int] = {}
+            until = time.monotonic() + seconds
+            await asyncio.gather(
+                *[_plan_poller(client, url, headers, until, latencies) for _ in range(pollers)],
+                *[_login_loop(client, base, until, logins) for _ in range(n_login)],
+            )
+            latencies.sort()
+            result[phase] = {
+                "plan_n": len(latencies),
+                "plan_p50_ms": round(_percentile(latencies, 50), 2),
+                "plan_p99_ms": round(_percentile(latencies, 99), 2),
+                "login_per_s": round(logins.get(200, 0) / seconds, 1),
+                "login_status": logins,
+            }
+        return result
+
+
+def _run_mode(url: str, monday: str, workers: int, args) -> dict:
+    with serve(url, args.port, HASH_WORKERS=workers, HASH_MAX_QUEUE=args.storm * 2) as base:
+        return asyncio.run(_measure(base, monday, args.seconds, args.storm, args.pollers))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=None, help="DB vuoto (default: SQLite temporaneo)")
+    ap.add_argument("--storm", type=int, default=100, help="client che fanno login in loop")
+    ap.add_argument("--pollers", type=int, default=4, help="client che leggono il plan")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--workers", type=int, default=2, help="HASH_WORKERS per il pool di processi")
+    ap.add_argument("--port", type=int, default=8799)
+    args = ap.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/storm.db"
+    migrate(url)
+    info = generate(create_engine(url), people=100, weeks=8, absences=500)
+    monday = info["week"]["monday_date"].isoformat()
+
+    for label, workers in (("threadpool (HASH_WORKERS=0)", 0), (f"processi (HASH_WORKERS={args.workers})", args.workers)):
+        res = _run_mode(url, monday, workers, args)
+        print(label)
+        for phase, r in res.items():
+            print(
+                f"  {phase:8} plan p50 {r['plan_p50_ms']:8.2f} ms  p99 {r['plan_p99_ms']:8.2f} ms  "
+                f"({r['plan_n']} richieste)   login/s {r['login_per_s']:6.1f}  {r['login_status']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
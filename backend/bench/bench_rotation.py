@@ -0,0 +1,67 @@
+"""
+Benchmark calendario rotazione riposi/permessi.
+
+Confronta il vecchio ciclo persona x giorno (un modulo 8 per cella) con
+rotation.rotation_by_day su 1.000 persone x 365 giorni.
+
+    cd backend && python -m bench.bench_rotation
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.rotation import rot_kind, rotation_by_day
+
+
+def _legacy_by_day(people, start: date, ndays: int) -> dict[int, dict[str, str]]:
+    out: dict[int, dict[str, str]] = {d: {} for d in range(ndays)}
+    for p in people:
+        for d in range(ndays):
+            kind = rot_kind(p.rotation_base_riposo_date, start + timedelta(days=d))
+            if kind:
+                out[d][p.id] = kind
+    return out
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--people", type=int, default=1000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rnd = random.Random(42)
+    start = date(2026, 1, 1)
+    people = [
+        SimpleNamespace(id=f"p{i}", rotation_base_riposo_date=start - timedelta(days=rnd.randrange(0, 400)))
+        for i in range(args.people)
+    ]
+
+    legacy = _legacy_by_day(people, start, args.days)
+    fast = rotation_by_day(people, start, args.days)
+    assert legacy == fast, "rotation_by_day diverge dal calcolo persona x giorno"
+
+    t_legacy = _best_of(lambda: _legacy_by_day(people, start, args.days), args.repeat)
+    t_fast = _best_of(lambda: rotation_by_day(people, start, args.days), args.repeat)
+
+    print(f"{args.people} persone x {args.days} giorni")
+    print(f"  persona x giorno : {t_legacy * 1000:9.2f} ms")
+    print(f"  rotation_by_day  : {t_fast * 1000:9.2f} ms")
+    print(f"  speedup          : {t_legacy / t_fast:9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+uvicorn in un sottoprocesso per i benchmark HTTP (bench_login_storm, bench_db_modes).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from bench.dataset import ADMIN_EMAIL, ADMIN_PASSWORD
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _wait_ready(base: str, timeout: float = 30):
+    async with httpx.AsyncClient() as client:
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < timeout:
+            try:
+                # qualunque risposta HTTP (anche 401) vuol dire che il server è su
+                await client.get(f"{base}/people")
+                return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn non risponde")
+
+
+@contextmanager
+def serve(url: str, port: int, **env):
+    """
+    Avvia l'API su `url` e ritorna il base URL; `env` sovrascrive le Settings.
+    Il rate limit dei login è alzato: i benchmark ripetono lo stesso account.
+    """
+    full_env = {
+        **os.environ,
+        "DATABASE_URL": url,
+        "JWT_SECRET": "bench-secret",
+        "BOOTSTRAP_ADMIN_EMAIL": ADMIN_EMAIL,
+        "BOOTSTRAP_ADMIN_PASSWORD": ADMIN_PASSWORD,
+        "EVENTS_PG_NOTIFY": "false",
+        "LOGIN_IP_PER_MIN": "1000000",
+        "LOGIN_IP_BURST": "1000000",
+        "LOGIN_ACCOUNT_PER_MIN": "1000000",
+        "LOGIN_ACCOUNT_BURST": "1000000",
+        **{k: str(v) for k, v in env.items()},
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=full_env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        asyncio.run(_wait_ready(base))
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+async def login(client: httpx.AsyncClient, base: str) -> dict:
+    r = await client.post(f"{base}/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
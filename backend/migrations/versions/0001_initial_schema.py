@@ -0,0 +1,108 @@
+"""initial schema
+
+Schema creato fino ad oggi da Base.metadata.create_all in main.py.
+Le tabelle già presenti (DB esistenti) vengono lasciate com'erano.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _created_at():
+    return sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now())
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(), nullable=False),
+            _created_at(),
+        )
+
+    if "people" not in existing:
+        op.create_table(
+            "people",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("notes", sa.Text(), nullable=True),
+            sa.Column("rotation_base_riposo_date", sa.Date(), nullable=True),
+            _created_at(),
+        )
+
+    if "shifts" not in existing:
+        op.create_table(
+            "shifts",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("start_time", sa.Time(), nullable=True),
+            sa.Column("end_time", sa.Time(), nullable=True),
+            sa.Column("notes", sa.Text(), nullable=True),
+            sa.Column("sort_order", sa.Integer(), nullable=False),
+            _created_at(),
+        )
+
+    if "weeks" not in existing:
+        op.create_table(
+            "weeks",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("monday_date", sa.Date(), nullable=False, unique=True),
+            _created_at(),
+        )
+
+    if "assignments" not in existing:
+        op.create_table(
+            "assignments",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("week_id", sa.String(), sa.ForeignKey("weeks.id"), nullable=False),
+            sa.Column("day_index", sa.Integer(), nullable=False),
+            sa.Column("shift_id", sa.String(), sa.ForeignKey("shifts.id"), nullable=False),
+            sa.Column("person_id", sa.String(), sa.ForeignKey("people.id"), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.UniqueConstraint("week_id", "day_index", "shift_id", name="uq_assignment_cell"),
+        )
+
+    if "assignment_meta" not in existing:
+        op.create_table(
+            "assignment_meta",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("week_id", sa.String(), sa.ForeignKey("weeks.id"), nullable=False),
+            sa.Column("day_index", sa.Integer(), nullable=False),
+            sa.Column("shift_id", sa.String(), sa.ForeignKey("shifts.id"), nullable=False),
+            sa.Column("override_start_time", sa.Time(), nullable=True),
+            sa.Column("override_end_time", sa.Time(), nullable=True),
+            sa.Column("role", sa.String(), nullable=True),
+            _created_at(),
+            sa.UniqueConstraint("week_id", "day_index", "shift_id", name="uq_assignment_meta_cell"),
+        )
+
+    if "extra_absences" not in existing:
+        op.create_table(
+            "extra_absences",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("person_id", sa.String(), sa.ForeignKey("people.id"), nullable=False),
+            sa.Column("kind", sa.String(), nullable=False),
+            sa.Column("start_date", sa.Date(), nullable=False),
+            sa.Column("end_date", sa.Date(), nullable=False),
+            sa.Column("notes", sa.Text(), nullable=True),
+            _created_at(),
+        )
+
+
+def downgrade() -> None:
+    for table in ["extra_absences", "assignment_meta", "assignments", "weeks", "shifts", "people", "users"]:
+        op.drop_table(table)
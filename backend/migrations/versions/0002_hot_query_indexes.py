@@ -0,0 +1,36 @@
+"""indici per le query calde (plan, absences, meta, people)
+
+- assignments(week_id, day_index, shift_id, person_id): la griglia della
+  settimana si legge dal solo indice (index-only scan)
+- extra_absences(start_date, end_date) e extra_absences(person_id)
+- people(is_active, full_name): persone attive già in ordine di nome
+
+assignment_meta.week_id è già coperto da uq_assignment_meta_cell
+(week_id in testa), così come weeks.monday_date dal suo vincolo unique:
+un indice in più costerebbe solo scritture.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_assignments_week_cell", "assignments", ["week_id", "day_index", "shift_id", "person_id"])
+    op.create_index("ix_extra_absences_dates", "extra_absences", ["start_date", "end_date"])
+    op.create_index("ix_extra_absences_person_id", "extra_absences", ["person_id"])
+    op.create_index("ix_people_active_name", "people", ["is_active", "full_name"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_people_active_name", table_name="people")
+    op.drop_index("ix_extra_absences_person_id", table_name="extra_absences")
+    op.drop_index("ix_extra_absences_dates", table_name="extra_absences")
+    op.drop_index("ix_assignments_week_cell", table_name="assignments")
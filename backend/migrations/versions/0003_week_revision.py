@@ -0,0 +1,29 @@
+"""revisione per settimana + contatori globali (ETag)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("weeks", sa.Column("revision", sa.Integer(), nullable=False, server_default="0"))
+    op.create_table(
+        "revisions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("value", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("revisions")
+    with op.batch_alter_table("weeks") as batch:
+        batch.drop_column("revision")
@@ -0,0 +1,114 @@
+"""riepilogo ore per persona e giorno (report)
+
+L'upgrade carica i dati esistenti (stesso calcolo di reports.refresh_weeks,
+con tabelle dichiarate qui per non dipendere dai modelli correnti); da lì in
+poi la tabella è aggiornata ad ogni scrittura di celle o meta. In modalità
+offline (--sql) il caricamento si salta: POST /reports/rebuild (con
+MAINTENANCE_TOKEN) dopo l'upgrade.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from datetime import datetime, timedelta
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH = 1000
+
+weeks = sa.table("weeks", sa.column("id", sa.String), sa.column("monday_date", sa.Date))
+shifts = sa.table("shifts", sa.column("id", sa.String), sa.column("start_time", sa.Time), sa.column("end_time", sa.Time))
+assignments = sa.table(
+    "assignments",
+    sa.column("week_id", sa.String), sa.column("day_index", sa.Integer),
+    sa.column("shift_id", sa.String), sa.column("person_id", sa.String),
+)
+assignment_meta = sa.table(
+    "assignment_meta",
+    sa.column("week_id", sa.String), sa.column("day_index", sa.Integer), sa.column("shift_id", sa.String),
+    sa.column("override_start_time", sa.Time), sa.column("override_end_time", sa.Time), sa.column("role", sa.String),
+)
+
+
+def _time(t):
+    # SQLite restituisce gli orari coalesce come stringhe
+    if isinstance(t, str):
+        return datetime.strptime(t[:5], "%H:%M").time()
+    return t
+
+
+def _minutes(start, end) -> int:
+    if start is None or end is None:
+        return 0
+    s = start.hour * 60 + start.minute
+    e = end.hour * 60 + end.minute
+    if e <= s:
+        e += 24 * 60
+    return e - s
+
+
+def _backfill(stats_table) -> None:
+    A, M, S, W = assignments, assignment_meta, shifts, weeks
+    start_time = sa.func.coalesce(M.c.override_start_time, S.c.start_time)
+    end_time = sa.func.coalesce(M.c.override_end_time, S.c.end_time)
+    rows = op.get_bind().execute(
+        sa.select(A.c.person_id, W.c.monday_date, A.c.day_index, start_time, end_time, M.c.role, sa.func.count())
+        .select_from(A)
+        .join(W, W.c.id == A.c.week_id)
+        .join(S, S.c.id == A.c.shift_id)
+        .outerjoin(M, sa.and_(M.c.week_id == A.c.week_id, M.c.day_index == A.c.day_index, M.c.shift_id == A.c.shift_id))
+        .where(A.c.person_id.isnot(None), A.c.day_index.between(0, 6))
+        .group_by(A.c.person_id, W.c.monday_date, A.c.day_index, start_time, end_time, M.c.role)
+    )
+
+    stats: dict = {}
+    for person_id, monday_date, day_index, st, en, role, cnt in rows:
+        work_date = monday_date + timedelta(days=day_index)
+        row = stats.setdefault((person_id, work_date), {
+            "person_id": person_id,
+            "work_date": work_date,
+            "monday_date": monday_date,
+            "month_date": work_date.replace(day=1),
+            "minutes": 0, "shifts": 0, "openings": 0, "closings": 0,
+        })
+        row["minutes"] += _minutes(_time(st), _time(en)) * cnt
+        row["shifts"] += cnt
+        if role == "APERTURA":
+            row["openings"] += cnt
+        elif role == "CHIUSURA":
+            row["closings"] += cnt
+
+    values = list(stats.values())
+    for i in range(0, len(values), BATCH):
+        op.bulk_insert(stats_table, values[i:i + BATCH])
+
+
+def upgrade() -> None:
+    stats_table = op.create_table(
+        "person_day_stats",
+        sa.Column("person_id", sa.String(), sa.ForeignKey("people.id"), primary_key=True),
+        sa.Column("work_date", sa.Date(), primary_key=True),
+        sa.Column("monday_date", sa.Date(), nullable=False),
+        sa.Column("month_date", sa.Date(), nullable=False),
+        sa.Column("minutes", sa.Integer(), nullable=False),
+        sa.Column("shifts", sa.Integer(), nullable=False),
+        sa.Column("openings", sa.Integer(), nullable=False),
+        sa.Column("closings", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_person_day_stats_monday", "person_day_stats", ["monday_date"])
+    op.create_index("ix_person_day_stats_date", "person_day_stats", ["work_date", "person_id"])
+    if not context.is_offline_mode():
+        _backfill(stats_table)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_person_day_stats_date", table_name="person_day_stats")
+    op.drop_index("ix_person_day_stats_monday", table_name="person_day_stats")
+    op.drop_table("person_day_stats")
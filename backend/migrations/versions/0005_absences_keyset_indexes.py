@@ -0,0 +1,30 @@
+"""indici per l'elenco assenze paginato (keyset su start_date, id)
+
+- extra_absences(start_date, id): pagine in ordine start_date desc, id desc
+  senza sort, ripartendo dal cursore con un range scan
+- extra_absences(person_id, start_date, id): stesso ordine filtrato per
+  persona; sostituisce extra_absences(person_id), che ne è un prefisso
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_extra_absences_start_id", "extra_absences", ["start_date", "id"])
+    op.create_index("ix_extra_absences_person_start_id", "extra_absences", ["person_id", "start_date", "id"])
+    op.drop_index("ix_extra_absences_person_id", table_name="extra_absences")
+
+
+def downgrade() -> None:
+    op.create_index("ix_extra_absences_person_id", "extra_absences", ["person_id"])
+    op.drop_index("ix_extra_absences_person_start_id", table_name="extra_absences")
+    op.drop_index("ix_extra_absences_start_id", table_name="extra_absences")
@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+from datetime import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# app.main legge le impostazioni all'import: DB SQLite del processo di test,
+# hash e PDF nel threadpool (niente processi figli)
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{tempfile.mkdtemp(prefix='turni-test-')}/api.db",
+    JWT_SECRET="test-secret",
+    BOOTSTRAP_ADMIN_EMAIL="admin@example.com",
+    BOOTSTRAP_ADMIN_PASSWORD="password1",
+    HASH_WORKERS="0",
+    PDF_WORKERS="0",
+    EVENTS_PG_NOTIFY="false",
+)
+ADMIN = {"email": "admin@example.com", "password": "password1"}
+
+from app import absence_index, models  # noqa: E402
+from app.db import Base, make_session_local  # noqa: E402
+from app.plan_cache import cache as plan_cache  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine):
+    # cache e indice sono globali di processo: ogni test parte da zero
+    plan_cache.invalidate_all()
+    absence_index.invalidate()
+    yield make_session_local(engine)
+    plan_cache.invalidate_all()
+    absence_index.invalidate()
+
+
+@pytest.fixture
+def db(sessions):
+    session = sessions()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def seed(db):
+    """3 turni e 5 persone attive."""
+    shifts = [
+        models.Shift(name=f"T{i}", start_time=time(6 + 6 * i), end_time=time((12 + 6 * i) % 24), sort_order=i)
+        for i in range(3)
+    ]
+    people = [models.Person(full_name=f"P{i}") for i in range(5)]
+    db.add_all(shifts + people)
+    db.commit()
+    return shifts, people
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    TestClient sull'app vera (lifespan compreso) con schema ricreato, admin
+    autenticato e stato di processo azzerato (cache, rate limit).
+    """
+    from fastapi.testclient import TestClient
+
+    from app import main, pdf_export, principals, ratelimit
+
+    Base.metadata.drop_all(bind=main.engine)
+    Base.metadata.create_all(bind=main.engine)
+    plan_cache.invalidate_all()
+    absence_index.invalidate()
+    pdf_export.cache.clear()
+    monkeypatch.setattr(principals, "cache", principals.PrincipalCache())
+    monkeypatch.setattr(main, "login_ip_bucket", ratelimit.TokenBucket(1e6, 10 ** 6))
+    monkeypatch.setattr(main, "login_account_bucket", ratelimit.TokenBucket(1e6, 10 ** 6))
+
+    with TestClient(main.app) as client:
+        client.post("/auth/bootstrap-admin")
+        token = client.post("/auth/login", json=ADMIN).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+    plan_cache.invalidate_all()
+    absence_index.invalidate()
+
+
+def ok(r):
+    assert r.status_code < 300, (r.status_code, r.text)
+    return r.json() if r.headers.get("content-type", "").startswith("application/json") else r
+
+
+@pytest.fixture
+def api_seed(api):
+    """3 turni e 5 persone via API: (turni, persone) come JSON."""
+    for i in range(3):
+        ok(api.post("/shifts", json={"name": f"T{i}", "start_time": f"{6 + 6 * i:02d}:00:00", "end_time": f"{(12 + 6 * i) % 24:02d}:00:00"}))
+    people = [ok(api.post("/people", json={"full_name": f"P{i}"})) for i in range(5)]
+    return ok(api.get("/shifts")), people
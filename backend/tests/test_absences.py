@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+from sqlalchemy import func, select, update
+
+from conftest import ok
+
+from app import absence_index, crud, models
+
+MONDAY = date(2024, 3, 4)
+
+
+def _absence_from_other_process(session, person_id: str, start: date, end: date):
+    """
+    Quello che scrive un altro worker: riga, revisione delle settimane e
+    generazione delle assenze, senza toccare cache e indice di questo processo.
+    """
+    session.add(models.ExtraAbsence(person_id=person_id, kind="FERIE", start_date=start, end_date=end))
+    session.execute(
+        update(models.Week).where(models.Week.monday_date.between(start, end)).values(revision=models.Week.revision + 1)
+    )
+    crud._bump_revision(session, absence_index.REVISION)
+    session.commit()
+
+
+def test_index_reloads_when_generation_advances(sessions, db, seed):
+    _, people = seed
+    assert absence_index.get_index(db).kind_on(people[0].id, MONDAY) is None
+
+    other = sessions()
+    _absence_from_other_process(other, people[0].id, MONDAY, MONDAY)
+    other.close()
+
+    db.rollback()
+    assert absence_index.get_index(db).kind_on(people[0].id, MONDAY) == "FERIE"
+
+
+def test_cached_bundle_follows_other_process_writes(sessions, db, seed):
+    _, people = seed
+    crud.get_or_create_week(db, MONDAY)
+    db.commit()
+
+    etag = crud.week_etag(db, MONDAY)
+    assert crud.cached_week_bundle(db, MONDAY, etag)["absences"]["extra"][1] == {}
+
+    other = sessions()
+    _absence_from_other_process(other, people[1].id, MONDAY, MONDAY + timedelta(days=1))
+    other.close()
+
+    db.rollback()
+    new_etag = crud.week_etag(db, MONDAY)
+    assert new_etag != etag
+    bundle = crud.cached_week_bundle(db, MONDAY, new_etag)
+    assert bundle["absences"]["extra"][1] == {people[1].id: "FERIE"}
+
+
+def test_etag_of_missing_week_follows_absences(sessions, db, seed):
+    _, people = seed
+    etag = crud.week_etag(db, MONDAY)
+    assert crud.cached_week_bundle(db, MONDAY, etag)["absences"]["extra"][0] == {}
+
+    other = sessions()
+    _absence_from_other_process(other, people[2].id, MONDAY, MONDAY)
+    other.close()
+
+    db.rollback()
+    new_etag = crud.week_etag(db, MONDAY)
+    assert new_etag != etag
+    assert crud.cached_week_bundle(db, MONDAY, new_etag)["absences"]["extra"][0] == {people[2].id: "FERIE"}
+    assert db.scalar(select(func.count()).select_from(models.Week)) == 0
+
+
+def test_bump_absences_only_updates_existing_weeks(db, seed):
+    crud.get_or_create_week(db, MONDAY)
+    db.commit()
+
+    crud.bump_absences(db, date(2024, 1, 1), date(2999, 12, 31))
+    db.commit()
+
+    weeks = db.query(models.Week).all()
+    assert [(w.monday_date, w.revision) for w in weeks] == [(MONDAY, 1)]
+    assert absence_index.generation(db) == 1
+
+
+def test_absences_endpoint_pages_and_filters(api, api_seed):
+    _, people = api_seed
+    rows = []
+    for i in range(7):
+        start = MONDAY + timedelta(days=3 * i)
+        rows.append(ok(api.post("/absences", json={
+            "person_id": people[i % 2]["id"], "kind": ("FERIE", "MALATTIA")[i % 3 == 0],
+            "start_date": str(start), "end_date": str(start + timedelta(days=1)),
+        })))
+    newest_first = [r["id"] for r in sorted(rows, key=lambda r: (r["start_date"], r["id"]), reverse=True)]
+
+    # giro completo dei cursori: tutte le righe, una volta sola, in ordine
+    seen, cursor = [], None
+    while True:
+        page = ok(api.get("/absences", params={"limit": 3, **({"cursor": cursor} if cursor else {})}))
+        seen += [r["id"] for r in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == newest_first
+
+    def ids(**params):
+        return {r["id"] for r in ok(api.get("/absences", params=params))["items"]}
+
+    # sovrapposizione con [from, to]: comprese le assenze che iniziano prima
+    window = ids(**{"from": str(MONDAY + timedelta(days=4)), "to": str(MONDAY + timedelta(days=6))})
+    assert window == {rows[1]["id"], rows[2]["id"]}
+    assert ids(person_id=people[1]["id"]) == {r["id"] for r in rows[1::2]}
+    assert ids(kind="malattia") == {r["id"] for r in rows if r["kind"] == "MALATTIA"}
+
+    assert api.get("/absences", params={"cursor": "non-un-cursor"}).status_code == 400
+    assert api.get("/absences", params={"from": "2024-03-32"}).status_code == 400
+    assert api.get("/absences", params={"to": "ieri"}).status_code == 400
@@ -0,0 +1,96 @@
+from conftest import ADMIN, ok
+
+import asyncio
+
+import pytest
+
+from app import auth, hashing, main, models, principals, ratelimit
+
+PLAN = "/weeks/2024-03-04/plan"
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _admin_id() -> str:
+    with main.SessionLocal() as db:
+        return db.query(models.User.id).filter(models.User.email == ADMIN["email"]).scalar()
+
+
+def test_password_change_revokes_old_tokens(api):
+    old = {"Authorization": api.headers["Authorization"]}
+    ok(api.get("/people"))  # principal in cache con la versione corrente
+
+    ok(api.post("/auth/change-password", json={"current_password": ADMIN["password"], "new_password": "password2"}))
+    assert api.get("/people", headers=old).status_code == 401
+    assert api.get(PLAN, headers=old).status_code == 401
+    # la versione nuova non si confonde con la voce del vecchio token in cache
+    assert principals.cache.get(_admin_id(), 0) is None
+
+    assert api.post("/auth/login", json=ADMIN).status_code == 401
+    token = ok(api.post("/auth/login", json={"email": ADMIN["email"], "password": "password2"}))["access_token"]
+    ok(api.get("/people", headers=_bearer(token)))
+    ok(api.get(PLAN, headers=_bearer(token)))
+
+
+def test_token_version_must_match_the_user(api):
+    uid = _admin_id()
+    for version in (1, "0"):
+        forged = auth.create_access_token(subject=uid, secret=main.settings.JWT_SECRET, expires_minutes=5, version=version)
+        assert api.get("/people", headers=_bearer(forged)).status_code == 401
+    current = auth.create_access_token(subject=uid, secret=main.settings.JWT_SECRET, expires_minutes=5)
+    ok(api.get("/people", headers=_bearer(current)))
+
+
+def test_login_is_throttled_per_account_and_per_ip(api, monkeypatch):
+    monkeypatch.setattr(main, "login_account_bucket", ratelimit.TokenBucket(1, 2))
+    wrong = {"email": ADMIN["email"], "password": "sbagliata"}
+    assert [api.post("/auth/login", json=wrong).status_code for _ in range(2)] == [401, 401]
+    r = api.post("/auth/login", json=ADMIN)  # anche con la password giusta
+    assert r.status_code == 429
+    assert 1 <= int(r.headers["Retry-After"]) <= 60
+    # la chiave è l'account normalizzato, non la stringa inviata
+    assert api.post("/auth/login", json={**ADMIN, "email": " " + ADMIN["email"].upper()}).status_code == 429
+    assert api.post("/auth/login", json={"email": "altro@example.com", "password": "x"}).status_code == 401
+
+    monkeypatch.setattr(main, "login_ip_bucket", ratelimit.TokenBucket(1, 1))
+    assert api.post("/auth/login", json={"email": "b@example.com", "password": "x"}).status_code == 401
+    assert api.post("/auth/login", json={"email": "c@example.com", "password": "x"}).status_code == 429
+
+
+def test_full_hash_queue_answers_503(api, monkeypatch):
+    monkeypatch.setattr(hashing.pool, "max_queue", 0)
+    r = api.post("/auth/login", json=ADMIN)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+
+
+def test_hash_pool_bounds_pending_operations(monkeypatch):
+    async def scenario():
+        pool = hashing.HashPool(workers=0, max_queue=2)
+        started, release = asyncio.Event(), asyncio.Event()
+
+        def fake_hash(password):
+            return "h:" + password
+
+        async def blocked(fn, *args):
+            started.set()
+            await release.wait()
+            return fn(*args)
+
+        monkeypatch.setattr(hashing, "run_in_threadpool", blocked)
+        monkeypatch.setattr(hashing.auth, "hash_password", fake_hash)
+        first = asyncio.create_task(pool.hash("a"))
+        second = asyncio.create_task(pool.hash("b"))
+        await started.wait()
+        await asyncio.sleep(0)
+        assert pool.depth() == 2
+        with pytest.raises(hashing.HashOverloaded):
+            await pool.hash("c")
+        release.set()
+        assert await asyncio.gather(first, second) == ["h:a", "h:b"]
+        assert pool.depth() == 0
+        assert await pool.hash("d") == "h:d"
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+from datetime import time
+from types import SimpleNamespace
+
+from app.autofill import autofill
+from app.conflicts import CONFLICT_KINDS
+from app.crud import _compute_alerts
+
+SHIFTS = [
+    SimpleNamespace(id="notte", name="Notte", start_time=time(22), end_time=time(6)),
+    SimpleNamespace(id="mattina", name="Mattina", start_time=time(6), end_time=time(14)),
+    SimpleNamespace(id="pomeriggio", name="Pomeriggio", start_time=time(14), end_time=time(22)),
+]
+NO_ABSENCES = {d: {} for d in range(7)}
+
+
+def _people(n):
+    return [SimpleNamespace(id=f"p{i}") for i in range(n)]
+
+
+def _empty_grid():
+    return {d: {s.id: None for s in SHIFTS} for d in range(7)}
+
+
+def _conflicts(people, grid, border=None):
+    alerts = _compute_alerts(SHIFTS, people, grid, NO_ABSENCES, NO_ABSENCES, border=border)
+    return sum(len(alerts[k][d]) for k in CONFLICT_KINDS for d in range(7))
+
+
+def test_autofill_respects_overlaps_and_rest():
+    people = _people(4)
+    filled, unfilled = autofill(SHIFTS, people, _empty_grid(), NO_ABSENCES, NO_ABSENCES)
+    assert _conflicts(people, filled) == 0
+    # ogni cella è piena oppure segnalata come vuota
+    empty = [(d, sid) for d, row in filled.items() for sid, pid in row.items() if pid is None]
+    assert sorted(empty) == sorted((u["day_index"], u["shift_id"]) for u in unfilled)
+
+
+def test_autofill_checks_pinned_cells_and_previous_week():
+    people = _people(6)
+    grid = _empty_grid()
+    grid[3]["mattina"] = "p1"  # bloccata: niente notte né pomeriggio di mercoledì per p1
+    border = ({-1: {"notte": "p0"}}, {})  # domenica notte della settimana prima
+
+    filled, unfilled = autofill(SHIFTS, people, grid, NO_ABSENCES, NO_ABSENCES, border=border)
+    assert not unfilled
+    assert filled[3]["mattina"] == "p1"
+    # lunedì: la notte sì (16 ore dopo), mattina e pomeriggio no
+    assert "p0" not in (filled[0]["mattina"], filled[0]["pomeriggio"])
+    assert filled[2]["notte"] != "p1" and filled[2]["pomeriggio"] != "p1"
+    assert _conflicts(people, filled, border) == 0
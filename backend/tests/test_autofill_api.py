@@ -0,0 +1,57 @@
+from datetime import date
+
+from conftest import ok
+
+from app import main, models
+
+MONDAY = date(2024, 3, 4)
+
+
+def _plan(api):
+    return ok(api.get(f"/weeks/{MONDAY}/plan"))
+
+
+def test_autofill_keeps_pinned_cells(api, api_seed):
+    shifts, people = api_seed
+    pinned = {"day_index": 2, "shift_id": shifts[1]["id"], "person_id": people[4]["id"]}
+    ok(api.put(f"/weeks/{MONDAY}/cell", json=pinned))
+
+    out = ok(api.post(f"/weeks/{MONDAY}/autofill", json={"keep_existing": True}))
+    assert out["status"] == "ok" and out["changes"] > 0
+
+    plan = _plan(api)
+    assert plan["grid"]["2"][pinned["shift_id"]] == pinned["person_id"]
+    # la risposta è la delta di set_cells: coincide con il piano ricaricato
+    for d, row in out["grid"].items():
+        assert row == plan["grid"][d]
+        assert {k: out["alerts"][k][d] for k in out["alerts"]} == {k: plan["alerts"][k][d] for k in plan["alerts"]}
+
+    # di nuovo: niente da cambiare, griglia e alert di tutta la settimana
+    again = ok(api.post(f"/weeks/{MONDAY}/autofill", json={"keep_existing": True}))
+    assert again["changes"] == 0
+    assert sorted(again["grid"], key=int) == [str(d) for d in range(7)]
+
+
+def test_autofill_dry_run_writes_nothing(api, api_seed):
+    out = ok(api.post(f"/weeks/{MONDAY}/autofill", json={"dry_run": True}))
+    assert out["status"] == "dry_run" and out["changes"]
+
+    with main.SessionLocal() as db:
+        assert db.query(models.Week).count() == 0
+        assert db.query(models.Assignment).count() == 0
+    assert all(pid is None for row in _plan(api)["grid"].values() for pid in row.values())
+
+
+def test_autofill_reports_unfilled_cells(api, api_seed):
+    shifts, people = api_seed
+    # lunedì in ferie tre persone su cinque: restano in due per tre turni
+    for p in people[:3]:
+        ok(api.post("/absences", json={"person_id": p["id"], "kind": "FERIE", "start_date": str(MONDAY), "end_date": str(MONDAY)}))
+
+    out = ok(api.post(f"/weeks/{MONDAY}/autofill", json={}))
+    monday_unfilled = [u for u in out["unfilled"] if u["day_index"] == 0]
+    assert len(monday_unfilled) == 1
+
+    row = _plan(api)["grid"]["0"]
+    assert row[monday_unfilled[0]["shift_id"]] is None
+    assert {pid for pid in row.values() if pid} == {people[3]["id"], people[4]["id"]}
@@ -0,0 +1,49 @@
+import io
+from datetime import date
+
+from app import bulk_import, models
+
+
+def _records(text: str, fmt: str = "csv"):
+    return bulk_import.iter_records(io.StringIO(text), fmt)
+
+
+def test_blank_cells_are_left_out_of_the_record():
+    (line_no, rec, err), = _records("full_name,notes,is_active,rotation_base_riposo_date\nMario , ,,\n")
+    assert (line_no, err) == (2, None)
+    assert rec == {"full_name": "Mario"}
+
+
+def test_null_values_are_left_out_of_ndjson_records():
+    (_, rec, _), = _records('{"full_name": "Mario", "is_active": null, "notes": ""}\n', "ndjson")
+    assert rec == {"full_name": "Mario"}
+
+
+def test_import_people_with_blank_optional_columns(db):
+    csv_text = (
+        "full_name,notes,is_active,rotation_base_riposo_date\n"
+        "Mario Rossi,,,\n"
+        "Anna Bianchi,part time,false,2024-03-04\n"
+        "Luca Verdi, , ,\n"
+    )
+    report = bulk_import.run_import(db, "people", "csv", _records(csv_text))
+    assert (report["status"], report["imported"], report["errors"]) == ("ok", 3, [])
+
+    people = {p.full_name: p for p in db.query(models.Person)}
+    assert people["Mario Rossi"].is_active is True
+    assert people["Mario Rossi"].notes is None
+    assert people["Luca Verdi"].rotation_base_riposo_date is None
+    assert people["Anna Bianchi"].is_active is False
+    assert people["Anna Bianchi"].rotation_base_riposo_date == date(2024, 3, 4)
+
+
+def test_import_absences_with_blank_notes(db, seed):
+    _, people = seed
+    csv_text = (
+        "person_id,full_name,kind,start_date,end_date,notes\n"
+        f"{people[0].id},,ferie,2024-03-04,2024-03-08,\n"
+        ",P1,MALATTIA,2024-03-05,2024-03-05,\n"
+    )
+    report = bulk_import.run_import(db, "absences", "csv", _records(csv_text))
+    assert (report["status"], report["imported"]) == ("ok", 2)
+    assert db.query(models.ExtraAbsence).filter(models.ExtraAbsence.notes.isnot(None)).count() == 0
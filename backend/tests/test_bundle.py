@@ -0,0 +1,48 @@
+from datetime import date
+
+from conftest import ok
+
+MONDAY = date(2024, 3, 4)
+BUNDLE = f"/weeks/{MONDAY}/bundle"
+
+
+def test_bundle_matches_the_three_endpoints(api, api_seed):
+    shifts, people = api_seed
+    ok(api.put(f"/weeks/{MONDAY}/cell", json={"day_index": 1, "shift_id": shifts[0]["id"], "person_id": people[0]["id"]}))
+    ok(api.put(f"/weeks/{MONDAY}/meta", json={"day_index": 1, "shift_id": shifts[0]["id"], "role": "APERTURA"}))
+    ok(api.post("/absences", json={"person_id": people[1]["id"], "kind": "FERIE", "start_date": "2024-03-05", "end_date": "2024-03-06"}))
+
+    bundle = ok(api.get(BUNDLE))
+    plan = ok(api.get(f"/weeks/{MONDAY}/plan"))
+    absences = ok(api.get(f"/weeks/{MONDAY}/absences"))
+    meta = ok(api.get(f"/weeks/{MONDAY}/meta"))
+
+    for key in ("shifts", "people", "grid", "alerts"):
+        assert bundle[key] == plan[key]
+    assert bundle["absences"] == {k: v for k, v in absences.items() if k != "monday_date"}
+    assert bundle["meta"] == meta["meta"]
+    assert bundle["grid"]["1"][shifts[0]["id"]] == people[0]["id"]
+    assert bundle["meta"]["1"][shifts[0]["id"]]["role"] == "APERTURA"
+    assert bundle["absences"]["extra"]["1"] == {people[1]["id"]: "FERIE"}
+
+
+def test_bundle_etag(api, api_seed):
+    shifts, people = api_seed
+    first = api.get(BUNDLE)
+    etag = first.headers["etag"]
+    # stessa revisione per bundle e plan: il client può usare l'uno o l'altro
+    assert api.get(f"/weeks/{MONDAY}/plan").headers["etag"] == etag
+    assert api.get(BUNDLE, headers={"If-None-Match": etag}).status_code == 304
+
+    ok(api.put(f"/weeks/{MONDAY}/cell", json={"day_index": 0, "shift_id": shifts[0]["id"], "person_id": people[0]["id"]}))
+    changed = api.get(BUNDLE, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    etag = changed.headers["etag"]
+
+    # le assenze (anche di settimane mai create) cambiano l'ETag
+    ok(api.post("/absences", json={"person_id": people[2]["id"], "kind": "MALATTIA", "start_date": "2024-03-08", "end_date": "2024-03-08"}))
+    assert api.get(BUNDLE, headers={"If-None-Match": etag}).status_code == 200
+    missing = "/weeks/2030-01-07/bundle"
+    etag = api.get(missing).headers["etag"]
+    ok(api.post("/absences", json={"person_id": people[2]["id"], "kind": "FERIE", "start_date": "2030-01-08", "end_date": "2030-01-08"}))
+    assert api.get(missing, headers={"If-None-Match": etag}).status_code == 200
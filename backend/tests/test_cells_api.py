@@ -0,0 +1,22 @@
+from app import main, models
+from conftest import ok
+
+MONDAY = "2024-03-04"
+
+
+def test_put_cell_returns_the_delta_of_the_touched_days(api, api_seed):
+    shifts, people = api_seed
+    res = ok(api.put(f"/weeks/{MONDAY}/cell", json={"day_index": 6, "shift_id": shifts[0]["id"], "person_id": people[0]["id"]}))
+    assert sorted(res["grid"]) == ["6"]
+    assert res["grid"]["6"][shifts[0]["id"]] == people[0]["id"]
+
+
+def test_day_index_out_of_range_is_rejected_everywhere(api, api_seed):
+    shifts, people = api_seed
+    cell = {"day_index": 7, "shift_id": shifts[0]["id"], "person_id": people[0]["id"]}
+    assert api.put(f"/weeks/{MONDAY}/cell", json=cell).status_code == 400
+    assert api.put(f"/weeks/{MONDAY}/cells", json={"changes": [cell]}).status_code == 400
+    assert api.put(f"/weeks/{MONDAY}/meta", json={"day_index": -1, "shift_id": shifts[0]["id"]}).status_code == 400
+    # rifiutate prima di creare la settimana
+    with main.SessionLocal() as db:
+        assert db.query(models.Week).count() == 0
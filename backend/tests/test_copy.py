@@ -0,0 +1,29 @@
+import uuid
+from datetime import date, time, timedelta
+
+from app import crud, models, schemas
+
+MONDAY = date(2024, 3, 4)
+
+
+def test_replicate_copies_cells_and_meta_with_uuid_ids(db, seed):
+    shifts, people = seed
+    src = crud.get_or_create_week(db, MONDAY)
+    crud.set_cells(db, src, [
+        schemas.CellUpdateIn(day_index=d, shift_id=shifts[d % 3].id, person_id=people[d % 5].id)
+        for d in range(7)
+    ])
+    crud.set_meta(db, src, 2, shifts[2].id, time(21), None, "CHIUSURA")
+
+    crud.replicate_week(db, src, 3)
+
+    for w in range(1, 4):
+        week = crud.get_week(db, MONDAY + timedelta(weeks=w))
+        _, _, grid, _ = crud.build_grid_and_alerts(db, week)
+        assert all(grid[d][shifts[d % 3].id] == people[d % 5].id for d in range(7))
+        assert crud.week_meta(db, week)[2][shifts[2].id]["role"] == "CHIUSURA"
+
+    ids = [i for (i,) in db.query(models.Assignment.id)] + [i for (i,) in db.query(models.AssignmentMeta.id)]
+    assert len(ids) == 4 * 8
+    assert len(set(ids)) == len(ids)
+    assert all(str(uuid.UUID(i)) == i and uuid.UUID(i).version == 4 for i in ids)
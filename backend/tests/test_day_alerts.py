@@ -0,0 +1,112 @@
+import random
+from datetime import date, time, timedelta
+
+import pytest
+
+from sqlalchemy import select
+
+from app import crud, models, reports, schemas
+
+MONDAY = date(2024, 3, 4)
+STEPS = 60
+
+
+def _times(rnd: random.Random):
+    # orari casuali, anche notturni (fine <= inizio) e a volte senza override
+    if rnd.random() < 0.3:
+        return None, None
+    return time(rnd.randrange(24), rnd.choice((0, 30))), time(rnd.randrange(24), rnd.choice((0, 30)))
+
+
+def _stats(db):
+    S = models.PersonDayStat
+    return sorted(tuple(r) for r in db.execute(select(S.person_id, S.work_date, S.minutes, S.shifts, S.openings, S.closings)))
+
+
+def _normalized(alerts: dict, days) -> dict:
+    # alert confrontati senza tener conto dell'ordine
+    return {
+        kind: {d: sorted(map(repr, alerts[kind][d])) for d in days}
+        for kind in crud.ALERT_KINDS
+    }
+
+
+@pytest.fixture
+def week(db, seed):
+    shifts, people = seed
+    # notturno, rotazione e assenze: servono tutti i tipi di alert
+    shifts[2].start_time, shifts[2].end_time = time(22), time(6)
+    people[0].rotation_base_riposo_date = MONDAY - timedelta(days=2)
+    people[1].rotation_base_riposo_date = MONDAY + timedelta(days=1)
+    db.add(models.ExtraAbsence(person_id=people[2].id, kind="FERIE", start_date=MONDAY + timedelta(days=2), end_date=MONDAY + timedelta(days=3)))
+    db.add(models.ExtraAbsence(person_id=people[3].id, kind="MALATTIA", start_date=MONDAY - timedelta(days=3), end_date=MONDAY))
+    week = crud.get_or_create_week(db, MONDAY)
+    db.commit()
+    return week
+
+
+@pytest.mark.parametrize("seed_value", range(5))
+def test_day_alerts_match_full_recompute(db, seed, week, seed_value):
+    shifts, people = seed
+    rnd = random.Random(seed_value)
+    person_ids = [p.id for p in people] + [None]
+    shift_ids = [s.id for s in shifts]
+
+    _, _, grid_before, alerts_before = crud.build_grid_and_alerts(db, week)
+    for _ in range(STEPS):
+        op = rnd.choice(("cell", "cells", "meta"))
+        if op == "cell":
+            day = rnd.randrange(7)
+            grid_days, alerts_days = crud.set_cell(db, week, day, rnd.choice(shift_ids), rnd.choice(person_ids))
+        elif op == "cells":
+            changes = [
+                schemas.CellUpdateIn(day_index=rnd.randrange(7), shift_id=rnd.choice(shift_ids), person_id=rnd.choice(person_ids))
+                for _ in range(rnd.randint(1, 6))
+            ]
+            grid_days, alerts_days = crud.set_cells(db, week, changes)
+        else:
+            day = rnd.randrange(7)
+            start, end = _times(rnd)
+            grid_days, alerts_days = crud.set_meta(db, week, day, rnd.choice(shift_ids), start, end, rnd.choice((None, "APERTURA", "CHIUSURA")))
+
+        # la delta ritornata (e pubblicata nell'evento) contro il ricalcolo completo
+        _, _, grid_after, alerts_after = crud.build_grid_and_alerts(db, week)
+
+        days = sorted(grid_days)
+        assert grid_days == {d: grid_after[d] for d in days}
+        assert _normalized(alerts_days, days) == _normalized(alerts_after, days)
+
+        others = [d for d in range(7) if d not in grid_days]
+        assert {d: grid_after[d] for d in others} == {d: grid_before[d] for d in others}
+        assert _normalized(alerts_after, others) == _normalized(alerts_before, others)
+
+        grid_before, alerts_before = grid_after, alerts_after
+
+    # riepilogo ore aggiornato giorno per giorno = ricalcolo completo
+    stats = _stats(db)
+    reports.rebuild_all(db)
+    assert _stats(db) == stats
+
+
+def test_rest_is_checked_across_the_week_boundary(db, seed):
+    shifts, people = seed  # T0 06-12, T2 18-24
+    pid = people[0].id
+    week = crud.get_or_create_week(db, MONDAY)
+    next_monday = MONDAY + timedelta(days=7)
+    crud.set_cell(db, crud.get_or_create_week(db, next_monday), 0, shifts[0].id, pid)
+    etag = crud.week_etag(db, next_monday)
+
+    # domenica sera: 6 ore prima del lunedì mattina della settimana dopo
+    crud.set_cell(db, week, 6, shifts[2].id, pid)
+    assert crud.week_etag(db, next_monday) != etag
+
+    _, _, _, alerts = crud.build_grid_and_alerts(db, crud.get_week(db, next_monday))
+    [rest] = alerts["riposo_insufficiente"][0]
+    assert (rest["person_id"], rest["prev_day_index"], rest["rest_minutes"]) == (pid, -1, 6 * 60)
+    assert set(alerts["riposo_insufficiente"]) == set(range(7))
+
+    # il turno della settimana prima non produce alert suoi, e il periodo vede lo stesso conflitto
+    _, _, _, own = crud.build_grid_and_alerts(db, week)
+    assert not any(own["riposo_insufficiente"][d] for d in range(7))
+    _, _, _, by_date = crud.build_range_plan(db, next_monday, next_monday + timedelta(days=6))
+    assert [a["prev_date"] for a in by_date["riposo_insufficiente"][next_monday]] == [MONDAY + timedelta(days=6)]
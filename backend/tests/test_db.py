@@ -0,0 +1,71 @@
+import types
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _engine(tmp_path, monkeypatch, pre_ping, fail=False):
+    engine = db.make_engine(f"sqlite:///{tmp_path}/pool.db", pool_size=1, max_overflow=0, pre_ping=pre_ping, ping_idle_s=30)
+    pings = []
+
+    def do_ping(dbapi_connection):
+        pings.append(dbapi_connection)
+        if fail:
+            raise RuntimeError("connessione chiusa dal server")
+        return True
+
+    monkeypatch.setattr(engine.dialect, "do_ping", do_ping)
+    return engine, pings
+
+
+def _use(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        return conn.connection.dbapi_connection
+
+
+def test_idle_mode_pings_only_connections_left_idle(tmp_path, monkeypatch, clock):
+    engine, pings = _engine(tmp_path, monkeypatch, "idle")
+    first = _use(engine)
+    clock[0] += 29
+    assert _use(engine) is first
+    assert pings == []
+
+    clock[0] += 31
+    assert _use(engine) is first
+    assert pings == [first]
+    # appena restituita la connessione torna "fresca"
+    _use(engine)
+    assert len(pings) == 1
+
+
+def test_idle_mode_replaces_connections_that_fail_the_ping(tmp_path, monkeypatch, clock):
+    engine, pings = _engine(tmp_path, monkeypatch, "idle", fail=True)
+    first = _use(engine)
+    clock[0] += 60
+    assert _use(engine) is not first
+    assert pings == [first]
+
+
+# always: ping a ogni checkout tranne il primo (connessione appena aperta)
+@pytest.mark.parametrize("mode, expected", [("always", 2), ("off", 0)])
+def test_always_and_off_modes(tmp_path, monkeypatch, clock, mode, expected):
+    engine, pings = _engine(tmp_path, monkeypatch, mode)
+    for _ in range(3):
+        _use(engine)
+        clock[0] += 60
+    assert len(pings) == expected
+
+
+def test_unknown_pre_ping_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        db.make_engine(f"sqlite:///{tmp_path}/pool.db", pre_ping="sometimes")
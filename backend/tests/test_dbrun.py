@@ -0,0 +1,77 @@
+"""
+DB_ASYNC: il calcolo di griglia e alert non deve fermare il loop. Stesso
+periodo (un anno) con AsyncRunner.run (run_sync, calcolo sul loop) e con
+run_heavy (Session sync nel threadpool), misurando il ritardo massimo di un
+ticker che gira sul loop nel frattempo.
+"""
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app import absence_index, crud
+from app.db import Base, make_async_engine, make_async_session_local, make_session_local
+from app.dbrun import AsyncRunner
+from bench.dataset import generate
+
+TICK_S = 0.002
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('dbrun') / 'dbrun.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    info = generate(engine, people=400, shifts=10, weeks=53, absences=4000, absence_years=1, with_stats=False)
+    yield url, engine, info
+    engine.dispose()
+
+
+async def _max_lag(coro) -> float:
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(TICK_S)
+            lags.append(time.perf_counter() - t0 - TICK_S)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(5 * TICK_S)
+    try:
+        await coro
+    finally:
+        done.set()
+        await task
+    return max(lags)
+
+
+def test_run_heavy_keeps_the_loop_responsive(dataset):
+    url, engine, info = dataset
+    start = info["first_monday"]
+    end = start + timedelta(days=365)
+
+    async def measure():
+        async_engine = make_async_engine(url)
+        sessions = make_async_session_local(async_engine)
+        try:
+            lags = {}
+            for mode in ("run", "run_heavy"):
+                # ogni giro ricarica anche l'indice assenze, come dopo una scrittura
+                absence_index.invalidate()
+                runner = AsyncRunner(sessions(), make_session_local(engine))
+                try:
+                    lags[mode] = await _max_lag(getattr(runner, mode)(crud.build_range_plan, start, end))
+                finally:
+                    await runner.close()
+            return lags
+        finally:
+            await async_engine.dispose()
+
+    lags = asyncio.run(measure())
+    # sul loop il ticker resta fermo per tutto il calcolo; dal threadpool solo per gli switch del GIL
+    assert lags["run"] > 0.05, lags
+    assert lags["run_heavy"] < lags["run"] / 4, lags
@@ -0,0 +1,35 @@
+from datetime import date
+
+from app import crud, events
+
+MONDAY = date(2024, 3, 4)
+
+
+def test_cell_event_carries_delta_and_client_id(db, seed, monkeypatch):
+    shifts, people = seed
+    sent = []
+    monkeypatch.setattr(events.hub, "dispatch", sent.append)
+    week = crud.get_or_create_week(db, MONDAY)
+    db.commit()
+
+    token = events._client_id.set("pagina-1")
+    try:
+        grid, alerts = crud.set_cell(db, week, 2, shifts[0].id, people[0].id)
+    finally:
+        events._client_id.reset(token)
+
+    (message,) = sent
+    ev = message["event"]
+    assert (ev["type"], ev["client_id"], ev["monday_date"]) == ("cell", "pagina-1", MONDAY.isoformat())
+    # stessa delta della risposta, con le chiavi JSON
+    assert ev["grid"] == {str(d): row for d, row in grid.items()}
+    assert sorted(ev["alerts"]) == sorted(alerts)
+
+
+def test_event_without_client_id(db, seed, monkeypatch):
+    shifts, _ = seed
+    sent = []
+    monkeypatch.setattr(events.hub, "dispatch", sent.append)
+    week = crud.get_or_create_week(db, MONDAY)
+    crud.set_cell(db, week, 0, shifts[0].id, None)
+    assert "client_id" not in sent[0]["event"]
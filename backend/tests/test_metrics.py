@@ -0,0 +1,34 @@
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from app import metrics
+from app.db import default_pool_class, make_engine
+
+
+def _checkouts() -> int:
+    row = metrics.POOL_CHECKOUT_SECONDS.values.get(())
+    return row[-1] if row else 0
+
+
+def test_timed_pool_measures_checkouts_and_survives_dispose(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    assert default_pool_class(url) is QueuePool
+    engine = make_engine(url, poolclass=metrics.timed_pool_class(default_pool_class(url)))
+    assert isinstance(engine.pool, QueuePool)
+
+    before = _checkouts()
+    stats = metrics.RequestStats()
+    token = metrics._current.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        engine.dispose()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        metrics._current.reset(token)
+    engine.dispose()
+
+    assert _checkouts() == before + 2
+    assert stats.pool_seconds > 0
+    assert type(engine.pool) is metrics.timed_pool_class(QueuePool)
@@ -0,0 +1,66 @@
+from datetime import date, time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, select
+
+from app import models, reports
+from app.db import make_session_local
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def _config(url: str) -> Config:
+    cfg = Config(str(BACKEND / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND / "migrations"))
+    cfg.set_main_option("sqlalchemy.url", url)
+    return cfg
+
+
+def _stats(db):
+    return sorted(
+        tuple(row)
+        for row in db.execute(select(
+            models.PersonDayStat.person_id, models.PersonDayStat.work_date, models.PersonDayStat.minutes,
+            models.PersonDayStat.shifts, models.PersonDayStat.openings, models.PersonDayStat.closings,
+        ))
+    )
+
+
+def test_0004_backfills_person_day_stats(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    cfg = _config(url)
+    command.upgrade(cfg, "0003")
+
+    engine = create_engine(url)
+    db = make_session_local(engine)()
+    person = models.Person(full_name="P")
+    day = models.Shift(name="Giorno", start_time=time(8), end_time=time(14))
+    night = models.Shift(name="Notte", start_time=time(22), end_time=time(6))
+    week = models.Week(monday_date=date(2024, 3, 4))
+    db.add_all([person, day, night, week])
+    db.flush()
+    db.add_all([
+        models.Assignment(week_id=week.id, day_index=0, shift_id=day.id, person_id=person.id),
+        models.Assignment(week_id=week.id, day_index=0, shift_id=night.id, person_id=person.id),
+        models.Assignment(week_id=week.id, day_index=3, shift_id=day.id, person_id=person.id),
+        models.Assignment(week_id=week.id, day_index=4, shift_id=day.id, person_id=None),
+        models.AssignmentMeta(week_id=week.id, day_index=3, shift_id=day.id, override_end_time=time(16), role="APERTURA"),
+    ])
+    db.commit()
+    person_id = person.id
+    db.close()
+
+    command.upgrade(cfg, "head")
+
+    db = make_session_local(engine)()
+    migrated = _stats(db)
+    assert migrated == [
+        (person_id, date(2024, 3, 4), 6 * 60 + 8 * 60, 2, 0, 0),
+        (person_id, date(2024, 3, 7), 8 * 60, 1, 1, 0),
+    ]
+    reports.rebuild_all(db)
+    assert _stats(db) == migrated
+    db.close()
+    engine.dispose()
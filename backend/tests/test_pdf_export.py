@@ -0,0 +1,70 @@
+from datetime import date
+
+from conftest import ok
+
+from app import pdf_export
+
+MONDAY = date(2024, 3, 4)
+PDF = f"/weeks/{MONDAY}/export.pdf"
+
+
+def _token(api) -> str:
+    return api.headers["Authorization"].split()[1]
+
+
+def test_pdf_is_cached_per_revision_and_answers_304(api, api_seed, monkeypatch):
+    shifts, people = api_seed
+    renders = []
+    render = pdf_export.renderer.render
+
+    async def counting_render(key, *args):
+        renders.append(key)
+        return await render(key, *args)
+
+    monkeypatch.setattr(pdf_export.renderer, "render", counting_render)
+    params = {"token": _token(api)}
+
+    first = api.get(PDF, params=params)
+    assert first.status_code == 200 and first.content.startswith(b"%PDF")
+    etag = first.headers["etag"]
+    hits = pdf_export.cache.stats()["hits_memory"]
+
+    again = api.get(PDF, params=params)
+    assert (again.content, again.headers["etag"]) == (first.content, etag)
+    assert pdf_export.cache.stats()["hits_memory"] == hits + 1
+    assert len(renders) == 1
+
+    not_modified = api.get(PDF, params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert len(renders) == 1
+
+    # una modifica alla settimana cambia revisione: nuovo render, il vecchio ETag non vale più
+    ok(api.put(f"/weeks/{MONDAY}/cell", json={"day_index": 0, "shift_id": shifts[0]["id"], "person_id": people[0]["id"]}))
+    changed = api.get(PDF, params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert len(renders) == 2
+
+
+def test_pdf_requires_a_valid_token(api):
+    assert api.get(PDF, params={"token": "x"}).status_code == 401
+
+
+def test_cache_spills_to_disk_and_misses_stale_revisions(tmp_path):
+    cache = pdf_export.PdfCache(memory_bytes=10, disk_bytes=15, directory=str(tmp_path))
+    weeks = [date(2024, 3, 4), date(2024, 3, 11), date(2024, 3, 18)]
+    for i, monday in enumerate(weeks):
+        cache.put(monday, f"r{i}", bytes([i]) * 8)
+
+    # in memoria solo l'ultima, le altre su disco finché c'è spazio (16 > 15: la più vecchia si scarta)
+    assert (cache.stats()["memory_items"], cache.stats()["disk_items"], cache.evictions) == (1, 1, 1)
+    assert cache.get(weeks[0], "r0") is None
+    assert cache.get(weeks[1], "r0") is None  # revisione diversa
+    # hit dal disco: il PDF torna in memoria e l'ultima settimana scende su disco
+    assert cache.get(weeks[1], "r1") == b"\x01" * 8
+    assert cache.stats()["hits_disk"] == 1
+    assert cache.get(weeks[1], "r1") == b"\x01" * 8
+    assert cache.get(weeks[2], "r2") == b"\x02" * 8
+    assert (cache.hits_memory, cache.hits_disk) == (1, 2)
+
+    cache.clear()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from conftest import ok
+
+from app import main
+
+MONDAY = date(2024, 3, 4)
+
+
+def test_range_plan_covers_the_bounds(api, api_seed):
+    shifts, people = api_seed
+    shift_id = shifts[0]["id"]
+    ok(api.put(f"/weeks/{MONDAY}/cell", json={"day_index": 0, "shift_id": shift_id, "person_id": people[0]["id"]}))
+    ok(api.put(f"/weeks/{MONDAY}/cell", json={"day_index": 6, "shift_id": shift_id, "person_id": people[1]["id"]}))
+
+    plan = ok(api.get("/plan", params={"from": "2024-03-04", "to": "2024-03-10"}))
+    assert (plan["from_date"], plan["to_date"]) == ("2024-03-04", "2024-03-10")
+    assert sorted(plan["grid"]) == [str(MONDAY + timedelta(days=d)) for d in range(7)]
+    assert plan["grid"]["2024-03-04"][shift_id] == people[0]["id"]
+    assert plan["grid"]["2024-03-10"][shift_id] == people[1]["id"]
+
+    # un giorno solo, a cavallo del confine della settimana
+    plan = ok(api.get("/plan", params={"from": "2024-03-10", "to": "2024-03-10"}))
+    assert list(plan["grid"]) == ["2024-03-10"]
+    assert plan["grid"]["2024-03-10"][shift_id] == people[1]["id"]
+
+
+def test_range_plan_limits(api, api_seed):
+    last = MONDAY + timedelta(days=main.MAX_RANGE_DAYS - 1)
+    plan = ok(api.get("/plan", params={"from": str(MONDAY), "to": str(last)}))
+    assert len(plan["grid"]) == main.MAX_RANGE_DAYS
+
+    too_long = api.get("/plan", params={"from": str(MONDAY), "to": str(last + timedelta(days=1))})
+    assert too_long.status_code == 400
+    assert api.get("/plan", params={"from": "2024-03-10", "to": "2024-03-04"}).status_code == 400
+
+
+def test_malformed_dates_are_400(api):
+    assert api.get("/plan", params={"from": "2024-13-01", "to": "2024-03-10"}).status_code == 400
+    assert api.get("/plan", params={"from": "2024-03-04", "to": "domani"}).status_code == 400
+    assert api.get("/weeks/2024-02-30/plan").status_code == 400
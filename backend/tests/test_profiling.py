@@ -0,0 +1,54 @@
+import cProfile
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.profiling import ProfileStore
+
+
+def _profile() -> cProfile.Profile:
+    prof = cProfile.Profile()
+    prof.enable()
+    sorted(range(1000), key=lambda x: -x)
+    prof.disable()
+    return prof
+
+
+def test_store_keeps_only_the_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=3)
+    ids = [store.save(_profile(), {"created_at": f"2024-03-04T10:00:0{i}", "path": f"/r{i}"}) for i in range(5)]
+
+    assert [p["id"] for p in store.list()] == ids[:1:-1]
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{i}.{ext}" for i in ids[2:] for ext in ("json", "pstats"))
+    assert store.pstats_path(ids[0]) is None
+    assert store.pstats_path(ids[-1]) == str(tmp_path / f"{ids[-1]}.pstats")
+    assert "function calls" in store.summary(ids[-1], sort="tottime", limit=5)
+    # id non validi non escono dalla directory
+    assert store.pstats_path("../../etc/passwd") is None
+    assert store.summary("0" * 12) is None
+
+
+def test_middleware_profiles_only_authorized_requests(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=5)
+    app = FastAPI()
+    app.router.route_class = profiling.ProfilingRoute
+
+    @app.get("/work")
+    def work():
+        return {"n": sum(range(10000))}
+
+    app.add_middleware(profiling.ProfilingMiddleware, store=store, authorize=lambda scope: dict(scope["headers"]).get(b"authorization") == b"ok")
+
+    with TestClient(app) as client:
+        assert "x-profile-id" not in client.get("/work", headers={"Authorization": "ok"}).headers
+        assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "1"}).headers
+        assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "0", "Authorization": "ok"}).headers
+        profile_id = client.get("/work", headers={"X-Profile": "1", "Authorization": "ok"}).headers["x-profile-id"]
+        by_query = client.get("/work", params={"profile": "1"}, headers={"Authorization": "ok"}).headers["x-profile-id"]
+
+    listed = {p["id"]: p for p in store.list()}
+    assert set(listed) == {profile_id, by_query}
+    assert (listed[profile_id]["route"], listed[profile_id]["status"]) == ("/work", 200)
+    assert "work" in store.summary(profile_id)
@@ -0,0 +1,93 @@
+"""
+EXPLAIN QUERY PLAN delle query calde su SQLite: schema da `alembic upgrade
+head` e dataset sintetico con statistiche (bench.dataset), poi per ogni
+query il nome dell'indice della migrazione che deve comparire nel piano
+(uno fra più indici quando entrambi servono e la scelta è del planner).
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, func, select
+
+from app import models
+from app.crud import _on_days, absences_query
+from bench.dataset import generate, migrate
+
+A, M, W = models.Assignment, models.AssignmentMeta, models.Week
+X, P, S = models.ExtraAbsence, models.Person, models.PersonDayStat
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    migrate(url)
+    engine = create_engine(url)
+    info = generate(engine, people=300, shifts=6, weeks=30, absences=4000, absence_years=1)
+    yield engine, info
+    engine.dispose()
+
+
+def _plan(engine, stmt) -> str:
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[k] for k in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return "\n".join(r[-1] for r in rows)
+
+
+def _queries(info) -> dict:
+    week = info["week"]
+    start = week["monday_date"]
+    end = start + timedelta(days=6)
+    person_id = info["person_ids"][0]
+    return {
+        # griglia della settimana (_load_week)
+        "week_cells": (
+            select(A.day_index, A.shift_id, A.person_id).where(A.week_id == week["id"]),
+            ("ix_assignments_week_cell",),
+        ),
+        # celle dei giorni ricalcolati dopo una scrittura (build_day_alerts), anche della settimana prima
+        "day_cells": (
+            select(A.day_index, A.shift_id, A.person_id).join(W, W.id == A.week_id).where(_on_days(A, start, -2, 3)),
+            ("ix_assignments_week_cell",),
+        ),
+        # meta celle della settimana (week_meta): indice del vincolo unico
+        # (su SQLite è un autoindex, il _1 è la chiave primaria)
+        "week_meta": (
+            select(M).where(M.week_id == week["id"]),
+            ("uq_assignment_meta_cell", "sqlite_autoindex_assignment_meta_2"),
+        ),
+        # assenze che toccano la settimana / un periodo
+        "absences_range": (
+            select(X.person_id, X.kind, X.start_date, X.end_date).where(X.start_date <= end, X.end_date >= start),
+            ("ix_extra_absences_dates", "ix_extra_absences_start_id"),
+        ),
+        "absences_page": (absences_query(after=(end, "~")), ("ix_extra_absences_start_id",)),
+        "absences_page_person": (
+            absences_query(person_id=person_id, after=(end, "~")),
+            ("ix_extra_absences_person_start_id",),
+        ),
+        # riepilogo ore (reports.hours_report) e ricalcolo di una settimana (reports.refresh_weeks)
+        "person_days": (
+            select(S.person_id, func.sum(S.minutes)).where(S.work_date.between(date(start.year, start.month, 1), end)).group_by(S.person_id),
+            ("ix_person_day_stats_date",),
+        ),
+        "person_days_week": (delete(S).where(S.monday_date.between(start, start)), ("ix_person_day_stats_monday",)),
+        # ricalcolo dei soli giorni toccati (reports.refresh_days)
+        "person_days_touched": (delete(S).where(S.work_date.in_([start, end])), ("ix_person_day_stats_date",)),
+        "people_active": (
+            select(P).where(P.is_active == True).order_by(P.full_name),  # noqa: E712
+            ("ix_people_active_name",),
+        ),
+    }
+
+
+@pytest.mark.parametrize("name", [
+    "week_cells", "day_cells", "week_meta", "absences_range", "absences_page", "absences_page_person",
+    "person_days", "person_days_week", "person_days_touched", "people_active",
+])
+def test_hot_query_uses_index(dataset, name):
+    engine, info = dataset
+    stmt, indexes = _queries(info)[name]
+    plan = _plan(engine, stmt)
+    assert any(f"INDEX {index}" in plan for index in indexes), plan
@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from conftest import ok
+
+from app import main, models
+
+MISSING = "2031-06-02"
+
+
+@contextmanager
+def _writes():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().split()[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(statement)
+
+    event.listen(main.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(main.engine, "before_cursor_execute", record)
+
+
+def test_reads_of_a_missing_week_write_nothing(api, api_seed):
+    with _writes() as writes:
+        for path in ("plan", "bundle", "absences", "meta"):
+            body = ok(api.get(f"/weeks/{MISSING}/{path}"))
+            assert body["monday_date"] == MISSING
+        plan = ok(api.get(f"/weeks/{MISSING}/plan"))
+        assert all(pid is None for row in plan["grid"].values() for pid in row.values())
+        ok(api.get("/plan", params={"from": MISSING, "to": "2031-06-30"}))
+        # autofill in prova: calcola le modifiche senza creare la settimana
+        assert ok(api.post(f"/weeks/{MISSING}/autofill", json={"dry_run": True}))["changes"]
+    assert writes == []
+
+    with main.SessionLocal() as db:
+        assert db.query(models.Week).count() == 0
+
+    # la prima scrittura crea la settimana (e il listener la vede)
+    shifts, people = api_seed
+    with _writes() as writes:
+        ok(api.put(f"/weeks/{MISSING}/cell", json={"day_index": 0, "shift_id": shifts[0]["id"], "person_id": people[0]["id"]}))
+    assert any(w.lstrip().upper().startswith("INSERT INTO WEEKS") for w in writes)
+    with main.SessionLocal() as db:
+        assert [w.monday_date.isoformat() for w in db.query(models.Week)] == [MISSING]
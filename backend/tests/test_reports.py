@@ -0,0 +1,68 @@
+from datetime import date
+
+from conftest import ok
+
+from app import main
+
+MARCH, APRIL = date(2024, 3, 4), date(2024, 4, 1)
+
+
+def _cell(api, monday, day_index, shift, person):
+    ok(api.put(f"/weeks/{monday}/cell", json={"day_index": day_index, "shift_id": shift["id"], "person_id": person["id"]}))
+
+
+def _meta(api, monday, day_index, shift, **fields):
+    ok(api.put(f"/weeks/{monday}/meta", json={"day_index": day_index, "shift_id": shift["id"], **fields}))
+
+
+def test_hours_report_on_known_plan(api, api_seed):
+    (t0, t1, t2), people = api_seed  # 06-12, 12-18, 18-24
+    p0, p1 = people[0], people[1]
+    _cell(api, MARCH, 0, t0, p0)
+    _cell(api, MARCH, 3, t2, p0)
+    _cell(api, MARCH, 3, t0, p1)
+    _meta(api, MARCH, 3, t0, override_end_time="16:00:00", role="APERTURA")
+    _cell(api, APRIL, 0, t1, p1)
+    _meta(api, APRIL, 0, t1, role="CHIUSURA")
+
+    def report(group, **bounds):
+        params = {"from": "2024-03-01", "to": "2024-04-30", "group": group, **bounds}
+        return [
+            (r["full_name"], r["period"], r["minutes"], r["shifts"], r["openings"], r["closings"])
+            for r in ok(api.get("/reports/hours", params=params))["rows"]
+        ]
+
+    assert report("month") == [
+        ("P0", "2024-03-01", 720, 2, 0, 0),
+        ("P1", "2024-03-01", 600, 1, 1, 0),
+        ("P1", "2024-04-01", 360, 1, 0, 1),
+    ]
+    assert report("week") == [
+        ("P0", "2024-03-04", 720, 2, 0, 0),
+        ("P1", "2024-03-04", 600, 1, 1, 0),
+        ("P1", "2024-04-01", 360, 1, 0, 1),
+    ]
+    assert report("total") == [("P0", None, 720, 2, 0, 0), ("P1", None, 960, 2, 1, 1)]
+    # il periodo taglia per giorno, non per settimana
+    assert report("total", to="2024-03-06") == [("P0", None, 360, 1, 0, 0)]
+
+    hours = ok(api.get("/reports/hours", params={"from": "2024-03-01", "to": "2024-03-31", "group": "total"}))["rows"]
+    assert [r["hours"] for r in hours] == [12.0, 10.0]
+
+
+def test_hours_report_rejects_bad_input(api):
+    assert api.get("/reports/hours", params={"from": "2024-03-10", "to": "2024-03-01"}).status_code == 400
+    assert api.get("/reports/hours", params={"from": "2024-03-01", "to": "2024-03-31", "group": "year"}).status_code == 400
+
+
+def test_rebuild_needs_the_maintenance_token(api, api_seed, monkeypatch):
+    # un utente autenticato non basta
+    monkeypatch.setattr(main.settings, "MAINTENANCE_TOKEN", "")
+    assert api.post("/reports/rebuild").status_code == 404
+    monkeypatch.setattr(main.settings, "MAINTENANCE_TOKEN", "manutenzione")
+    assert api.post("/reports/rebuild").status_code == 401
+
+    (t0, _, _), people = api_seed
+    _cell(api, MARCH, 0, t0, people[0])
+    out = ok(api.post("/reports/rebuild", headers={"Authorization": "Bearer manutenzione"}))
+    assert out == {"status": "rebuilt", "rows": 1}
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.rotation import PERMESSO, RIPOSO, rot_kind, rotation_by_day
+
+START = date(2024, 2, 26)  # lunedì, a cavallo del 29 febbraio
+
+
+def _people():
+    # basi prima, dopo e dentro il periodo, in tutte le fasi; una persona senza rotazione
+    people = [SimpleNamespace(id=f"p{i}", rotation_base_riposo_date=START + timedelta(days=i * 5 - 60)) for i in range(30)]
+    people.append(SimpleNamespace(id="senza", rotation_base_riposo_date=None))
+    return people
+
+
+@pytest.mark.parametrize("start, ndays", [(START, 7), (START + timedelta(days=3), 1), (START - timedelta(days=400), 366)])
+def test_calendar_matches_rot_kind_day_by_day(start, ndays):
+    people = _people()
+    calendar = rotation_by_day(people, start, ndays)
+    assert sorted(calendar) == list(range(ndays))
+    for d in range(ndays):
+        expected = {p.id: k for p in people if (k := rot_kind(p.rotation_base_riposo_date, start + timedelta(days=d)))}
+        assert calendar[d] == expected, d
+
+
+def test_base_day_is_riposo_then_permesso():
+    person = SimpleNamespace(id="p", rotation_base_riposo_date=START + timedelta(days=2))
+    calendar = rotation_by_day([person], START, 14)
+    assert [calendar[d].get("p") for d in range(14)] == (
+        [None, None, RIPOSO, PERMESSO] + [None] * 6 + [RIPOSO, PERMESSO, None, None]
+    )
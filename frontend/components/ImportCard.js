@@ -0,0 +1,45 @@
+import { useState } from 'react';
+import { apiFetch } from '../lib/api';
+
+// Import massivo CSV/NDJSON (POST /import/{kind}) con report errori per riga
+export default function ImportCard({ kind, title, columns, onDone }) {
+  const [file, setFile] = useState(null);
+  const [report, setReport] = useState(null);
+  const [err, setErr] = useState(null);
+  const [busy, setBusy] = useState(false);
+
+  async function send(dryRun) {
+    if (!file) return;
+    setErr(null); setReport(null); setBusy(true);
+    try {
+      const fd = new FormData();
+      fd.append('file', file);
+      const res = await apiFetch(`/import/${kind}${dryRun ? '?dry_run=true' : ''}`, { method: 'POST', body: fd });
+      setReport(res);
+      if (!dryRun && res.status === 'ok' && onDone) await onDone();
+    } catch (e) { setErr(e.message); }
+    finally { setBusy(false); }
+  }
+
+  return (
+    <div className="card" style={{ marginBottom: 12 }}>
+      <h3 style={{ marginTop: 0 }}>{title}</h3>
+      <div className="small" style={{ marginBottom: 6 }}>CSV con intestazione o NDJSON. Colonne: {columns}</div>
+      <div className="row">
+        <input type="file" accept=".csv,.ndjson,.jsonl" onChange={e => setFile(e.target.files?.[0] || null)} />
+        <button className="btn" disabled={!file || busy} onClick={() => send(true)}>Verifica</button>
+        <button className="btn primary" disabled={!file || busy} onClick={() => send(false)}>Importa</button>
+      </div>
+      {err && <div className="alert" style={{ marginTop: 8 }}>{err}</div>}
+      {report && (
+        <div className="small" style={{ marginTop: 8 }}>
+          {report.status === 'rejected' ? '⛔ Import annullato' : report.status === 'dry_run' ? '🔎 Verifica' : '✅ Importate'}:
+          {' '}{report.imported}/{report.total} righe valide, {report.errors_count} errori
+          {report.errors.length > 0 && (
+            <ul>{report.errors.map((x, i) => <li key={i}>riga {x.line}: {x.error}</li>)}</ul>
+          )}
+        </div>
+      )}
+    </div>
+  );
+}
@@ -32,6 +32,9 @@ export function clearToken() {
 // IMPORTANTE: in Next.js le env pubbliche vanno lette così
 const BASE = process.env.NEXT_PUBLIC_API_BASE_URL;
 
+// id di questa pagina: il backend lo riporta negli eventi SSE delle nostre scritture
+export const CLIENT_ID = Math.random().toString(36).slice(2) + Date.now().toString(36);
+
 export async function apiFetch(path, options = {}) {
   if (!BASE) throw new Error("NEXT_PUBLIC_API_BASE_URL mancante su Vercel");
 
@@ -39,6 +42,7 @@ export async function apiFetch(path, options = {}) {
   const token = tokenOverride === null ? null : (tokenOverride || getToken());
 
   const headers = {
+    "X-Client-Id": CLIENT_ID,
     ...(options.headers || {})
   };
 
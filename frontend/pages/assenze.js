@@ -1,7 +1,8 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useState } from "react";
 import Layout from "../components/Layout";
 import RequireAuth from "../components/RequireAuth";
-import { apiFetch } from "../lib/api";
+import ImportCard from "../components/ImportCard";
+import { apiFetch, getToken } from "../lib/api";
 
 function iso(d) {
   const y = d.getFullYear();
@@ -25,6 +26,7 @@ function addDays(d, n) {
 export default function Assenze() {
   const [people, setPeople] = useState([]);
   const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [err, setErr] = useState(null);
   const [ok, setOk] = useState(null);
 
@@ -37,8 +39,26 @@ export default function Assenze() {
 
   // filtri elenco
   const [filterPerson, setFilterPerson] = useState("ALL");
-  const [filterFrom, setFilterFrom] = useState("");
-  const [filterTo, setFilterTo] = useState("");
+  // default filtro: settimana corrente
+  const [filterFrom, setFilterFrom] = useState(() => iso(mondayOf(new Date())));
+  const [filterTo, setFilterTo] = useState(() => iso(addDays(mondayOf(new Date()), 6)));
+
+  // filtri applicati lato server (elenco paginato)
+  function filterQuery() {
+    const q = new URLSearchParams();
+    if (filterPerson !== "ALL") q.set("person_id", filterPerson);
+    if (filterFrom) q.set("from", filterFrom);
+    if (filterTo) q.set("to", filterTo);
+    return q;
+  }
+
+  async function loadAbsences(cursor = null) {
+    const q = filterQuery();
+    if (cursor) q.set("cursor", cursor);
+    const page = await apiFetch(`/absences?${q.toString()}`);
+    setRows((prev) => (cursor ? [...prev, ...page.items] : page.items));
+    setNextCursor(page.next_cursor);
+  }
 
   async function load() {
     setErr(null);
@@ -46,23 +66,30 @@ export default function Assenze() {
     try {
       const p = await apiFetch("/people");
       setPeople(p);
+      await loadAbsences();
+    } catch (e) {
+      setErr(e.message);
+    }
+  }
 
-      // carico tutto, poi filtro lato UI (più semplice)
-      const a = await apiFetch("/absences");
-      setRows(a);
+  async function loadMore() {
+    try {
+      await loadAbsences(nextCursor);
     } catch (e) {
       setErr(e.message);
     }
   }
 
+  function exportNdjson() {
+    const q = filterQuery();
+    q.set("token", getToken());
+    window.open(`${process.env.NEXT_PUBLIC_API_BASE_URL}/absences/export.ndjson?${q.toString()}`, "_blank");
+  }
+
+  // ricarica quando cambiano i filtri (anche al primo render)
   useEffect(() => {
     load();
-
-    // default filtro: settimana corrente
-    const mon = mondayOf(new Date());
-    setFilterFrom(iso(mon));
-    setFilterTo(iso(addDays(mon, 6)));
-  }, []);
+  }, [filterPerson, filterFrom, filterTo]);
 
   function personName(pid) {
     return people.find((p) => p.id === pid)?.full_name || pid;
@@ -125,24 +152,8 @@ export default function Assenze() {
     }
   }
 
-  const filtered = useMemo(() => {
-    let out = [...rows];
-
-    if (filterPerson !== "ALL") {
-      out = out.filter((r) => r.person_id === filterPerson);
-    }
-
-    if (filterFrom) {
-      out = out.filter((r) => r.end_date >= filterFrom);
-    }
-    if (filterTo) {
-      out = out.filter((r) => r.start_date <= filterTo);
-    }
-
-    // ordina per data
-    out.sort((a, b) => (a.start_date < b.start_date ? 1 : -1));
-    return out;
-  }, [rows, filterPerson, filterFrom, filterTo]);
+  // già filtrate e ordinate (start_date desc) dal server
+  const filtered = rows;
 
   return (
     <RequireAuth>
@@ -190,6 +201,8 @@ export default function Assenze() {
           </div>
         </div>
 
+        <ImportCard kind="absences" title="Importa assenze" columns="person_id oppure full_name, kind, start_date, end_date, notes" onDone={load} />
+
         <div className="card" style={{ marginBottom: 12 }}>
           <h3 style={{ marginTop: 0 }}>Filtri elenco</h3>
           <div className="row" style={{ flexWrap: "wrap" }}>
@@ -206,6 +219,7 @@ export default function Assenze() {
             <button className="btn" onClick={() => { setFilterPerson("ALL"); setFilterFrom(""); setFilterTo(""); }}>
               Reset filtri
             </button>
+            <button className="btn" onClick={exportNdjson}>Esporta NDJSON</button>
           </div>
         </div>
 
@@ -245,6 +259,10 @@ export default function Assenze() {
               )}
             </tbody>
           </table>
+
+          {nextCursor && (
+            <button className="btn" style={{ marginTop: 10 }} onClick={loadMore}>Carica altre</button>
+          )}
         </div>
       </Layout>
     </RequireAuth>
@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react';
 import Layout from '../components/Layout';
 import RequireAuth from '../components/RequireAuth';
+import ImportCard from '../components/ImportCard';
 import { apiFetch } from '../lib/api';
 
 export default function People() {
@@ -56,6 +57,9 @@ export default function People() {
           </div>
         </div>
 
+        <ImportCard kind="people" title="Importa persone" columns="full_name, notes, is_active, rotation_base_riposo_date" onDone={load} />
+        <ImportCard kind="rotations" title="Importa rotazioni" columns="person_id oppure full_name, base_riposo_date" onDone={load} />
+
         <div className="card">
           <table className="grid">
             <thead>
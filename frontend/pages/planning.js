@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from "react";
 import Layout from "../components/Layout";
 import RequireAuth from "../components/RequireAuth";
-import { apiFetch, getToken } from "../lib/api";
+import { apiFetch, getToken, CLIENT_ID } from "../lib/api";
 
 function mondayOf(d = new Date()) {
   const x = new Date(d);
@@ -52,19 +52,11 @@ export default function Planning() {
   async function loadAll() {
     try {
       setErr(null);
-      const p = await apiFetch(`/weeks/${mondayISO}/plan`);
-      const a = await apiFetch(`/weeks/${mondayISO}/absences`);
-      setPlan(p || {});
-      setAbs(a || {});
-
-      // meta (se endpoint non esiste ancora, non rompiamo tutto)
-      try {
-        const m = await apiFetch(`/weeks/${mondayISO}/meta`);
-        setMeta(m || {});
-      } catch (e) {
-        // se non hai ancora messo il backend meta, vedrai qui l’errore
-        setMeta({ meta: {} });
-      }
+      // un solo round trip: plan + absences + meta
+      const b = await apiFetch(`/weeks/${mondayISO}/bundle`);
+      setPlan(b || {});
+      setAbs(b?.absences || {});
+      setMeta({ meta: b?.meta || {} });
     } catch (e) {
       setErr(e.message);
     }
@@ -77,6 +69,52 @@ export default function Planning() {
     setMetaDraft({});
   }, [mondayISO]);
 
+  // modifiche degli altri planner in tempo reale (SSE, token in query come il PDF)
+  useEffect(() => {
+    const token = getToken();
+    const base = process.env.NEXT_PUBLIC_API_BASE_URL;
+    if (!token || !base || typeof EventSource === "undefined") return;
+
+    const es = new EventSource(`${base}/weeks/${mondayISO}/events?token=${encodeURIComponent(token)}`);
+    let timer = null;
+    let connected = false;
+    const reload = () => {
+      // più eventi ravvicinati (copia, assenze) = un solo reload, servito dalla cache/ETag
+      clearTimeout(timer);
+      timer = setTimeout(loadAll, 300);
+    };
+    const onEvent = (e) => {
+      let ev;
+      try {
+        ev = JSON.parse(e.data);
+      } catch (_) {
+        return reload();
+      }
+      // le nostre scritture sono già applicate dalla risposta
+      if (ev.client_id && ev.client_id === CLIENT_ID) return;
+      // cell/cells/meta portano griglia e alert dei giorni ricalcolati: si applicano senza reload
+      if (ev.grid && ev.monday_date === mondayISO) {
+        if (ev.type === "meta") applyMeta(ev.day_index, ev.shift_id, ev);
+        applyDelta(ev);
+        return;
+      }
+      // clear/copy/assenze/reload (coda piena o payload troppo grande): piano intero
+      reload();
+    };
+    ["cell", "cells", "meta", "clear", "copy", "absence", "reload"].forEach((t) =>
+      es.addEventListener(t, onEvent)
+    );
+    // riconnessione: gli eventi persi nel frattempo non arrivano più
+    es.onopen = () => {
+      if (connected) reload();
+      connected = true;
+    };
+    return () => {
+      clearTimeout(timer);
+      es.close();
+    };
+  }, [mondayISO]);
+
   // id -> nome
   const peopleById = useMemo(() => {
     const m = new Map();
@@ -105,6 +143,8 @@ export default function Planning() {
     riposo_saltato: {},
     permesso_saltato: {},
     extra_absence_saltata: {},
+    sovrapposizioni: {},
+    riposo_insufficiente: {},
   };
 
   const dupMap = useMemo(() => {
@@ -137,6 +177,36 @@ export default function Planning() {
     return { st, en, role };
   }
 
+  function applyMeta(dayIndex, shiftId, m) {
+    setMeta((prev) => {
+      const all = prev?.meta || {};
+      const day = { ...(all[dayIndex] || {}) };
+      day[shiftId] = {
+        override_start_time: m.override_start_time || null,
+        override_end_time: m.override_end_time || null,
+        role: m.role || null,
+      };
+      return { meta: { ...all, [dayIndex]: day } };
+    });
+  }
+
+  // patch di griglia/alert dei soli giorni ritornati dalla scrittura (niente reload del plan)
+  function applyDelta(res) {
+    if (!res?.grid) return loadAll();
+    setPlan((prev) => {
+      if (!prev) return prev;
+      const grid = { ...(prev.grid || {}) };
+      const alerts = { ...(prev.alerts || {}) };
+      for (const d of Object.keys(res.grid)) {
+        grid[d] = res.grid[d];
+        for (const kind of Object.keys(res.alerts || {})) {
+          alerts[kind] = { ...(alerts[kind] || {}), [d]: res.alerts[kind][d] };
+        }
+      }
+      return { ...prev, grid, alerts };
+    });
+  }
+
   async function setCell(day, shift, person) {
     const block = person ? extraOf(person, day) : null;
     if (block) {
@@ -146,11 +216,11 @@ export default function Planning() {
 
     try {
       setSaving(`${day}-${shift}`);
-      await apiFetch(`/weeks/${mondayISO}/cell`, {
+      const res = await apiFetch(`/weeks/${mondayISO}/cell`, {
         method: "PUT",
         body: { day_index: day, shift_id: shift, person_id: person || null },
       });
-      await loadAll();
+      applyDelta(res);
     } catch (e) {
       setErr(e.message);
     } finally {
@@ -164,6 +234,17 @@ export default function Planning() {
     await loadAll();
   }
 
+  async function autofillWeek() {
+    if (!confirm("Compilare automaticamente le celle vuote?")) return;
+    try {
+      const res = await apiFetch(`/weeks/${mondayISO}/autofill`, { method: "POST", body: { keep_existing: true } });
+      applyDelta(res);
+      if (res?.unfilled?.length) setErr(`⚠ ${res.unfilled.length} celle senza personale disponibile`);
+    } catch (e) {
+      setErr(e.message);
+    }
+  }
+
   // ✅ Export PDF (NO fetch -> NO CORS)
   function exportPdf() {
     try {
@@ -194,17 +275,16 @@ export default function Planning() {
 
     try {
       setSaving(`meta-${key}`);
-      await apiFetch(`/weeks/${mondayISO}/meta`, {
-        method: "PUT",
-        body: {
-          day_index: dayIndex,
-          shift_id: shiftObj.id,
-          override_start_time: toTimeStr(d.start),
-          override_end_time: toTimeStr(d.end),
-          role: d.role || null,
-        },
-      });
-      await loadAll();
+      const body = {
+        day_index: dayIndex,
+        shift_id: shiftObj.id,
+        override_start_time: toTimeStr(d.start),
+        override_end_time: toTimeStr(d.end),
+        role: d.role || null,
+      };
+      const res = await apiFetch(`/weeks/${mondayISO}/meta`, { method: "PUT", body });
+      if (res?.grid) applyMeta(dayIndex, shiftObj.id, body);
+      applyDelta(res);
       setOpenKey(null);
     } catch (e) {
       setErr(e.message);
@@ -228,6 +308,8 @@ export default function Planning() {
       riposo_saltato: [],
       permesso_saltato: [],
       extra_absence_saltata: [],
+      sovrapposizioni: [],
+      riposo_insufficiente: [],
     };
 
     Object.keys(a.duplicates || {}).forEach((d) => {
@@ -260,6 +342,18 @@ export default function Planning() {
       });
     });
 
+    Object.keys(a.sovrapposizioni || {}).forEach((d) => {
+      (a.sovrapposizioni[d] || []).forEach((it) => {
+        out.sovrapposizioni.push({ day: Number(d), person: nameOf(it.person_id), shift: it.shift_name || "-", minutes: it.overlap_minutes });
+      });
+    });
+
+    Object.keys(a.riposo_insufficiente || {}).forEach((d) => {
+      (a.riposo_insufficiente[d] || []).forEach((it) => {
+        out.riposo_insufficiente.push({ day: Number(d), person: nameOf(it.person_id), shift: it.shift_name || "-", minutes: it.rest_minutes });
+      });
+    });
+
     return out;
   }, [alerts, peopleById]);
 
@@ -275,6 +369,7 @@ export default function Planning() {
         <div style={{ display: "flex", gap: 8, marginBottom: 12, flexWrap: "wrap" }}>
           <button className="btn" onClick={loadAll}>🔄 Refresh</button>
           <button className="btn primary" onClick={() => alert("💾 Salvataggio automatico attivo")}>💾 Salva (auto)</button>
+          <button className="btn secondary" onClick={autofillWeek}>🪄 Autocompila</button>
           <button className="btn danger" onClick={resetWeek}>♻️ Reset settimana</button>
           <button className="btn secondary" onClick={exportPdf}>📄 Esporta PDF</button>
         </div>
@@ -465,6 +560,20 @@ export default function Planning() {
             ))}</ul>
           }
 
+          <h4>⏱️ Turni sovrapposti</h4>
+          {readableAlerts.sovrapposizioni.length === 0 ? "Nessuno" :
+            <ul>{readableAlerts.sovrapposizioni.map((x,i)=>(
+              <li key={i}>{days[x.day]}: {x.person} — {x.shift} ({x.minutes} min sovrapposti)</li>
+            ))}</ul>
+          }
+
+          <h4>😴 Riposo insufficiente (&lt; 11h)</h4>
+          {readableAlerts.riposo_insufficiente.length === 0 ? "Nessuno" :
+            <ul>{readableAlerts.riposo_insufficiente.map((x,i)=>(
+              <li key={i}>{days[x.day]}: {x.person} — {x.shift} (riposo {Math.floor(x.minutes / 60)}h{String(x.minutes % 60).padStart(2, "0")})</li>
+            ))}</ul>
+          }
+
           <h4>👤 Non pianificati</h4>
           {readableAlerts.not_planned.length === 0 ? "Nessuno" :
             <ul>{readableAlerts.not_planned.map((x,i)=>(